@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import ChatMessage, ChatThread
+from . import search
+from .models import ChatArchiveBlock, ChatAttachment, ChatMessage, ChatThread
 
 
 @admin.register(ChatThread)
@@ -19,7 +20,17 @@ class ChatThreadAdmin(admin.ModelAdmin):
         "user2__email",
         "user2__profile__display_name",
     )
-    readonly_fields = ("created_at", "updated_at", "last_message_at")
+    readonly_fields = (
+        "created_at",
+        "updated_at",
+        "last_message_at",
+        "last_seq",
+        "archived_seq",
+        "user1_last_read_seq",
+        "user1_last_read_at",
+        "user2_last_read_seq",
+        "user2_last_read_at",
+    )
     date_hierarchy = "created_at"
     ordering = ["-last_message_at", "-created_at"]
 
@@ -38,16 +49,25 @@ class ChatMessageAdmin(admin.ModelAdmin):
         "sent_at",
         "read_at",
     )
-    list_filter = ("sent_at", "read_at")
+    list_filter = ("sent_at",)
+    list_select_related = ("thread", "sender")
     search_fields = (
         "sender__email",
         "sender__profile__display_name",
-        "content",
     )
     readonly_fields = ("sent_at", "read_at")
+    content_search_limit = 1000
     date_hierarchy = "sent_at"
     ordering = ["-sent_at"]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Content matches come from the full-text index instead of LIKE '%...%'
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            hits = search.search_message_ids(search_term, self.content_search_limit)
+            results |= queryset.filter(id__in=[message_id for message_id, _ in hits])
+        return results, may_have_duplicates
+
     def content_preview(self, obj):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
     content_preview.short_description = "Content"
@@ -56,3 +76,64 @@ class ChatMessageAdmin(admin.ModelAdmin):
         # Prevent manual creation in admin
         return False
 
+
+
+@admin.register(ChatArchiveBlock)
+class ChatArchiveBlockAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "thread",
+        "first_seq",
+        "last_seq",
+        "message_count",
+        "last_sent_at",
+    )
+    exclude = ("payload",)
+    readonly_fields = (
+        "thread",
+        "first_seq",
+        "last_seq",
+        "message_count",
+        "first_sent_at",
+        "last_sent_at",
+        "created_at",
+    )
+    ordering = ["thread", "first_seq"]
+
+    def has_add_permission(self, request):
+        # Blocks are only written by the archive job
+        return False
+
+
+@admin.register(ChatAttachment)
+class ChatAttachmentAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "thread",
+        "uploader",
+        "content_type",
+        "width",
+        "height",
+        "status",
+        "created_at",
+    )
+    list_filter = ("status", "content_type", "created_at")
+    list_select_related = ("thread", "uploader")
+    search_fields = ("uploader__email",)
+    readonly_fields = (
+        "thread",
+        "uploader",
+        "content_type",
+        "size",
+        "width",
+        "height",
+        "thumbnail_width",
+        "thumbnail_height",
+        "created_at",
+        "processed_at",
+    )
+    ordering = ["-created_at"]
+
+    def has_add_permission(self, request):
+        # Attachments are only created through the chat API
+        return False
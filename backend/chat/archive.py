@@ -0,0 +1,141 @@
+"""
+Cold storage for old chat messages.
+
+archive_old_messages moves messages older than a cutoff out of ChatMessage
+into per-thread ChatArchiveBlock rows (zlib-compressed JSON, many messages
+per row) and records the boundary on ChatThread.archived_seq. Because seqs
+are gap-free and only the oldest prefix of a thread is archived, readers
+can tell from archived_seq alone whether a request needs the archive.
+
+Archived messages are no longer in the full-text index or unread counts.
+"""
+
+import json
+import zlib
+from datetime import datetime
+
+from django.db import transaction
+
+from .models import ChatArchiveBlock, ChatAttachment, ChatMessage, ChatThread
+
+
+def encode_messages(messages):
+    """Pack messages into a compressed block payload."""
+    rows = [
+        [m.id, m.seq, m.sender_id, m.content, m.sent_at.isoformat(), m.client_id, m.attachment_id]
+        for m in messages
+    ]
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode(), 9)
+
+
+def decode_block(block, thread):
+    """Unpack a block into unsaved ChatMessage instances bound to `thread`."""
+    rows = json.loads(zlib.decompress(bytes(block.payload)))
+    return [
+        ChatMessage(
+            id=message_id,
+            thread=thread,
+            seq=seq,
+            sender_id=sender_id,
+            content=content,
+            sent_at=datetime.fromisoformat(sent_at),
+            client_id=client_id,
+            # Blocks written before attachments existed have six columns
+            attachment_id=attachment_id[0] if attachment_id else None,
+        )
+        for message_id, seq, sender_id, content, sent_at, client_id, *attachment_id in rows
+    ]
+
+
+def archive_thread(thread_id, cutoff, block_size):
+    """
+    Move a thread's messages sent before `cutoff` into archive blocks.
+    Returns the number of messages archived.
+    """
+    with transaction.atomic():
+        thread = ChatThread.objects.select_for_update().get(pk=thread_id)
+        messages = list(
+            thread.messages.filter(sent_at__lt=cutoff, seq__gt=thread.archived_seq).order_by("seq")
+        )
+        # Only a contiguous prefix can be archived; stop at the first gap
+        expected = thread.archived_seq + 1
+        for index, message in enumerate(messages):
+            if message.seq != expected + index:
+                messages = messages[:index]
+                break
+        if not messages:
+            return 0
+
+        ChatArchiveBlock.objects.bulk_create([
+            ChatArchiveBlock(
+                thread=thread,
+                first_seq=chunk[0].seq,
+                last_seq=chunk[-1].seq,
+                message_count=len(chunk),
+                first_sent_at=chunk[0].sent_at,
+                last_sent_at=chunk[-1].sent_at,
+                payload=encode_messages(chunk),
+            )
+            for chunk in (messages[i:i + block_size] for i in range(0, len(messages), block_size))
+        ])
+        ChatMessage.objects.filter(id__in=[m.id for m in messages]).delete()
+        ChatThread.objects.filter(pk=thread.pk).update(archived_seq=messages[-1].seq)
+    return len(messages)
+
+
+def archive_old_messages(cutoff, block_size):
+    """Archive every thread's messages older than `cutoff`. Returns (threads, messages)."""
+    thread_ids = (
+        ChatMessage.objects.filter(sent_at__lt=cutoff)
+        .values_list("thread_id", flat=True)
+        .distinct()
+    )
+    threads = messages = 0
+    for thread_id in list(thread_ids):
+        archived = archive_thread(thread_id, cutoff, block_size)
+        if archived:
+            threads += 1
+            messages += archived
+    return threads, messages
+
+
+def fetch_messages(thread, after_seq, limit):
+    """
+    Messages with seq > after_seq in seq order, reading archive blocks first
+    when after_seq falls inside the archived range, then the hot table.
+    """
+    results = []
+    if after_seq < thread.archived_seq:
+        blocks = thread.archive_blocks.filter(last_seq__gt=after_seq).order_by("first_seq")
+        for block in blocks.iterator():
+            for message in decode_block(block, thread):
+                if message.seq > after_seq:
+                    results.append(message)
+                    if len(results) == limit:
+                        break
+            if len(results) == limit:
+                break
+        _load_attachments(results)
+        after_seq = thread.archived_seq
+        if len(results) == limit:
+            return results
+
+    hot = thread.messages.filter(seq__gt=after_seq).select_related("attachment").order_by("seq")
+    return results + list(hot[: limit - len(results)])
+
+
+def _load_attachments(messages):
+    """Fetch attachments for decoded archive messages in one query."""
+    ids = {message.attachment_id for message in messages if message.attachment_id}
+    if not ids:
+        return
+    by_id = ChatAttachment.objects.in_bulk(ids)
+    for message in messages:
+        if message.attachment_id:
+            message.attachment = by_id.get(message.attachment_id)
+
+
+def fetch_last_message(thread):
+    """Latest message of a thread whose hot messages have all been archived."""
+    block = thread.archive_blocks.order_by("-first_seq").first()
+    return decode_block(block, thread)[-1] if block else None
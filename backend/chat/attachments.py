@@ -0,0 +1,99 @@
+"""
+Chat image attachments.
+
+Uploads are spooled to a temporary file by the view and only their header is
+read on the request thread (format and dimensions). Decoding, downscaling
+and thumbnailing are done by the outbox worker (see chat.handlers), so a
+large image never holds up the request and a crashed job is retried.
+"""
+
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import ChatAttachment
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+def sniff_image(upload):
+    """
+    Read just enough of an uploaded file to return (format, width, height).
+    Raises ValueError if it is not an accepted image.
+    """
+    if upload.size > settings.CHAT_ATTACHMENT_MAX_BYTES:
+        raise ValueError(f"Image too large (max {settings.CHAT_ATTACHMENT_MAX_BYTES // (1024 * 1024)} MB).")
+    try:
+        # Image.open only parses the header; pixel data is not decoded here
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise ValueError("Image dimensions are too large.")
+    except (UnidentifiedImageError, OSError):
+        raise ValueError("Upload a valid image (JPEG, PNG, GIF or WebP).")
+    finally:
+        upload.seek(0)
+
+    if image_format not in ALLOWED_FORMATS:
+        raise ValueError("Upload a valid image (JPEG, PNG, GIF or WebP).")
+    if width * height > settings.CHAT_ATTACHMENT_MAX_PIXELS:
+        raise ValueError("Image dimensions are too large.")
+    return image_format, width, height
+
+
+def _encode(image, image_format):
+    """Encode a PIL image for storage, keeping the source format where sensible."""
+    buffer = BytesIO()
+    if image_format == "JPEG" or image.mode not in ("RGB", "RGBA", "L", "P"):
+        image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True)
+    else:
+        image.save(buffer, image_format if image_format != "GIF" else "PNG")
+    return buffer.getvalue()
+
+
+def process_attachment(attachment_id):
+    """Downscale the original if needed and generate its thumbnail; bad images are marked failed."""
+    attachment = ChatAttachment.objects.filter(pk=attachment_id).first()
+    if attachment is None or attachment.status != ChatAttachment.Status.PENDING:
+        return attachment
+
+    try:
+        with attachment.original.open("rb"), Image.open(attachment.original) as source:
+            image_format = source.format
+            image = ImageOps.exif_transpose(source)
+            image.load()
+
+        max_dimension = settings.CHAT_ATTACHMENT_MAX_DIMENSION
+        if max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            name = os.path.basename(attachment.original.name)
+            attachment.original.delete(save=False)
+            attachment.original.save(name, ContentFile(_encode(image, image_format)), save=False)
+            attachment.size = attachment.original.size
+        attachment.width, attachment.height = image.size
+
+        thumbnail_size = settings.CHAT_ATTACHMENT_THUMBNAIL_SIZE
+        image.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS)
+        stem = os.path.splitext(os.path.basename(attachment.original.name))[0]
+        attachment.thumbnail.save(f"{stem}_thumb.jpg", ContentFile(_encode(image, "JPEG")), save=False)
+        attachment.thumbnail_width, attachment.thumbnail_height = image.size
+        attachment.status = ChatAttachment.Status.READY
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Could not process chat attachment %s", attachment_id)
+        attachment.status = ChatAttachment.Status.FAILED
+
+    attachment.processed_at = timezone.now()
+    attachment.save()
+    return attachment
+
@@ -0,0 +1,96 @@
+"""
+Inbox events for the server-sent events stream.
+
+Events are derived from ChatThread rows rather than stored: every change a
+participant cares about (new thread, new message, read watermark moving)
+bumps the thread's updated_at, so polling the user's threads by
+(updated_at, id) yields them in order. The event id encodes that pair as
+"<updated_at in epoch microseconds>-<thread id>", which lets a reconnecting
+client resume with Last-Event-ID without skipping threads that share a
+timestamp.
+"""
+
+import json
+from datetime import datetime, timezone
+
+from django.db.models import Q
+
+from . import archive
+from .models import ChatThread
+
+PREVIEW_LENGTH = 100
+
+
+def event_id_for(moment, thread_id=0):
+    """Encode an (updated_at, thread id) cursor as an event id."""
+    delta = moment - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return f"{delta.days * 86400 * 10**6 + delta.seconds * 10**6 + delta.microseconds}-{thread_id}"
+
+
+def parse_event_id(event_id):
+    """
+    Decode an event id back into an (updated_at, thread id) cursor; a bare
+    timestamp (older ids) resumes before every thread at that moment.
+    Raises ValueError if malformed.
+    """
+    micros, _, thread_id = event_id.partition("-")
+    micros = int(micros)
+    moment = datetime.fromtimestamp(micros // 10**6, tz=timezone.utc).replace(microsecond=micros % 10**6)
+    return moment, int(thread_id) if thread_id else 0
+
+
+def last_message_for(thread):
+    """The thread's latest message, read from the archive once every hot message has been moved there."""
+    last_message = thread.messages.order_by("-seq").first()
+    if last_message is None and thread.archived_seq:
+        last_message = archive.fetch_last_message(thread)
+    return last_message
+
+
+def collect_inbox_events(user, cursor, limit=200):
+    """
+    Return (events, cursor) for the user's threads changed after `cursor`,
+    an (updated_at, thread id) pair. Each event is {"id", "event", "data"};
+    the returned cursor is the pair to poll from next.
+    """
+    since, last_id = cursor
+    threads = (
+        ChatThread.objects.filter(Q(user1=user) | Q(user2=user))
+        .filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=last_id))
+        .order_by("updated_at", "id")[:limit]
+    )
+
+    events = []
+    for thread in threads:
+        if thread.created_at > since and thread.last_message_at is None:
+            event_type = "thread.created"
+        elif thread.last_message_at and thread.last_message_at > since:
+            event_type = "thread.message"
+        else:
+            event_type = "thread.read"
+
+        last_message = last_message_for(thread)
+        events.append({
+            "id": event_id_for(thread.updated_at, thread.id),
+            "event": event_type,
+            "data": {
+                "thread_id": thread.id,
+                "last_seq": thread.last_seq,
+                "unread_count": thread.get_unread_count(user),
+                "last_message": {
+                    "id": last_message.id,
+                    "seq": last_message.seq,
+                    "sender_id": last_message.sender_id,
+                    "preview": last_message.content[:PREVIEW_LENGTH],
+                    "sent_at": last_message.sent_at.isoformat(),
+                } if last_message else None,
+            },
+        })
+        cursor = (thread.updated_at, thread.id)
+
+    return events, cursor
+
+
+def format_event(event):
+    """Serialize one event in text/event-stream framing."""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
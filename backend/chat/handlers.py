@@ -0,0 +1,11 @@
+"""Outbox handlers for chat side effects (registered in ChatConfig.ready)."""
+
+from outbox.dispatch import register
+
+
+@register("chat_attachment.uploaded")
+def generate_attachment_thumbnail(attachment_id):
+    """Downscale a newly uploaded attachment and build its thumbnail."""
+    from .attachments import process_attachment
+
+    process_attachment(attachment_id)
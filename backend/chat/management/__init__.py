@@ -0,0 +1 @@
+# Required for Django to recognize this as a package
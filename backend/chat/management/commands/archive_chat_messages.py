@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.archive import archive_old_messages
+
+
+class Command(BaseCommand):
+    help = "Move old chat messages into compressed per-thread archive blocks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+            help="Archive messages sent more than this many days ago",
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=settings.CHAT_ARCHIVE_BLOCK_SIZE,
+            help="Maximum number of messages per archive block",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        self.stdout.write(f"Archiving messages sent before {cutoff:%Y-%m-%d %H:%M}...")
+
+        threads, messages = archive_old_messages(cutoff, options["block_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done! Archived {messages} messages from {threads} threads.")
+        )
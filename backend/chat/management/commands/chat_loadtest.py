@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from chat.models import ChatThread
+from connections.models import Connection
+from profiles.models import Profile
+
+User = get_user_model()
+
+# Query counter of the request currently running in this task (ASGI mode only)
+_current_queries = contextvars.ContextVar("chat_loadtest_queries", default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _current_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender=None, connection=None, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+class AsgiTarget:
+    """Calls config.asgi:application in-process, counting DB queries per request."""
+
+    name = "asgi"
+
+    def __init__(self):
+        from config.asgi import application
+
+        self.application = application
+        connection_created.connect(_install_query_counter)
+        for conn in connections.all():
+            _install_query_counter(connection=conn)
+
+    async def request(self, method, path, token, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"authorization", f"Bearer {token}".encode()),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        sent = False
+        response = {"status": None, "body": b""}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await asyncio.Event().wait()  # never disconnect mid-request
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+
+        counter = [0]
+        token_ctx = _current_queries.set(counter)
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            _current_queries.reset(token_ctx)
+        return response["status"], response["body"], counter[0]
+
+
+class HttpTarget:
+    """Calls a running server over HTTP (query counts are not available)."""
+
+    name = "http"
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def _request(self, method, path, token, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read(), None
+
+    async def request(self, method, path, token, body=None):
+        return await asyncio.to_thread(self._request, method, path, token, body)
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent chat users (send, sync, mark-read) and report throughput, "
+        "latency percentiles and DB queries per operation. Creates temporary "
+        "loadtest users in the configured database and removes them afterwards."
+    )
+
+    operations = ("send", "sync", "read")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Number of simulated users")
+        parser.add_argument(
+            "--conversations",
+            type=int,
+            default=2,
+            help="Concurrent conversations per user",
+        )
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+        parser.add_argument(
+            "--target",
+            default="asgi",
+            help="'asgi' to call config.asgi:application in-process, or a base URL like http://127.0.0.1:8000",
+        )
+        parser.add_argument(
+            "--mix",
+            default="send=5,sync=4,read=1",
+            help="Relative operation weights",
+        )
+        parser.add_argument("--think-time", type=float, default=0.0, help="Pause between operations (s)")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--keep-data", action="store_true", help="Keep the generated users")
+        parser.add_argument(
+            "--no-throttle",
+            action="store_true",
+            help="Disable chat send throttles (asgi target only; a server keeps its own settings)",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 2:
+            raise CommandError("--users must be at least 2.")
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+
+        weights = self._parse_mix(options["mix"])
+        if options["no_throttle"]:
+            settings.CHAT_SEND_THROTTLE_RATE = None
+            settings.CHAT_THREAD_SEND_THROTTLE_RATE = None
+        run_id = uuid.uuid4().hex[:8]
+
+        self.stdout.write(f"Setting up {options['users']} users (run {run_id})...")
+        user_ids, conversations = self._setup(run_id, options["users"], options["conversations"])
+
+        try:
+            target = AsgiTarget() if options["target"] == "asgi" else HttpTarget(options["target"])
+            self.stdout.write(
+                f"Running {len(conversations)} conversations against {target.name} "
+                f"for {options['duration']:.0f}s..."
+            )
+            samples, elapsed = asyncio.run(
+                self._run(target, conversations, weights, options["duration"], options["think_time"])
+            )
+            self._report(samples, elapsed, target.name == "asgi")
+        finally:
+            if not options["keep_data"]:
+                User.objects.filter(id__in=user_ids).delete()
+
+    def _parse_mix(self, mix):
+        weights = {}
+        for part in mix.split(","):
+            name, _, weight = part.partition("=")
+            if name.strip() not in self.operations:
+                raise CommandError(f"Unknown operation in --mix: {name}")
+            weights[name.strip()] = float(weight or 1)
+        return weights
+
+    def _setup(self, run_id, user_count, per_user):
+        """Create users, accepted connections and threads; return (user_ids, conversations)."""
+        users = [
+            User.objects.create_user(
+                email=f"loadtest-{run_id}-{i}@example.com",
+                password=uuid.uuid4().hex,
+                is_active=True,
+            )
+            for i in range(user_count)
+        ]
+        Profile.objects.bulk_create(
+            [Profile(user=user, display_name=f"Load {i}") for i, user in enumerate(users)]
+        )
+        tokens = {user.id: str(RefreshToken.for_user(user).access_token) for user in users}
+
+        pairs = {}
+        for i, user in enumerate(users):
+            for offset in range(1, per_user + 1):
+                other = users[(i + offset) % user_count]
+                if other != user:
+                    pairs.setdefault(Connection.pair_key(user.id, other.id), (user.id, other.id))
+
+        # bulk_create skips Connection.save, so no connection.accepted outbox
+        # events are left behind once the users are deleted
+        Connection.objects.bulk_create(
+            [
+                Connection(
+                    from_user_id=from_id,
+                    to_user_id=to_id,
+                    user_low_id=low,
+                    user_high_id=high,
+                    status=Connection.Status.ACCEPTED,
+                )
+                for (low, high), (from_id, to_id) in pairs.items()
+            ]
+        )
+        ChatThread.bulk_create_threads(pairs)
+        thread_ids = {
+            (user1_id, user2_id): thread_id
+            for thread_id, user1_id, user2_id in ChatThread.objects.filter(
+                user1_id__in=tokens
+            ).values_list("id", "user1_id", "user2_id")
+        }
+
+        conversations = []
+        for low, high in pairs:
+            # Both participants drive the conversation
+            conversations.append({"thread": thread_ids[low, high], "token": tokens[low], "seq": 0})
+            conversations.append({"thread": thread_ids[low, high], "token": tokens[high], "seq": 0})
+        return [user.id for user in users], conversations
+
+    async def _run(self, target, conversations, weights, duration, think_time):
+        samples = defaultdict(list)  # op -> [(latency_s, ok, queries)]
+        names, values = zip(*weights.items())
+        started = time.perf_counter()
+        deadline = started + duration
+
+        async def worker(conversation):
+            base = f"/api/v1/chat/threads/{conversation['thread']}"
+            while time.perf_counter() < deadline:
+                op = random.choices(names, values)[0]
+                if op == "send":
+                    method, path, body = "POST", f"{base}/messages/", {"content": f"load {uuid.uuid4().hex}"}
+                elif op == "sync":
+                    method, path, body = "GET", f"{base}/messages/?after_seq={conversation['seq']}", None
+                else:
+                    method, path, body = "POST", f"{base}/read/", None
+
+                t0 = time.perf_counter()
+                status_code, payload, queries = await target.request(
+                    method, path, conversation["token"], body
+                )
+                latency = time.perf_counter() - t0
+                ok = status_code is not None and status_code < 400
+                samples[op].append((latency, ok, queries))
+
+                if ok and op == "sync":
+                    conversation["seq"] = json.loads(payload).get("last_seq", conversation["seq"])
+                if think_time:
+                    await asyncio.sleep(think_time)
+
+        await asyncio.gather(*(worker(c) for c in conversations))
+        await sync_to_async(connections.close_all)()
+        return samples, time.perf_counter() - started
+
+    def _report(self, samples, elapsed, with_queries):
+        header = f"{'operation':<10}{'count':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        total = 0
+        for op in self.operations:
+            rows = samples.get(op)
+            if not rows:
+                continue
+            total += len(rows)
+            latencies = sorted(latency * 1000 for latency, _, _ in rows)
+            errors = sum(1 for _, ok, _ in rows if not ok)
+            queries = f"{statistics.mean(q for _, _, q in rows):.1f}" if with_queries else "n/a"
+            self.stdout.write(
+                f"{op:<10}{len(rows):>8}{errors:>8}{len(rows) / elapsed:>10.1f}"
+                f"{self._percentile(latencies, 50):>10.1f}{self._percentile(latencies, 95):>10.1f}"
+                f"{self._percentile(latencies, 99):>10.1f}{queries:>10}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Done! {total} requests in {elapsed:.1f}s ({total / elapsed:.1f}/s).")
+        )
+
+    @staticmethod
+    def _percentile(sorted_values, percentile):
+        index = min(len(sorted_values) - 1, round(percentile / 100 * (len(sorted_values) - 1)))
+        return sorted_values[index]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-01-12 09:14
+
+from django.db import migrations, models
+
+
+def backfill_message_seq(apps, schema_editor):
+    """Number existing messages per thread in send order and record last_seq."""
+    ChatThread = apps.get_model("chat", "ChatThread")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+
+    for thread in ChatThread.objects.all().iterator():
+        messages = list(
+            ChatMessage.objects.filter(thread=thread).order_by("sent_at", "id").only("id")
+        )
+        for seq, message in enumerate(messages, start=1):
+            message.seq = seq
+        ChatMessage.objects.bulk_update(messages, ["seq"], batch_size=500)
+        ChatThread.objects.filter(pk=thread.pk).update(last_seq=len(messages))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="last_seq",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Sequence number of the last message sent in this thread",
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatmessage",
+            name="seq",
+            field=models.PositiveIntegerField(
+                help_text="Per-thread sequence number (starts at 1, gap-free)",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(backfill_message_seq, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="seq",
+            field=models.PositiveIntegerField(
+                help_text="Per-thread sequence number (starts at 1, gap-free)",
+            ),
+        ),
+        migrations.AlterModelOptions(
+            name="chatmessage",
+            options={"ordering": ["thread", "seq"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="chatmessage",
+            name="chat_chatme_thread__d53411_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="chatmessage",
+            constraint=models.UniqueConstraint(
+                fields=("thread", "seq"), name="unique_message_seq_per_thread"
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.9 on 2026-01-14 11:02
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_read_watermarks(apps, schema_editor):
+    """Derive each participant's watermark from the per-message read_at values."""
+    ChatThread = apps.get_model("chat", "ChatThread")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+
+    for thread in ChatThread.objects.all().iterator():
+        updates = {}
+        for slot, reader_id in (("user1", thread.user1_id), ("user2", thread.user2_id)):
+            read = ChatMessage.objects.filter(
+                thread=thread,
+                read_at__isnull=False,
+            ).exclude(sender_id=reader_id).aggregate(seq=Max("seq"), at=Max("read_at"))
+            if read["seq"] is not None:
+                updates[f"{slot}_last_read_seq"] = read["seq"]
+                updates[f"{slot}_last_read_at"] = read["at"]
+        if updates:
+            ChatThread.objects.filter(pk=thread.pk).update(**updates)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0002_chatmessage_seq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="user1_last_read_seq",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Highest message seq read by user1"
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user1_last_read_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When user1 last read this thread", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user2_last_read_seq",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Highest message seq read by user2"
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user2_last_read_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When user2 last read this thread", null=True
+            ),
+        ),
+        migrations.RunPython(backfill_read_watermarks, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="chatmessage",
+            name="chat_chatme_thread__371b2c_idx",
+        ),
+        migrations.RemoveField(
+            model_name="chatmessage",
+            name="read_at",
+        ),
+    ]
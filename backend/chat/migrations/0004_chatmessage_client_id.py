@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-01-16 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0003_chatthread_read_watermarks"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="client_id",
+            field=models.CharField(
+                blank=True,
+                help_text="Client-generated idempotency key for offline sends",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="chatmessage",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("client_id__isnull", False)),
+                fields=("sender", "client_id"),
+                name="unique_message_client_id_per_sender",
+            ),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.9 on 2026-01-20 10:05
+
+from django.db import migrations
+
+# SQLite: external-content FTS5 table kept in sync by triggers.
+# Note: SQLite migrations that rebuild chat_chatmessage drop these triggers
+# and must re-run create_fulltext_index.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_chatmessage_fts USING fts5(
+        content,
+        content='chat_chatmessage',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "INSERT INTO chat_chatmessage_fts(chat_chatmessage_fts) VALUES ('rebuild')",
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_chatmessage_fts_insert
+    AFTER INSERT ON chat_chatmessage BEGIN
+        INSERT INTO chat_chatmessage_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_chatmessage_fts_delete
+    AFTER DELETE ON chat_chatmessage BEGIN
+        INSERT INTO chat_chatmessage_fts(chat_chatmessage_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_chatmessage_fts_update
+    AFTER UPDATE OF content ON chat_chatmessage BEGIN
+        INSERT INTO chat_chatmessage_fts(chat_chatmessage_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO chat_chatmessage_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS chat_chatmessage_fts_update",
+    "DROP TRIGGER IF EXISTS chat_chatmessage_fts_delete",
+    "DROP TRIGGER IF EXISTS chat_chatmessage_fts_insert",
+    "DROP TABLE IF EXISTS chat_chatmessage_fts",
+]
+
+# PostgreSQL: expression GIN index matching the query in chat/search.py
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS chat_chatmessage_content_fts
+    ON chat_chatmessage USING gin (to_tsvector('simple', content))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS chat_chatmessage_content_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0004_chatmessage_client_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.9 on 2026-01-22 08:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0005_chatmessage_fulltext_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="archived_seq",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Messages up to this seq have been moved to archive blocks",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChatArchiveBlock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("first_seq", models.PositiveIntegerField()),
+                ("last_seq", models.PositiveIntegerField()),
+                ("message_count", models.PositiveIntegerField()),
+                ("first_sent_at", models.DateTimeField()),
+                ("last_sent_at", models.DateTimeField()),
+                (
+                    "payload",
+                    models.BinaryField(
+                        help_text="zlib-compressed JSON list of messages"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "thread",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archive_blocks",
+                        to="chat.chatthread",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["thread", "first_seq"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("thread", "first_seq"),
+                        name="unique_archive_block_start_per_thread",
+                    )
+                ],
+            },
+        ),
+    ]
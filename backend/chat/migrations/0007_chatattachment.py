@@ -0,0 +1,97 @@
+# Generated by Django 5.2.9 on 2026-01-24 10:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_chatarchiveblock"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatAttachment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("original", models.ImageField(upload_to="chat_attachments/%Y/%m/")),
+                (
+                    "thumbnail",
+                    models.ImageField(
+                        blank=True, upload_to="chat_attachments/%Y/%m/thumbs/"
+                    ),
+                ),
+                ("content_type", models.CharField(max_length=50)),
+                (
+                    "size",
+                    models.PositiveIntegerField(
+                        help_text="Size of the original in bytes"
+                    ),
+                ),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("thumbnail_width", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "thumbnail_height",
+                    models.PositiveIntegerField(blank=True, null=True),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("ready", "Ready"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        help_text="Pending until the thumbnail has been generated",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "thread",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attachments",
+                        to="chat.chatthread",
+                    ),
+                ),
+                (
+                    "uploader",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chat_attachments",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="chatmessage",
+            name="attachment",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Image attached to this message",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="messages",
+                to="chat.chatattachment",
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-01-31 10:24
+
+from django.db import migrations, models
+
+
+def backfill_unread_counts(apps, schema_editor):
+    """Count each participant's unread messages (past their watermark, from the other user)."""
+    ChatThread = apps.get_model("chat", "ChatThread")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+
+    for thread in ChatThread.objects.all().iterator():
+        updates = {}
+        for slot, reader_id in (("user1", thread.user1_id), ("user2", thread.user2_id)):
+            unread = ChatMessage.objects.filter(
+                thread=thread,
+                seq__gt=getattr(thread, f"{slot}_last_read_seq"),
+            ).exclude(sender_id=reader_id).count()
+            if unread:
+                updates[f"{slot}_unread_count"] = unread
+        if updates:
+            ChatThread.objects.filter(pk=thread.pk).update(**updates)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0007_chatattachment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="user1_unread_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Messages from user2 that user1 has not read"
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatthread",
+            name="user2_unread_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Messages from user1 that user2 has not read"
+            ),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
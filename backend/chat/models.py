@@ -1,7 +1,9 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from profiles import counters
+
 
 class ChatThread(models.Model):
     """
@@ -30,6 +32,45 @@ class ChatThread(models.Model):
         blank=True,
         help_text="Timestamp of the last message sent in this thread",
     )
+    last_seq = models.PositiveIntegerField(
+        default=0,
+        help_text="Sequence number of the last message sent in this thread",
+    )
+
+    archived_seq = models.PositiveIntegerField(
+        default=0,
+        help_text="Messages up to this seq have been moved to archive blocks",
+    )
+
+    # Read watermarks: each participant has read every message up to last_read_seq
+    user1_last_read_seq = models.PositiveIntegerField(
+        default=0,
+        help_text="Highest message seq read by user1",
+    )
+    user1_last_read_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When user1 last read this thread",
+    )
+    user2_last_read_seq = models.PositiveIntegerField(
+        default=0,
+        help_text="Highest message seq read by user2",
+    )
+    user2_last_read_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When user2 last read this thread",
+    )
+
+    # Unread counters, bumped on insert and zeroed on mark-read (no COUNT over messages)
+    user1_unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Messages from user2 that user1 has not read",
+    )
+    user2_unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Messages from user1 that user2 has not read",
+    )
 
     class Meta:
         ordering = ["-last_message_at", "-created_at"]
@@ -69,18 +110,147 @@ class ChatThread(models.Model):
         )
         return thread, created
 
+    @staticmethod
+    def bulk_create_threads(user_id_pairs):
+        """
+        Ensure threads exist for many (user_a_id, user_b_id) pairs with one
+        bulk_create; pairs that already have a thread are left alone.
+        """
+        pairs = {tuple(sorted(pair)) for pair in user_id_pairs}
+        ChatThread.objects.bulk_create(
+            [ChatThread(user1_id=low, user2_id=high) for low, high in pairs],
+            ignore_conflicts=True,
+        )
+
+    def allocate_seq(self, count=1, sender_id=None):
+        """
+        Reserve `count` consecutive message sequence numbers and return the first.
+        Must run inside a transaction: the increment locks the thread row, so
+        concurrent senders serialize and a rolled-back insert leaves no gap.
+        With sender_id, the recipient's unread counters are bumped as well.
+        """
+        changes = {"last_seq": models.F("last_seq") + count}
+        recipient_id = None
+        if sender_id is not None:
+            recipient_id = self.user2_id if sender_id == self.user1_id else self.user1_id
+            unread_field = f"{self._participant_slot(recipient_id)}_unread_count"
+            changes[unread_field] = models.F(unread_field) + count
+
+        # Thread row first, then counters: the same lock order as mark_as_read
+        threads = ChatThread.objects.filter(pk=self.pk)
+        threads.update(**changes)
+        if recipient_id is not None:
+            counters.adjust(recipient_id, unread_message_count=count)
+        for field, value in threads.values(*changes).get().items():
+            setattr(self, field, value)
+        return self.last_seq - count + 1
+
     def get_other_user(self, current_user):
         """Get the other user in this thread."""
         return self.user2 if self.user1 == current_user else self.user1
 
+    def get_other_user_id(self, current_user):
+        """Get the other user's ID without loading the user row."""
+        return self.user2_id if self.user1_id == current_user.id else self.user1_id
+
+    def bulk_add_messages(self, messages):
+        """
+        Insert unsaved messages (all from one sender) into this thread with a
+        single bulk_create, reserving their seqs and updating last_message_at once.
+        """
+        with transaction.atomic():
+            first_seq = self.allocate_seq(len(messages), sender_id=messages[0].sender_id)
+            for offset, message in enumerate(messages):
+                message.thread = self
+                message.seq = first_seq + offset
+            created = ChatMessage.objects.bulk_create(messages)
+
+            self.last_message_at = created[-1].sent_at
+            self.save(update_fields=["last_message_at", "updated_at"])
+        return created
+
+    def _participant_slot(self, user_id):
+        """Return the field prefix ("user1"/"user2") for a participant."""
+        return "user1" if user_id == self.user1_id else "user2"
+
+    def get_last_read_seq(self, user):
+        """Get the read watermark of a participant."""
+        return getattr(self, f"{self._participant_slot(user.id)}_last_read_seq")
+
+    def get_message_read_at(self, message):
+        """Derive when the recipient read a message from their watermark."""
+        recipient = "user2" if message.sender_id == self.user1_id else "user1"
+        if message.seq <= getattr(self, f"{recipient}_last_read_seq"):
+            return getattr(self, f"{recipient}_last_read_at")
+        return None
+
     def get_unread_count(self, user):
-        """Get count of unread messages for a specific user."""
-        return self.messages.filter(sender=self.get_other_user(user), read_at__isnull=True).count()
+        """Get count of unread messages for a specific user (stored counter)."""
+        return getattr(self, f"{self._participant_slot(user.id)}_unread_count")
 
     def mark_as_read(self, user):
-        """Mark all messages from the other user as read."""
-        other_user = self.get_other_user(user)
-        self.messages.filter(sender=other_user, read_at__isnull=True).update(read_at=timezone.now())
+        """
+        Mark all messages from the other user as read by advancing the
+        user's watermark to the thread's last seq and zeroing their unread
+        counter. No-op when nothing new has arrived.
+        """
+        slot = self._participant_slot(user.id)
+        now = timezone.now()
+        with transaction.atomic():
+            # The conditional UPDATE comes first so this transaction starts as a
+            # writer (a read-then-write upgrade fails with "database is locked"
+            # on SQLite); the row stays locked for the reads and writes below.
+            advanced = ChatThread.objects.filter(
+                pk=self.pk,
+                **{f"{slot}_last_read_seq__lt": models.F("last_seq")},
+            ).update(**{
+                f"{slot}_last_read_seq": models.F("last_seq"),
+                f"{slot}_last_read_at": now,
+                "updated_at": now,
+            })
+            if advanced:
+                threads = ChatThread.objects.filter(pk=self.pk)
+                unread = threads.values_list(f"{slot}_unread_count", flat=True).get()
+                if unread:
+                    threads.update(**{f"{slot}_unread_count": 0})
+                    counters.adjust(user.id, unread_message_count=-unread)
+        self.refresh_from_db(fields=[
+            "last_seq",
+            f"{slot}_last_read_seq",
+            f"{slot}_last_read_at",
+            f"{slot}_unread_count",
+        ])
+
+    @staticmethod
+    def reconcile_unread_counts():
+        """Recompute every thread's unread counters from its messages. Returns threads fixed."""
+        threads = ChatThread.objects.annotate(
+            actual_user1_unread=models.Count(
+                "messages",
+                filter=models.Q(
+                    messages__seq__gt=models.F("user1_last_read_seq"),
+                    messages__sender_id=models.F("user2_id"),
+                ),
+            ),
+            actual_user2_unread=models.Count(
+                "messages",
+                filter=models.Q(
+                    messages__seq__gt=models.F("user2_last_read_seq"),
+                    messages__sender_id=models.F("user1_id"),
+                ),
+            ),
+        ).filter(
+            ~models.Q(user1_unread_count=models.F("actual_user1_unread"))
+            | ~models.Q(user2_unread_count=models.F("actual_user2_unread"))
+        )
+
+        fixed = []
+        for thread in threads.iterator():
+            thread.user1_unread_count = thread.actual_user1_unread
+            thread.user2_unread_count = thread.actual_user2_unread
+            fixed.append(thread)
+        ChatThread.objects.bulk_update(fixed, ["user1_unread_count", "user2_unread_count"], batch_size=1000)
+        return len(fixed)
 
 
 class ChatMessage(models.Model):
@@ -98,24 +268,45 @@ class ChatMessage(models.Model):
         on_delete=models.CASCADE,
         related_name="sent_messages",
     )
+    seq = models.PositiveIntegerField(
+        help_text="Per-thread sequence number (starts at 1, gap-free)",
+    )
     content = models.TextField(
         max_length=2000,
         help_text="Message content (max 2000 characters)",
     )
-    
-    # Timestamps
-    sent_at = models.DateTimeField(auto_now_add=True)
-    read_at = models.DateTimeField(
+    client_id = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="Client-generated idempotency key for offline sends",
+    )
+    attachment = models.ForeignKey(
+        "ChatAttachment",
+        on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        help_text="When the message was read by the recipient",
+        related_name="messages",
+        help_text="Image attached to this message",
     )
+    
+    # Timestamps
+    sent_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["sent_at"]
+        ordering = ["thread", "seq"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread", "seq"],
+                name="unique_message_seq_per_thread",
+            ),
+            models.UniqueConstraint(
+                fields=["sender", "client_id"],
+                condition=models.Q(client_id__isnull=False),
+                name="unique_message_client_id_per_sender",
+            ),
+        ]
         indexes = [
-            models.Index(fields=["thread", "sent_at"]),
-            models.Index(fields=["thread", "read_at"]),
             models.Index(fields=["sender", "-sent_at"]),
         ]
 
@@ -123,13 +314,98 @@ class ChatMessage(models.Model):
         preview = self.content[:50] + "..." if len(self.content) > 50 else self.content
         return f"{self.sender.email}: {preview}"
 
+    @property
+    def read_at(self):
+        """When the message was read by the recipient (derived from the thread watermark)."""
+        return self.thread.get_message_read_at(self)
+
     def save(self, *args, **kwargs):
-        """Update thread's last_message_at when a new message is sent."""
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        if is_new:
+        """Assign the next seq and update thread's last_message_at when a new message is sent."""
+        if self.pk is not None:
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            self.seq = self.thread.allocate_seq(sender_id=self.sender_id)
+            super().save(*args, **kwargs)
+
             # Update thread's last_message_at
             self.thread.last_message_at = self.sent_at
-            self.thread.save(update_fields=["last_message_at"])
+            self.thread.save(update_fields=["last_message_at", "updated_at"])
+
+
+class ChatAttachment(models.Model):
+    """
+    An image sent in a chat thread, stored as the original plus a thumbnail.
+    Dimensions are kept on the row so listings never open the image files.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        READY = "ready", "Ready"
+        FAILED = "failed", "Failed"
+
+    thread = models.ForeignKey(
+        ChatThread,
+        on_delete=models.CASCADE,
+        related_name="attachments",
+    )
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="chat_attachments",
+    )
+    original = models.ImageField(upload_to="chat_attachments/%Y/%m/")
+    thumbnail = models.ImageField(upload_to="chat_attachments/%Y/%m/thumbs/", blank=True)
+    content_type = models.CharField(max_length=50)
+    size = models.PositiveIntegerField(help_text="Size of the original in bytes")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    thumbnail_width = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail_height = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text="Pending until the thumbnail has been generated",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Attachment {self.id} in thread {self.thread_id} ({self.status})"
+
+
+class ChatArchiveBlock(models.Model):
+    """
+    A compressed block of old messages moved out of ChatMessage.
+    Blocks cover contiguous seq ranges so reads can fall through to them.
+    """
+
+    thread = models.ForeignKey(
+        ChatThread,
+        on_delete=models.CASCADE,
+        related_name="archive_blocks",
+    )
+    first_seq = models.PositiveIntegerField()
+    last_seq = models.PositiveIntegerField()
+    message_count = models.PositiveIntegerField()
+    first_sent_at = models.DateTimeField()
+    last_sent_at = models.DateTimeField()
+    payload = models.BinaryField(help_text="zlib-compressed JSON list of messages")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["thread", "first_seq"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread", "first_seq"],
+                name="unique_archive_block_start_per_thread",
+            ),
+        ]
 
+    def __str__(self):
+        return f"Archive of thread {self.thread_id}: seq {self.first_seq}-{self.last_seq}"
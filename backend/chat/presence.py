@@ -0,0 +1,78 @@
+"""
+Online/last-seen presence and typing indicators.
+
+State is ephemeral and lives only in the cache with TTLs, never in the
+database. Heartbeats are coalesced per process: a user's presence key is
+rewritten at most once per PRESENCE_HEARTBEAT_COALESCE seconds, and
+lookups for a whole inbox are served by a single get_many call.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Bound on the per-process coalescing table before stale entries are pruned
+MAX_TRACKED_USERS = 10000
+
+_last_written = {}  # user_id -> epoch seconds of the last presence write
+_lock = threading.Lock()
+
+
+def presence_key(user_id):
+    return f"chat:presence:{user_id}"
+
+
+def typing_key(thread_id, user_id):
+    return f"chat:typing:{thread_id}:{user_id}"
+
+
+def heartbeat(user_id):
+    """Record that a user is online. Returns False if coalesced into a recent write."""
+    now = time.time()
+    with _lock:
+        last = _last_written.get(user_id)
+        if last is not None and now - last < settings.PRESENCE_HEARTBEAT_COALESCE:
+            return False
+        _last_written[user_id] = now
+        if len(_last_written) > MAX_TRACKED_USERS:
+            cutoff = now - settings.PRESENCE_HEARTBEAT_COALESCE
+            for stale_id in [uid for uid, ts in _last_written.items() if ts < cutoff]:
+                del _last_written[stale_id]
+
+    cache.set(presence_key(user_id), now, settings.PRESENCE_LAST_SEEN_TTL)
+    return True
+
+
+def set_typing(thread_id, user_id, is_typing=True):
+    """Start (or refresh) or stop a user's typing indicator in a thread."""
+    key = typing_key(thread_id, user_id)
+    if is_typing:
+        cache.set(key, True, settings.CHAT_TYPING_TTL)
+    else:
+        cache.delete(key)
+
+
+def get_thread_presence(pairs):
+    """
+    Look up presence for many (thread_id, user_id) pairs in one cache call.
+    Returns {thread_id: {"online", "last_seen", "is_typing"}}.
+    """
+    pairs = list(pairs)
+    keys = []
+    for thread_id, user_id in pairs:
+        keys += [presence_key(user_id), typing_key(thread_id, user_id)]
+    values = cache.get_many(keys)
+
+    now = time.time()
+    result = {}
+    for thread_id, user_id in pairs:
+        seen = values.get(presence_key(user_id))
+        result[thread_id] = {
+            "online": seen is not None and now - seen < settings.PRESENCE_ONLINE_WINDOW,
+            "last_seen": datetime.fromtimestamp(seen, tz=timezone.utc) if seen else None,
+            "is_typing": bool(values.get(typing_key(thread_id, user_id))),
+        }
+    return result
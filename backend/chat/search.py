@@ -0,0 +1,100 @@
+"""
+Full-text search over chat messages.
+
+SQLite keeps an external-content FTS5 table (chat_chatmessage_fts) in sync
+with chat_chatmessage through triggers; PostgreSQL uses a GIN index on
+to_tsvector('simple', content). Both are created by migration 0005, so new
+messages are indexed on insert, including bulk inserts.
+
+Results are ordered by rank (lower is better on both backends) and paged
+with a (rank, id) keyset cursor. Messages moved to archive blocks leave the
+index, so only hot messages are searchable.
+"""
+
+import base64
+import json
+
+from django.db import connection
+
+FTS_TABLE = "chat_chatmessage_fts"
+TS_CONFIG = "simple"
+
+SQLITE_SEARCH_SQL = f"""
+    SELECT id, rank FROM (
+        SELECT m.id AS id, bm25({FTS_TABLE}) AS rank
+        FROM {FTS_TABLE}
+        JOIN chat_chatmessage m ON m.id = {FTS_TABLE}.rowid
+        JOIN chat_chatthread t ON t.id = m.thread_id
+        WHERE {FTS_TABLE} MATCH %s {{scope}}
+    ) AS hits
+    {{cursor}}
+    ORDER BY rank, id
+    LIMIT %s
+"""
+
+POSTGRES_SEARCH_SQL = f"""
+    SELECT id, rank FROM (
+        SELECT m.id AS id, -ts_rank(to_tsvector('{TS_CONFIG}', m.content), query) AS rank
+        FROM chat_chatmessage m
+        JOIN chat_chatthread t ON t.id = m.thread_id,
+        plainto_tsquery('{TS_CONFIG}', %s) AS query
+        WHERE to_tsvector('{TS_CONFIG}', m.content) @@ query {{scope}}
+    ) AS hits
+    {{cursor}}
+    ORDER BY rank, id
+    LIMIT %s
+"""
+
+
+def _fts5_query(query):
+    """Quote each term so user input is matched literally (terms are ANDed)."""
+    terms = query.split()
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def encode_cursor(rank, message_id):
+    """Encode the last hit of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps([rank, message_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor. Raises ValueError if malformed."""
+    try:
+        rank, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(message_id)
+    except (TypeError, json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def search_message_ids(query, limit, user_id=None, thread_id=None, after=None):
+    """
+    Return [(message_id, rank), ...] for messages matching `query`, best first.
+
+    `user_id` scopes the search to that user's threads, `thread_id` to a
+    single thread, and `after` is the (rank, id) of the previous page's last hit.
+    """
+    if connection.vendor == "sqlite":
+        sql, match = SQLITE_SEARCH_SQL, _fts5_query(query)
+    else:
+        sql, match = POSTGRES_SEARCH_SQL, query
+    if not match.strip():
+        return []
+
+    params = [match]
+    scope = ""
+    if user_id is not None:
+        scope += " AND (t.user1_id = %s OR t.user2_id = %s)"
+        params += [user_id, user_id]
+    if thread_id is not None:
+        scope += " AND m.thread_id = %s"
+        params.append(thread_id)
+
+    cursor_clause = ""
+    if after is not None:
+        cursor_clause = "WHERE rank > %s OR (rank = %s AND id > %s)"
+        params += [after[0], after[0], after[1]]
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(scope=scope, cursor=cursor_clause), params)
+        return [(message_id, rank) for message_id, rank in cursor.fetchall()]
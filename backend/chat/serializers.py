@@ -1,13 +1,39 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from profiles.serializers import PublicProfileSerializer
+from profiles.serializers import PublicProfileSerializer, SignedMediaField
 
-from .models import ChatMessage, ChatThread
+from . import archive, attachments, presence
+from .models import ChatAttachment, ChatMessage, ChatThread
+
+
+class ChatAttachmentSerializer(serializers.ModelSerializer):
+    """Serializer for an image attachment (signed URLs and stored dimensions only)."""
+
+    original = SignedMediaField()
+    thumbnail = SignedMediaField()
+
+    class Meta:
+        model = ChatAttachment
+        fields = (
+            "id",
+            "status",
+            "content_type",
+            "size",
+            "original",
+            "width",
+            "height",
+            "thumbnail",
+            "thumbnail_width",
+            "thumbnail_height",
+        )
+        read_only_fields = fields
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     """Serializer for chat messages."""
 
+    attachment = ChatAttachmentSerializer(read_only=True)
     is_mine = serializers.SerializerMethodField()
 
     class Meta:
@@ -15,19 +41,21 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "thread",
+            "seq",
             "sender",
             "content",
+            "attachment",
             "sent_at",
             "read_at",
             "is_mine",
         )
-        read_only_fields = ("id", "sender", "sent_at", "read_at", "is_mine")
+        read_only_fields = ("id", "seq", "sender", "attachment", "sent_at", "read_at", "is_mine")
 
     def get_is_mine(self, obj):
         """Check if the current user is the sender."""
         request = self.context.get("request")
         if request and request.user:
-            return obj.sender == request.user
+            return obj.sender_id == request.user.id
         return False
 
 
@@ -47,10 +75,57 @@ class ChatMessageCreateSerializer(serializers.ModelSerializer):
         return value.strip()
 
 
+class ChatAttachmentUploadSerializer(serializers.Serializer):
+    """Serializer for an image upload with an optional caption."""
+
+    image = serializers.FileField()
+    content = serializers.CharField(max_length=2000, required=False, allow_blank=True, default="")
+
+    def validate_image(self, value):
+        """Check format and dimensions from the image header only."""
+        try:
+            image_format, width, height = attachments.sniff_image(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        self.image_info = {
+            "content_type": attachments.ALLOWED_FORMATS[image_format],
+            "width": width,
+            "height": height,
+        }
+        return value
+
+    def validate_content(self, value):
+        return value.strip()
+
+
+class ChatBatchMessageSerializer(ChatMessageCreateSerializer):
+    """Serializer for one queued message in a batch send."""
+
+    thread = serializers.IntegerField(help_text="ID of the thread to send to")
+    client_id = serializers.CharField(
+        max_length=64,
+        help_text="Client-generated idempotency key",
+    )
+
+    class Meta(ChatMessageCreateSerializer.Meta):
+        fields = ("thread", "client_id", "content")
+
+
+class ChatBatchSendSerializer(serializers.Serializer):
+    """Serializer for a batch of queued messages (validated item by item)."""
+
+    messages = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.CHAT_BATCH_SEND_MAX_MESSAGES,
+    )
+
+
 class ChatThreadSerializer(serializers.ModelSerializer):
     """Serializer for chat threads with last message preview."""
 
     other_user_profile = serializers.SerializerMethodField()
+    other_user_presence = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
 
@@ -61,12 +136,14 @@ class ChatThreadSerializer(serializers.ModelSerializer):
             "user1",
             "user2",
             "other_user_profile",
+            "other_user_presence",
             "last_message",
             "unread_count",
             "created_at",
             "last_message_at",
+            "last_seq",
         )
-        read_only_fields = ("id", "user1", "user2", "created_at", "last_message_at")
+        read_only_fields = ("id", "user1", "user2", "created_at", "last_message_at", "last_seq")
 
     def get_other_user_profile(self, obj):
         """Get the profile of the other user in the thread."""
@@ -76,14 +153,28 @@ class ChatThreadSerializer(serializers.ModelSerializer):
             return PublicProfileSerializer(other_user.profile).data
         return None
 
+    def get_other_user_presence(self, obj):
+        """Get the other user's presence (batched via context["presence"] when listing)."""
+        request = self.context.get("request")
+        if not (request and request.user):
+            return None
+        batch = self.context.get("presence")
+        if batch is None:
+            batch = presence.get_thread_presence([(obj.id, obj.get_other_user_id(request.user))])
+        return batch.get(obj.id)
+
     def get_last_message(self, obj):
         """Get the last message in the thread."""
         last_message = obj.messages.last()
+        if last_message is None and obj.archived_seq:
+            last_message = archive.fetch_last_message(obj)
         if last_message:
             return {
                 "id": last_message.id,
-                "sender_id": last_message.sender.id,
+                "seq": last_message.seq,
+                "sender_id": last_message.sender_id,
                 "content": last_message.content,
+                "has_attachment": last_message.attachment_id is not None,
                 "sent_at": last_message.sent_at,
                 "read_at": last_message.read_at,
             }
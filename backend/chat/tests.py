@@ -1,13 +1,34 @@
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from connections.models import Connection
+from outbox.dispatch import drain_all
+from outbox.models import OutboxEvent
 from profiles.models import Profile
 
-from .models import ChatMessage, ChatThread
+from . import events, presence, throttling
+from .models import ChatArchiveBlock, ChatAttachment, ChatMessage, ChatThread
 
 User = get_user_model()
 
@@ -16,6 +37,7 @@ class ChatThreadTests(TestCase):
     """Test suite for chat thread functionality."""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         
         # Create users
@@ -131,6 +153,7 @@ class ChatMessageTests(TestCase):
     """Test suite for chat message functionality."""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         
         # Create users and connection
@@ -149,7 +172,7 @@ class ChatMessageTests(TestCase):
         Profile.objects.create(user=self.user1)
         Profile.objects.create(user=self.user2)
         
-        Connection.objects.create(
+        self.connection = Connection.objects.create(
             from_user=self.user1,
             to_user=self.user2,
             status=Connection.Status.ACCEPTED,
@@ -190,6 +213,25 @@ class ChatMessageTests(TestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_send_permission_cache_invalidated_on_block(self):
+        """Test a cached send permission is dropped when the connection is blocked."""
+        response = self.client.post(self.messages_url, {"content": "Before block"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.connection.block()
+
+        response = self.client.post(self.messages_url, {"content": "After block"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_send_permission_cached(self):
+        """Test repeat sends skip the connection lookups."""
+        self.client.post(self.messages_url, {"content": "Warm the cache"})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.messages_url, {"content": "Hot path"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any("connections_connection" in q["sql"] for q in queries))
+
     def test_get_messages(self):
         """Test retrieving messages from thread."""
         # Create some messages
@@ -242,3 +284,609 @@ class ChatMessageTests(TestCase):
         
         unread_count = self.thread.get_unread_count(self.user1)
         self.assertEqual(unread_count, 2)
+
+    def test_messages_get_sequential_seq(self):
+        """Test messages are numbered per thread without gaps."""
+        first = ChatMessage.objects.create(thread=self.thread, sender=self.user1, content="One")
+        second = ChatMessage.objects.create(thread=self.thread, sender=self.user2, content="Two")
+        self.assertEqual((first.seq, second.seq), (1, 2))
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_seq, 2)
+
+        # Sequences are independent per thread
+        user3 = User.objects.create_user(
+            email="third@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        other_thread, _ = ChatThread.get_or_create_thread(self.user1, user3)
+        other = ChatMessage.objects.create(thread=other_thread, sender=self.user1, content="Hi")
+        self.assertEqual(other.seq, 1)
+
+    def test_get_messages_after_seq(self):
+        """Test syncing messages after a known seq."""
+        for i in range(3):
+            ChatMessage.objects.create(thread=self.thread, sender=self.user2, content=f"Message {i}")
+
+        response = self.client.get(self.messages_url, {"after_seq": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m["seq"] for m in response.data["results"]], [2, 3])
+        self.assertEqual(response.data["last_seq"], 3)
+
+    def test_get_messages_invalid_after_seq(self):
+        """Test non-integer after_seq is rejected."""
+        response = self.client.get(self.messages_url, {"after_seq": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mark_as_read_advances_watermark(self):
+        """Test reading advances the watermark without touching later messages."""
+        read_message = ChatMessage.objects.create(thread=self.thread, sender=self.user2, content="Old")
+        self.client.post(self.mark_read_url)
+
+        new_message = ChatMessage.objects.create(thread=self.thread, sender=self.user2, content="New")
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.get_last_read_seq(self.user1), read_message.seq)
+        self.assertEqual(self.thread.get_unread_count(self.user1), 1)
+
+        response = self.client.get(self.messages_url)
+        read_at = {m["id"]: m["read_at"] for m in response.data["results"]}
+        self.assertIsNotNone(read_at[read_message.id])
+        self.assertIsNone(read_at[new_message.id])
+
+
+class ChatBatchSendTests(TestCase):
+    """Test suite for batched, idempotent message sending."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+        self.user1 = User.objects.create_user(
+            email="outbox@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="friend@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.stranger = User.objects.create_user(
+            email="stranger@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+
+        Connection.objects.create(
+            from_user=self.user1,
+            to_user=self.user2,
+            status=Connection.Status.ACCEPTED,
+        )
+
+        self.thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        self.stranger_thread, _ = ChatThread.get_or_create_thread(self.user1, self.stranger)
+        self.client.force_authenticate(user=self.user1)
+        self.batch_url = reverse("chat:message-batch-send")
+
+    def test_batch_send_creates_messages(self):
+        """Test queued messages are stored in order with sequential seqs."""
+        payload = {"messages": [
+            {"thread": self.thread.id, "client_id": "a-1", "content": "First"},
+            {"thread": self.thread.id, "client_id": "a-2", "content": "Second"},
+        ]}
+        response = self.client.post(self.batch_url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data["results"]
+        self.assertEqual([r["status"] for r in results], ["created", "created"])
+        self.assertEqual([r["message"]["seq"] for r in results], [1, 2])
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_seq, 2)
+        self.assertIsNotNone(self.thread.last_message_at)
+
+    def test_batch_send_retry_is_idempotent(self):
+        """Test replaying the same client_ids does not create duplicates."""
+        payload = {"messages": [
+            {"thread": self.thread.id, "client_id": "b-1", "content": "Hello"},
+        ]}
+        self.client.post(self.batch_url, payload, format="json")
+        response = self.client.post(self.batch_url, payload, format="json")
+
+        self.assertEqual(response.data["results"][0]["status"], "duplicate")
+        self.assertEqual(ChatMessage.objects.filter(thread=self.thread).count(), 1)
+
+    def test_batch_send_reports_per_item_errors(self):
+        """Test unauthorized threads and invalid items fail individually."""
+        payload = {"messages": [
+            {"thread": self.thread.id, "client_id": "c-1", "content": "Allowed"},
+            {"thread": self.stranger_thread.id, "client_id": "c-2", "content": "Not connected"},
+            {"thread": self.thread.id, "client_id": "c-3", "content": "   "},
+        ]}
+        response = self.client.post(self.batch_url, payload, format="json")
+
+        statuses = [r["status"] for r in response.data["results"]]
+        self.assertEqual(statuses, ["created", "error", "error"])
+        self.assertEqual(ChatMessage.objects.count(), 1)
+
+
+class ChatMessageSearchTests(TestCase):
+    """Test suite for full-text message search."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+        self.user1 = User.objects.create_user(
+            email="searcher@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="partner@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user3 = User.objects.create_user(
+            email="outsider@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+
+        self.thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        self.other_thread, _ = ChatThread.get_or_create_thread(self.user2, self.user3)
+        self.client.force_authenticate(user=self.user1)
+        self.search_url = reverse("chat:message-search")
+
+    def test_search_scoped_to_own_threads(self):
+        """Test search finds matching messages only in the caller's threads."""
+        mine = ChatMessage.objects.create(thread=self.thread, sender=self.user2, content="Football on Saturday?")
+        ChatMessage.objects.create(thread=self.thread, sender=self.user1, content="Sounds good")
+        ChatMessage.objects.create(thread=self.other_thread, sender=self.user3, content="Football tonight")
+
+        response = self.client.get(self.search_url, {"q": "football"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m["id"] for m in response.data["results"]], [mine.id])
+
+    def test_search_keyset_pagination(self):
+        """Test results page with a cursor without repeats."""
+        for i in range(3):
+            ChatMessage.objects.create(thread=self.thread, sender=self.user2, content=f"coffee meetup {i}")
+
+        first = self.client.get(self.search_url, {"q": "coffee", "limit": 2})
+        self.assertEqual(len(first.data["results"]), 2)
+        self.assertIsNotNone(first.data["next_cursor"])
+
+        second = self.client.get(self.search_url, {"q": "coffee", "limit": 2, "cursor": first.data["next_cursor"]})
+        seen = [m["id"] for m in first.data["results"] + second.data["results"]]
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(set(seen)), 3)
+
+    def test_search_reports_archived_messages_excluded(self):
+        """Test archived messages drop out of search and the response says so."""
+        ChatMessage.objects.create(thread=self.thread, sender=self.user2, content="Picnic last year")
+        ChatMessage.objects.update(sent_at=timezone.now() - timedelta(days=400))
+        ChatMessage.objects.create(thread=self.other_thread, sender=self.user3, content="Picnic plans")
+
+        response = self.client.get(self.search_url, {"q": "picnic"})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertFalse(response.data["archived_messages_excluded"])
+
+        call_command("archive_chat_messages", "--older-than-days=365", stdout=StringIO())
+        response = self.client.get(self.search_url, {"q": "picnic"})
+        self.assertEqual(response.data["results"], [])
+        self.assertTrue(response.data["archived_messages_excluded"])
+
+        self.client.force_authenticate(user=self.user3)
+        response = self.client.get(self.search_url, {"q": "picnic", "thread": self.other_thread.id})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertFalse(response.data["archived_messages_excluded"])
+
+    def test_search_limit_is_clamped(self):
+        """Test out-of-range limits are clamped and non-integer limits are rejected."""
+        ChatMessage.objects.create(thread=self.thread, sender=self.user2, content="coffee meetup")
+
+        for limit in (0, -5):
+            response = self.client.get(self.search_url, {"q": "coffee", "limit": limit})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), 1)
+
+        response = self.client.get(self.search_url, {"q": "nothing-matches", "limit": 1})
+        self.assertIsNone(response.data["next_cursor"])
+
+        response = self.client.get(self.search_url, {"q": "coffee", "limit": "ten"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_requires_query(self):
+        """Test an empty query is rejected."""
+        response = self.client.get(self.search_url, {"q": " "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ChatPresenceTests(TestCase):
+    """Test suite for presence and typing indicators."""
+
+    def setUp(self):
+        cache.clear()
+        presence._last_written.clear()
+        self.client = APIClient()
+
+        self.user1 = User.objects.create_user(
+            email="online1@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="online2@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        Profile.objects.create(user=self.user1)
+        Profile.objects.create(user=self.user2)
+
+        self.thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        self.client.force_authenticate(user=self.user1)
+        self.thread_list_url = reverse("chat:thread-list")
+
+    def test_thread_list_includes_presence(self):
+        """Test the inbox shows the other user's presence and typing state."""
+        response = self.client.get(self.thread_list_url)
+        self.assertFalse(response.data["results"][0]["other_user_presence"]["online"])
+
+        presence.heartbeat(self.user2.id)
+        presence.set_typing(self.thread.id, self.user2.id)
+
+        response = self.client.get(self.thread_list_url)
+        other = response.data["results"][0]["other_user_presence"]
+        self.assertTrue(other["online"])
+        self.assertTrue(other["is_typing"])
+        self.assertIsNotNone(other["last_seen"])
+
+    def test_heartbeats_are_coalesced(self):
+        """Test repeated heartbeats only write presence once per interval."""
+        self.assertTrue(presence.heartbeat(self.user1.id))
+        self.assertFalse(presence.heartbeat(self.user1.id))
+
+    def test_typing_endpoint(self):
+        """Test setting and clearing the typing indicator."""
+        url = reverse("chat:thread-typing", args=[self.thread.id])
+        response = self.client.post(url, {"is_typing": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        state = presence.get_thread_presence([(self.thread.id, self.user1.id)])
+        self.assertTrue(state[self.thread.id]["is_typing"])
+
+        self.client.post(url, {"is_typing": False}, format="json")
+        state = presence.get_thread_presence([(self.thread.id, self.user1.id)])
+        self.assertFalse(state[self.thread.id]["is_typing"])
+
+
+class ChatInboxEventsTests(TestCase):
+    """Test suite for inbox server-sent events."""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            email="events1@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="events2@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.since = (timezone.now() - timedelta(seconds=1), 0)
+
+    def test_new_thread_and_message_events(self):
+        """Test new threads and messages produce thread-level events in order."""
+        thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+
+        batch, cursor = events.collect_inbox_events(self.user1, self.since)
+        self.assertEqual([e["event"] for e in batch], ["thread.created"])
+
+        ChatMessage.objects.create(thread=thread, sender=self.user2, content="Hello there")
+        batch, cursor = events.collect_inbox_events(self.user1, cursor)
+        self.assertEqual([e["event"] for e in batch], ["thread.message"])
+        self.assertEqual(batch[0]["data"]["unread_count"], 1)
+        self.assertEqual(batch[0]["data"]["last_message"]["preview"], "Hello there")
+
+        # Nothing new since the cursor
+        batch, _ = events.collect_inbox_events(self.user1, cursor)
+        self.assertEqual(batch, [])
+
+    def test_read_produces_unread_change_event(self):
+        """Test marking a thread read emits an event with the new unread count."""
+        thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        ChatMessage.objects.create(thread=thread, sender=self.user2, content="Unread")
+        _, cursor = events.collect_inbox_events(self.user1, self.since)
+
+        thread.mark_as_read(self.user1)
+        batch, _ = events.collect_inbox_events(self.user1, cursor)
+        self.assertEqual(batch[0]["event"], "thread.read")
+        self.assertEqual(batch[0]["data"]["unread_count"], 0)
+
+    def test_threads_sharing_a_timestamp_are_not_skipped(self):
+        """Test paging on (updated_at, id) delivers every thread touched at the same moment."""
+        user3 = User.objects.create_user(email="events3@example.com", password="TestPass123!", is_active=True)
+        first, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        second, _ = ChatThread.get_or_create_thread(self.user1, user3)
+        ChatThread.objects.update(updated_at=timezone.now())
+
+        batch, cursor = events.collect_inbox_events(self.user1, self.since, limit=1)
+        self.assertEqual([e["data"]["thread_id"] for e in batch], [first.id])
+        batch, cursor = events.collect_inbox_events(self.user1, cursor, limit=1)
+        self.assertEqual([e["data"]["thread_id"] for e in batch], [second.id])
+        self.assertEqual(events.parse_event_id(batch[0]["id"]), cursor)
+
+    def test_last_message_falls_back_to_archive(self):
+        """Test a thread whose messages were all archived still reports its last message."""
+        thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        ChatMessage.objects.create(thread=thread, sender=self.user2, content="Long ago")
+        ChatMessage.objects.update(sent_at=timezone.now() - timedelta(days=400))
+        call_command("archive_chat_messages", "--older-than-days=365", stdout=StringIO())
+        self.assertFalse(thread.messages.exists())
+
+        batch, _ = events.collect_inbox_events(self.user1, self.since)
+        self.assertEqual(batch[0]["data"]["last_message"]["preview"], "Long ago")
+
+    def test_event_ids_round_trip(self):
+        """Test event ids resume from the exact timestamp and thread."""
+        moment = timezone.now()
+        self.assertEqual(events.parse_event_id(events.event_id_for(moment, 7)), (moment, 7))
+        # Ids without a thread part resume before every thread at that moment
+        self.assertEqual(events.parse_event_id(events.event_id_for(moment).split("-")[0]), (moment, 0))
+
+    def test_stream_requires_authentication(self):
+        """Test the event stream rejects anonymous clients."""
+        response = self.client.get(reverse("chat:inbox-events"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ChatArchiveTests(TestCase):
+    """Test suite for moving old messages to cold storage."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user1 = User.objects.create_user(
+            email="archivist@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="pen-pal@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        for i in range(5):
+            ChatMessage.objects.create(thread=self.thread, sender=self.user2, content=f"Message {i + 1}")
+
+        # Age the first three messages past the archive cutoff
+        ChatMessage.objects.filter(seq__lte=3).update(sent_at=timezone.now() - timedelta(days=400))
+        call_command("archive_chat_messages", "--older-than-days=365", "--block-size=2", stdout=StringIO())
+
+        self.client.force_authenticate(user=self.user1)
+        self.messages_url = reverse("chat:thread-messages", args=[self.thread.id])
+
+    def test_old_messages_moved_to_blocks(self):
+        """Test old messages leave the hot table in compressed blocks."""
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.archived_seq, 3)
+        self.assertEqual(ChatMessage.objects.filter(thread=self.thread).count(), 2)
+        self.assertEqual(ChatArchiveBlock.objects.filter(thread=self.thread).count(), 2)
+
+    def test_after_seq_reads_fall_through_to_archive(self):
+        """Test syncing from the start returns archived then hot messages."""
+        response = self.client.get(self.messages_url, {"after_seq": 0})
+        self.assertEqual([m["seq"] for m in response.data["results"]], [1, 2, 3, 4, 5])
+        self.assertEqual(response.data["results"][0]["content"], "Message 1")
+
+    def test_paging_spans_archive_and_hot_range(self):
+        """Test page-based reads keep counting archived messages."""
+        response = self.client.get(self.messages_url, {"page": 2, "page_size": 2})
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual([m["seq"] for m in response.data["results"]], [3, 4])
+
+
+class ChatAttachmentTests(TestCase):
+    """Test suite for image attachments."""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.client = APIClient()
+        self.user1 = User.objects.create_user(
+            email="photographer@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="viewer@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        Connection.objects.create(
+            from_user=self.user1,
+            to_user=self.user2,
+            status=Connection.Status.ACCEPTED,
+        )
+        self.thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        self.client.force_authenticate(user=self.user1)
+        self.url = reverse("chat:thread-attachments", args=[self.thread.id])
+
+    def make_image(self, size=(800, 600), image_format="PNG", name="photo.png"):
+        buffer = BytesIO()
+        Image.new("RGB", size, color=(200, 40, 40)).save(buffer, image_format)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=f"image/{image_format.lower()}")
+
+    def test_upload_creates_pending_attachment_message(self):
+        """Test an upload creates a message whose attachment awaits processing."""
+        response = self.client.post(self.url, {"image": self.make_image(), "content": "Look!"}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["content"], "Look!")
+        self.assertEqual(response.data["attachment"]["status"], ChatAttachment.Status.PENDING)
+        self.assertEqual(response.data["attachment"]["width"], 800)
+        self.assertEqual(response.data["attachment"]["content_type"], "image/png")
+        self.assertEqual(self.thread.messages.get().attachment_id, response.data["attachment"]["id"])
+        event = OutboxEvent.objects.get(topic="chat_attachment.uploaded")
+        self.assertEqual(event.payload, {"attachment_id": response.data["attachment"]["id"]})
+
+    @override_settings(CHAT_ATTACHMENT_MAX_DIMENSION=400, CHAT_ATTACHMENT_THUMBNAIL_SIZE=100)
+    def test_processing_downscales_and_thumbnails(self):
+        """Test processing bounds the original and writes a thumbnail."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        drain_all()
+        attachment = ChatAttachment.objects.get(pk=response.data["attachment"]["id"])
+
+        self.assertEqual(attachment.status, ChatAttachment.Status.READY)
+        self.assertEqual((attachment.width, attachment.height), (400, 300))
+        self.assertEqual((attachment.thumbnail_width, attachment.thumbnail_height), (100, 75))
+        with Image.open(attachment.thumbnail) as thumbnail:
+            self.assertEqual(thumbnail.size, (100, 75))
+
+    def test_attachment_urls_are_signed(self):
+        """Test attachments are only served from signed URLs and never cached as immutable."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        drain_all()
+        attachment = ChatAttachment.objects.get(pk=response.data["attachment"]["id"])
+        messages = self.client.get(reverse("chat:thread-messages", args=[self.thread.id])).data["results"]
+        url = messages[0]["attachment"]["thumbnail"]
+        self.assertIn("?sig=", url)
+
+        self.assertEqual(self.client.get(attachment.thumbnail.url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        response.close()
+
+    def test_upload_rejects_non_image(self):
+        """Test files that are not images are rejected before anything is stored."""
+        upload = SimpleUploadedFile("notes.png", b"definitely not a png", content_type="image/png")
+        response = self.client.post(self.url, {"image": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChatAttachment.objects.exists())
+
+    def test_upload_rejects_decompression_bomb(self):
+        """Test a PNG whose header claims 20000x20000 pixels is rejected rather than erroring."""
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        header = struct.pack(">IIBBBBB", 20000, 20000, 8, 2, 0, 0, 0)
+        data = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"\0")) + chunk(b"IEND", b"")
+        upload = SimpleUploadedFile("bomb.png", data, content_type="image/png")
+        response = self.client.post(self.url, {"image": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChatAttachment.objects.exists())
+
+    def test_upload_requires_connection(self):
+        """Test attachments obey the same block checks as text messages."""
+        Connection.objects.filter(from_user=self.user1).update(status=Connection.Status.BLOCKED)
+        cache.clear()
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ChatSendThrottleTests(TestCase):
+    """Test suite for the token-bucket throttles on sending."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user1 = User.objects.create_user(
+            email="chatty@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.user2 = User.objects.create_user(
+            email="patient@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        Connection.objects.create(
+            from_user=self.user1,
+            to_user=self.user2,
+            status=Connection.Status.ACCEPTED,
+        )
+        self.thread, _ = ChatThread.get_or_create_thread(self.user1, self.user2)
+        self.client.force_authenticate(user=self.user1)
+        self.messages_url = reverse("chat:thread-messages", args=[self.thread.id])
+
+    def test_concurrent_takes_do_not_overdraw_bucket(self):
+        """Test simultaneous requests cannot all spend the same token."""
+        cache_get = LocMemCache.get
+
+        def slow_get(self, *args, **kwargs):
+            # Widen the read-modify-write window so an unguarded bucket would be overdrawn
+            value = cache_get(self, *args, **kwargs)
+            time.sleep(0.01)
+            return value
+
+        # Cache connections are per thread, so patch the class rather than `cache`
+        with mock.patch.object(LocMemCache, "get", slow_get), ThreadPoolExecutor(max_workers=8) as pool:
+            waits = list(pool.map(lambda _: throttling.take_token("chat:throttle:test", 5, 0.001), range(40)))
+        self.assertEqual(waits.count(0), 5)
+
+    @override_settings(CHAT_SEND_THROTTLE_RATE="2/min")
+    def test_sender_throttled_with_retry_after(self):
+        """Test exceeding the sender bucket returns 429 before anything is stored."""
+        for i in range(2):
+            response = self.client.post(self.messages_url, {"content": f"Hi {i}"})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(self.messages_url, {"content": "One too many"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(self.thread.messages.count(), 2)
+
+        # Reading the thread is not throttled
+        response = self.client.get(self.messages_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(CHAT_THREAD_SEND_THROTTLE_RATE="1/min")
+    def test_thread_bucket_is_per_sender(self):
+        """Test the per-thread bucket does not limit the other participant."""
+        self.client.post(self.messages_url, {"content": "First"})
+        response = self.client.post(self.messages_url, {"content": "Second"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.post(self.messages_url, {"content": "Reply"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(CHAT_BATCH_SEND_THROTTLE_RATE="1/min")
+    def test_batch_send_has_separate_limit(self):
+        """Test batch requests have their own bucket on top of the message buckets."""
+        batch_url = reverse("chat:message-batch-send")
+        payload = {"messages": [{"thread": self.thread.id, "client_id": "a1", "content": "Queued"}]}
+
+        response = self.client.post(batch_url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(batch_url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(CHAT_THREAD_SEND_THROTTLE_RATE="3/min")
+    def test_batch_messages_charge_send_buckets(self):
+        """Test each batched message costs a thread token, and a batch that cannot pay stores nothing."""
+        batch_url = reverse("chat:message-batch-send")
+
+        def batch(*client_ids):
+            messages = [{"thread": self.thread.id, "client_id": cid, "content": cid} for cid in client_ids]
+            return self.client.post(batch_url, {"messages": messages}, format="json")
+
+        self.assertEqual(batch("a1", "a2").status_code, status.HTTP_200_OK)
+        response = batch("b1", "b2")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.thread.messages.count(), 2)
+        # The failed batch took nothing, so the last token is still there
+        self.assertEqual(self.client.post(self.messages_url, {"content": "Single"}).status_code, status.HTTP_201_CREATED)
+
+        # More messages than the bucket can ever hold
+        self.assertEqual(batch("c1", "c2", "c3", "c4").status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,194 @@
+"""
+Token-bucket throttles for the chat write path.
+
+A bucket is a (tokens, updated_at) pair under a single cache key, checked
+in DRF's initial() before the view touches the database. Taking a token is
+atomic: on Redis it is one Lua script (a single round trip), and on
+per-process caches (LocMem in development) the read-modify-write runs under
+a process lock. If the cache backend errors, buckets fall back to process
+memory (limits then apply per worker) instead of failing the request.
+
+A batch send charges the sender and per-thread buckets one token per
+message, all at once, so batching cannot get around the send limits.
+
+Rates use DRF's "<count>/<period>" format: the bucket holds <count> tokens
+and refills at <count> per period. A rate of None disables the throttle.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Parse "30/min" into (capacity, tokens per second), or None."""
+    if not rate:
+        return None
+    count, period = rate.split("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def _refill(bucket, capacity, refill_rate, now):
+    """Tokens in a stored (tokens, updated_at) bucket at `now` (a missing bucket is full)."""
+    tokens, updated_at = bucket if bucket else (capacity, now)
+    return min(capacity, tokens + max(0, now - updated_at) * refill_rate)
+
+
+def _timeout(capacity, refill_rate):
+    # A bucket is back to full after this long, so it can expire from the cache
+    return math.ceil(capacity / refill_rate) + 1
+
+
+def _take(buckets, now, get, set):
+    """
+    Take `cost` tokens from every (key, capacity, refill_rate, cost) bucket,
+    or from none of them; return 0 or the seconds until all can pay.
+    """
+    levels = [_refill(get(key), capacity, refill_rate, now) for key, capacity, refill_rate, _ in buckets]
+    wait = max(
+        ((cost - level) / refill_rate for level, (_, _, refill_rate, cost) in zip(levels, buckets) if level < cost),
+        default=0,
+    )
+    for level, (key, capacity, refill_rate, cost) in zip(levels, buckets):
+        set(key, (level if wait else level - cost, now), _timeout(capacity, refill_rate))
+    return wait
+
+
+# Same arithmetic as _take, run server-side so concurrent requests cannot
+# both read the old buckets. ARGV is now, then capacity, refill rate, cost
+# and timeout per key. Floats travel as strings (Lua numbers are truncated
+# to integers in replies).
+TAKE_TOKENS_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local base = (i - 1) * 4 + 1
+    local capacity = tonumber(ARGV[base + 1])
+    local refill_rate = tonumber(ARGV[base + 2])
+    local cost = tonumber(ARGV[base + 3])
+    local bucket = redis.call("HMGET", key, "tokens", "updated_at")
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / refill_rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local base = (i - 1) * 4 + 1
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - tonumber(ARGV[base + 3])
+    end
+    redis.call("HMSET", key, "tokens", tostring(tokens), "updated_at", tostring(now))
+    redis.call("EXPIRE", key, ARGV[base + 4])
+end
+return tostring(wait)
+"""
+
+
+def _set_local(key, bucket, timeout):
+    _local_buckets[key] = bucket
+
+
+def _redis_client():
+    """The raw django_redis client, or None for other cache backends."""
+    client = getattr(cache, "client", None)
+    return client.get_client(write=True) if hasattr(client, "get_client") else None
+
+
+def take_tokens(buckets):
+    """
+    Charge (key, capacity, refill_rate, cost) buckets all at once: either
+    every bucket pays its cost or none does. Returns 0 or the seconds to wait.
+    """
+    now = time.time()
+    try:
+        redis = _redis_client()
+        if redis is not None:
+            script = redis.register_script(TAKE_TOKENS_SCRIPT)
+            args = [now]
+            for _, capacity, refill_rate, cost in buckets:
+                args += [capacity, refill_rate, cost, _timeout(capacity, refill_rate)]
+            return float(script(keys=[cache.make_key(key) for key, *_ in buckets], args=args))
+        with _local_lock:
+            return _take(buckets, now, cache.get, cache.set)
+    except Exception:
+        with _local_lock:
+            return _take(buckets, now, _local_buckets.get, _set_local)
+
+
+def take_token(key, capacity, refill_rate):
+    """Take a token from the bucket at `key`; return 0 or the seconds until one is free."""
+    return take_tokens([(key, capacity, refill_rate, 1)])
+
+
+def message_buckets(user_id, thread_counts):
+    """Sender and per-thread buckets charging one token per message ({thread_id: count})."""
+    buckets = [ChatSenderThrottle.bucket(user_id, sum(thread_counts.values()))]
+    buckets += [ChatThreadThrottle.bucket(f"{thread_id}:{user_id}", count) for thread_id, count in thread_counts.items()]
+    return [bucket for bucket in buckets if bucket is not None]
+
+
+class ChatTokenBucketThrottle(BaseThrottle):
+    """Base class: subclasses name the rate setting, scope and bucket key."""
+
+    rate_setting = None
+    scope = None
+
+    def get_ident_key(self, request, view):
+        return str(request.user.pk)
+
+    @classmethod
+    def bucket(cls, ident, cost=1):
+        """(key, capacity, refill_rate, cost) for take_tokens, or None if the throttle is off."""
+        rate = parse_rate(getattr(settings, cls.rate_setting))
+        if rate is None:
+            return None
+        return (f"chat:throttle:{cls.scope}:{ident}", *rate, cost)
+
+    def allow_request(self, request, view):
+        bucket = self.bucket(self.get_ident_key(request, view))
+        if bucket is None or not request.user.is_authenticated:
+            return True
+        self.retry_after = take_tokens([bucket])
+        return self.retry_after == 0
+
+    def wait(self):
+        return math.ceil(self.retry_after)
+
+
+class ChatSenderThrottle(ChatTokenBucketThrottle):
+    """Messages per sender across all threads."""
+
+    rate_setting = "CHAT_SEND_THROTTLE_RATE"
+    scope = "sender"
+
+
+class ChatThreadThrottle(ChatTokenBucketThrottle):
+    """Messages per sender in one thread (keyed on the sender too, so nobody can drain another pair's bucket)."""
+
+    rate_setting = "CHAT_THREAD_SEND_THROTTLE_RATE"
+    scope = "thread"
+
+    def get_ident_key(self, request, view):
+        return f"{view.kwargs.get('thread_id')}:{request.user.pk}"
+
+
+class ChatBatchSendThrottle(ChatTokenBucketThrottle):
+    """Batch send requests per sender (separate from single sends)."""
+
+    rate_setting = "CHAT_BATCH_SEND_THROTTLE_RATE"
+    scope = "batch"
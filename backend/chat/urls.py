@@ -1,17 +1,29 @@
 from django.urls import path
 
 from .views import (
+    ChatBatchSendView,
+    ChatMessageSearchView,
+    ChatThreadAttachmentsView,
     ChatThreadDetailView,
     ChatThreadListView,
     ChatThreadMarkReadView,
     ChatThreadMessagesView,
+    ChatThreadTypingView,
+    PresenceHeartbeatView,
+    inbox_event_stream,
 )
 
 app_name = "chat"
 
 urlpatterns = [
     path("", ChatThreadListView.as_view(), name="thread-list"),
+    path("events/", inbox_event_stream, name="inbox-events"),
+    path("presence/heartbeat/", PresenceHeartbeatView.as_view(), name="presence-heartbeat"),
+    path("messages/search/", ChatMessageSearchView.as_view(), name="message-search"),
+    path("messages/batch/", ChatBatchSendView.as_view(), name="message-batch-send"),
     path("<int:pk>/", ChatThreadDetailView.as_view(), name="thread-detail"),
     path("<int:thread_id>/messages/", ChatThreadMessagesView.as_view(), name="thread-messages"),
+    path("<int:thread_id>/attachments/", ChatThreadAttachmentsView.as_view(), name="thread-attachments"),
     path("<int:thread_id>/read/", ChatThreadMarkReadView.as_view(), name="thread-mark-read"),
+    path("<int:thread_id>/typing/", ChatThreadTypingView.as_view(), name="thread-typing"),
 ]
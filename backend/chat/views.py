@@ -1,19 +1,54 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
 from django.db.models import Q
-from rest_framework import generics, status
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import exceptions, generics, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from connections.models import Connection
+from outbox import dispatch as outbox
 
-from .models import ChatMessage, ChatThread
+from . import archive, events, presence, search, throttling
+from .throttling import ChatBatchSendThrottle, ChatSenderThrottle, ChatThreadThrottle
+from .models import ChatAttachment, ChatMessage, ChatThread
 from .serializers import (
+    ChatAttachmentUploadSerializer,
+    ChatBatchMessageSerializer,
+    ChatBatchSendSerializer,
     ChatMessageCreateSerializer,
     ChatMessageSerializer,
     ChatThreadSerializer,
 )
 
 
+def _messaging_denied(user, thread):
+    """Return a 403 response if the user may not post to the thread, else None."""
+    # Verify users are still connected and not blocked (cached relationship graph)
+    messaging_status = Connection.get_messaging_status(user.id, thread.get_other_user_id(user))
+    if messaging_status == Connection.MESSAGING_NOT_CONNECTED:
+        return Response(
+            {"error": "You must be connected to send messages."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    if messaging_status == Connection.MESSAGING_BLOCKED:
+        return Response(
+            {"error": "Cannot send messages to this user."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    return None
+
+
 class ChatThreadListView(APIView):
     """
     GET /api/v1/threads/ - List all chat threads for the current user
@@ -25,18 +60,27 @@ class ChatThreadListView(APIView):
         user = request.user
 
         # Get all threads where user is either user1 or user2
-        threads = ChatThread.objects.filter(
+        threads = list(ChatThread.objects.filter(
             Q(user1=user) | Q(user2=user)
         ).select_related("user1", "user2", "user1__profile", "user2__profile").prefetch_related(
             "user1__profile__photos",
             "user2__profile__photos",
             "messages",
+        ))
+
+        # One cache round trip for every counterpart's presence
+        thread_presence = presence.get_thread_presence(
+            (thread.id, thread.get_other_user_id(user)) for thread in threads
         )
 
-        serializer = ChatThreadSerializer(threads, many=True, context={"request": request})
+        serializer = ChatThreadSerializer(
+            threads,
+            many=True,
+            context={"request": request, "presence": thread_presence},
+        )
 
         return Response({
-            "count": threads.count(),
+            "count": len(threads),
             "results": serializer.data,
         })
 
@@ -61,6 +105,13 @@ class ChatThreadMessagesView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (ChatSenderThrottle, ChatThreadThrottle)
+
+    def get_throttles(self):
+        # Only sending is throttled; reads and syncs are not
+        if self.request.method != "POST":
+            return []
+        return super().get_throttles()
 
     def get_thread(self, thread_id):
         """Get thread and verify user is a participant."""
@@ -74,7 +125,12 @@ class ChatThreadMessagesView(APIView):
             return None
 
     def get(self, request, thread_id):
-        """Get messages in the thread (oldest first, paginated)."""
+        """
+        Get messages in the thread (oldest first, paginated).
+        Query params:
+          - after_seq: Only return messages with seq > after_seq (sync/catch-up)
+          - page, page_size: Pagination
+        """
         thread = self.get_thread(thread_id)
         if not thread:
             return Response(
@@ -82,17 +138,44 @@ class ChatThreadMessagesView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Get messages with pagination
-        page = int(request.query_params.get("page", 1))
         page_size = int(request.query_params.get("page_size", 50))
+        messages = thread.messages.select_related("attachment").order_by("seq")
+
+        # Seq-based sync: a pure range scan on the (thread, seq) index,
+        # falling through to archive blocks for seqs older than the hot range
+        after_seq = request.query_params.get("after_seq")
+        if after_seq is not None:
+            try:
+                after_seq = int(after_seq)
+            except ValueError:
+                return Response(
+                    {"error": "after_seq must be an integer."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            serializer = ChatMessageSerializer(
+                archive.fetch_messages(thread, after_seq, page_size),
+                many=True,
+                context={"request": request},
+            )
+            return Response({
+                "after_seq": after_seq,
+                "last_seq": thread.last_seq,
+                "page_size": page_size,
+                "results": serializer.data,
+            })
 
-        messages = thread.messages.select_related("sender").order_by("sent_at")
-        total_count = messages.count()
+        # Get messages with pagination
+        page = int(request.query_params.get("page", 1))
+        total_count = thread.archived_seq + messages.count()
 
-        # Calculate pagination
+        # Calculate pagination (archived messages are the oldest archived_seq positions)
         start = (page - 1) * page_size
-        end = start + page_size
-        paginated_messages = messages[start:end]
+        if start < thread.archived_seq:
+            paginated_messages = archive.fetch_messages(thread, start, page_size)
+        else:
+            start -= thread.archived_seq
+            paginated_messages = messages[start:start + page_size]
 
         serializer = ChatMessageSerializer(paginated_messages, many=True, context={"request": request})
 
@@ -100,6 +183,7 @@ class ChatThreadMessagesView(APIView):
             "count": total_count,
             "page": page,
             "page_size": page_size,
+            "last_seq": thread.last_seq,
             "results": serializer.data,
         })
 
@@ -112,31 +196,86 @@ class ChatThreadMessagesView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Verify users are still connected
-        other_user = thread.get_other_user(request.user)
-        if not Connection.are_connected(request.user, other_user):
-            return Response(
-                {"error": "You must be connected to send messages."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-
-        # Verify not blocked
-        if Connection.is_blocked(request.user, other_user):
-            return Response(
-                {"error": "Cannot send messages to this user."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+        denied = _messaging_denied(request.user, thread)
+        if denied:
+            return denied
 
         # Create message
         serializer = ChatMessageCreateSerializer(data=request.data)
         if serializer.is_valid():
             message = serializer.save(thread=thread, sender=request.user)
+            presence.heartbeat(request.user.id)
+            presence.set_typing(thread.id, request.user.id, False)
             response_serializer = ChatMessageSerializer(message, context={"request": request})
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ChatThreadAttachmentsView(ChatThreadMessagesView):
+    """
+    POST /api/v1/threads/{thread_id}/attachments/ - Send an image (multipart: image, content)
+
+    The upload is streamed to a temporary file rather than held in memory and
+    only its header is inspected here; the thumbnail is generated in the
+    background, so the attachment starts out with status "pending".
+    """
+
+    parser_classes = (MultiPartParser,)
+    http_method_names = ["post", "options"]
+
+    def post(self, request, thread_id):
+        # Reject oversized bodies before reading any of them
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > settings.CHAT_ATTACHMENT_MAX_BYTES + 64 * 1024:
+            return Response(
+                {"error": "Attachment too large."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        thread = self.get_thread(thread_id)
+        if not thread:
+            return Response(
+                {"error": "Thread not found or access denied."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        denied = _messaging_denied(request.user, thread)
+        if denied:
+            return denied
+
+        request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+        serializer = ChatAttachmentUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        image = serializer.validated_data["image"]
+        with transaction.atomic():
+            attachment = ChatAttachment.objects.create(
+                thread=thread,
+                uploader=request.user,
+                original=image,
+                size=image.size,
+                **serializer.image_info,
+            )
+            message = ChatMessage.objects.create(
+                thread=thread,
+                sender=request.user,
+                content=serializer.validated_data["content"],
+                attachment=attachment,
+            )
+            # The thumbnail is generated by the outbox worker, off the request
+            outbox.enqueue("chat_attachment.uploaded", attachment_id=attachment.id)
+
+        presence.heartbeat(request.user.id)
+        presence.set_typing(thread.id, request.user.id, False)
+        response_serializer = ChatMessageSerializer(message, context={"request": request})
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+
 class ChatThreadMarkReadView(APIView):
     """
     POST /api/v1/threads/{thread_id}/read/ - Mark all messages in thread as read
@@ -161,3 +300,289 @@ class ChatThreadMarkReadView(APIView):
 
         return Response({"status": "Messages marked as read."}, status=status.HTTP_200_OK)
 
+
+
+class ChatThreadTypingView(APIView):
+    """
+    POST /api/v1/threads/{thread_id}/typing/ - Start or stop the typing indicator
+    Body: {"is_typing": true|false}
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, thread_id):
+        if not ChatThread.objects.filter(
+            Q(id=thread_id),
+            Q(user1=request.user) | Q(user2=request.user),
+        ).exists():
+            return Response(
+                {"error": "Thread not found or access denied."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        is_typing = request.data.get("is_typing", True) not in (False, "false", "0", 0)
+        presence.set_typing(thread_id, request.user.id, is_typing)
+        presence.heartbeat(request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PresenceHeartbeatView(APIView):
+    """
+    POST /api/v1/threads/presence/heartbeat/ - Mark the current user as online
+    Heartbeats are coalesced; nothing is written to the database.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        presence.heartbeat(request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChatMessageSearchView(APIView):
+    """
+    GET /api/v1/threads/messages/search/ - Full-text search across the user's threads
+    Query params:
+      - q: Search terms (all terms must match)
+      - thread: Restrict to one thread
+      - limit: Page size (max 50)
+      - cursor: next_cursor from the previous page
+
+    Archived messages are not indexed; archived_messages_excluded is true
+    when any searched thread has some, so clients can say results are partial.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"error": "Search query is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), self.max_limit))
+            thread_id = request.query_params.get("thread")
+            thread_id = int(thread_id) if thread_id else None
+            cursor = request.query_params.get("cursor")
+            after = search.decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return Response(
+                {"error": "Invalid limit, thread or cursor."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        hits = search.search_message_ids(
+            query,
+            limit,
+            user_id=request.user.id,
+            thread_id=thread_id,
+            after=after,
+        )
+        messages = ChatMessage.objects.select_related("thread", "attachment").in_bulk([message_id for message_id, _ in hits])
+        ordered = [messages[message_id] for message_id, _ in hits if message_id in messages]
+
+        serializer = ChatMessageSerializer(ordered, many=True, context={"request": request})
+        next_cursor = search.encode_cursor(hits[-1][1], hits[-1][0]) if hits and len(hits) == limit else None
+
+        threads = ChatThread.objects.filter(Q(user1=request.user) | Q(user2=request.user), archived_seq__gt=0)
+        if thread_id is not None:
+            threads = threads.filter(pk=thread_id)
+
+        return Response({
+            "query": query,
+            "next_cursor": next_cursor,
+            "archived_messages_excluded": threads.exists(),
+            "results": serializer.data,
+        })
+
+
+class ChatBatchSendView(APIView):
+    """
+    POST /api/v1/threads/messages/batch/ - Send queued (offline) messages in bulk
+    Body: {"messages": [{"thread": <id>, "client_id": "<key>", "content": "..."}, ...]}
+
+    Each thread is authorized once and its messages are inserted with one
+    bulk_create. Every message costs a token from the sender and thread send
+    buckets, on top of the per-request batch limit. client_id makes retries idempotent: messages already stored
+    for the sender are returned as duplicates instead of being re-created.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    throttle_classes = (ChatBatchSendThrottle,)
+
+    def post(self, request):
+        batch = ChatBatchSendSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        items = batch.validated_data["messages"]
+        user = request.user
+
+        results = [None] * len(items)
+        pending = {}  # client_id -> (index, validated item)
+        for index, item in enumerate(items):
+            serializer = ChatBatchMessageSerializer(data=item)
+            if not serializer.is_valid():
+                results[index] = {
+                    "client_id": item.get("client_id"),
+                    "status": "error",
+                    "errors": serializer.errors,
+                }
+            elif serializer.validated_data["client_id"] in pending:
+                results[index] = {
+                    "client_id": serializer.validated_data["client_id"],
+                    "status": "error",
+                    "errors": {"client_id": ["Duplicate client_id in batch."]},
+                }
+            else:
+                pending[serializer.validated_data["client_id"]] = (index, serializer.validated_data)
+
+        self._resolve_duplicates(request, pending, results)
+
+        # Authorize each thread once
+        thread_ids = {data["thread"] for _, data in pending.values()}
+        threads = ChatThread.objects.filter(
+            Q(id__in=thread_ids),
+            Q(user1=user) | Q(user2=user),
+        ).in_bulk()
+
+        by_thread = {}
+        for client_id, (index, data) in pending.items():
+            thread = threads.get(data["thread"])
+            error = self._authorize(user, thread)
+            if error:
+                results[index] = {"client_id": client_id, "status": "error", "errors": error}
+            else:
+                by_thread.setdefault(thread, []).append((index, data))
+
+        # One token per message from the single-send buckets, or none at all
+        buckets = throttling.message_buckets(user.id, {thread.id: len(items) for thread, items in by_thread.items()})
+        if any(cost > capacity for _, capacity, _, cost in buckets):
+            return Response(
+                {"error": "Too many messages for the send rate limit; split the batch."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        wait = throttling.take_tokens(buckets)
+        if wait:
+            self.throttled(request, wait)
+
+        for thread, thread_items in by_thread.items():
+            self._send_to_thread(request, thread, thread_items, results)
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    def _authorize(self, user, thread):
+        """Return an error payload if the user may not post to the thread."""
+        if thread is None:
+            return {"thread": ["Thread not found or access denied."]}
+        messaging_status = Connection.get_messaging_status(user.id, thread.get_other_user_id(user))
+        if messaging_status == Connection.MESSAGING_NOT_CONNECTED:
+            return {"thread": ["You must be connected to send messages."]}
+        if messaging_status == Connection.MESSAGING_BLOCKED:
+            return {"thread": ["Cannot send messages to this user."]}
+        return None
+
+    def _resolve_duplicates(self, request, pending, results):
+        """Answer items whose client_id was already stored (earlier retry)."""
+        existing = ChatMessage.objects.filter(
+            sender=request.user,
+            client_id__in=list(pending),
+        ).select_related("thread", "attachment")
+        for message in existing:
+            index, _ = pending.pop(message.client_id)
+            results[index] = {
+                "client_id": message.client_id,
+                "status": "duplicate",
+                "message": ChatMessageSerializer(message, context={"request": request}).data,
+            }
+
+    def _send_to_thread(self, request, thread, thread_items, results):
+        """Insert a thread's messages in one transaction, retrying once on a key race."""
+        for _ in range(2):
+            messages = [
+                ChatMessage(
+                    sender=request.user,
+                    client_id=data["client_id"],
+                    content=data["content"],
+                )
+                for _, data in thread_items
+            ]
+            try:
+                created = thread.bulk_add_messages(messages)
+            except IntegrityError:
+                # A concurrent retry stored some of these keys first
+                pending = {data["client_id"]: (index, data) for index, data in thread_items}
+                self._resolve_duplicates(request, pending, results)
+                thread_items = list(pending.values())
+                if not thread_items:
+                    return
+                continue
+
+            for (index, data), message in zip(thread_items, created):
+                results[index] = {
+                    "client_id": data["client_id"],
+                    "status": "created",
+                    "message": ChatMessageSerializer(message, context={"request": request}).data,
+                }
+            return
+
+        for index, data in thread_items:
+            results[index] = {
+                "client_id": data["client_id"],
+                "status": "error",
+                "errors": {"non_field_errors": ["Could not store message, please retry."]},
+            }
+
+
+async def inbox_event_stream(request):
+    """
+    GET /api/v1/threads/events/ - Server-sent events stream of inbox updates
+    Resume with the Last-Event-ID header (or ?last_event_id=).
+
+    Emits thread.created, thread.message and thread.read events for the
+    user's threads, with a comment heartbeat to keep proxies from timing out.
+    The stream ends after CHAT_EVENTS_MAX_DURATION; clients reconnect and resume.
+    """
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as exc:
+        return JsonResponse({"error": str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return JsonResponse(
+            {"error": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    user = auth[0]
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        cursor = events.parse_event_id(last_event_id) if last_event_id else (timezone.now(), 0)
+    except (ValueError, OverflowError):
+        return JsonResponse({"error": "Invalid event id."}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(_inbox_events(user, cursor), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _inbox_events(user, cursor):
+    """Poll the user's threads and yield framed events until the stream expires."""
+    collect = sync_to_async(events.collect_inbox_events, thread_sensitive=False)
+    started = last_sent = time.monotonic()
+
+    yield f"retry: {settings.CHAT_EVENTS_POLL_INTERVAL * 1000}\n"
+    yield f"id: {events.event_id_for(*cursor)}\nevent: ready\ndata: {{}}\n\n"
+
+    while time.monotonic() - started < settings.CHAT_EVENTS_MAX_DURATION:
+        batch, cursor = await collect(user, cursor)
+        for event in batch:
+            yield events.format_event(event)
+        if batch:
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= settings.CHAT_EVENTS_HEARTBEAT_INTERVAL:
+            yield ": ping\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(settings.CHAT_EVENTS_POLL_INTERVAL)
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     "connections",
     "chat",
     "moderation",
+    "outbox",
 ]
 
 MIDDLEWARE = [
@@ -149,6 +150,17 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Cache lifetime (seconds) for content-addressed media, which never changes in place
+MEDIA_IMMUTABLE_MAX_AGE = config("MEDIA_IMMUTABLE_MAX_AGE", cast=int, default=60 * 60 * 24 * 365)
+# Media under these prefixes is only served from signed URLs, valid this many seconds
+MEDIA_SIGNED_PREFIXES = ["profile_photos/", "chat_attachments/"]
+# Prefixes stored by content hash (profiles.storage); only these are cached as immutable
+MEDIA_CONTENT_ADDRESSED_PREFIXES = ["profile_photos/"]
+MEDIA_SIGNED_URL_MAX_AGE = config("MEDIA_SIGNED_URL_MAX_AGE", cast=int, default=60 * 60)
+# "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd) to let the web server send media
+# files; empty streams them from Django. The nginx location must be internal and alias MEDIA_ROOT.
+MEDIA_SENDFILE_BACKEND = config("MEDIA_SENDFILE_BACKEND", default="")
+MEDIA_ACCEL_REDIRECT_LOCATION = config("MEDIA_ACCEL_REDIRECT_LOCATION", default="/protected-media/")
 
 AUTH_USER_MODEL = "accounts.User"
 
@@ -189,24 +201,105 @@ EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
 EMAIL_USE_TLS = config("EMAIL_USE_TLS", default=False, cast=bool)
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="noreply@nexa.app")
 
-# Cache configuration for rate limiting
-# Rate limiting requires Redis in production
-# In development, we'll disable rate limiting checks via RATELIMIT_ENABLE=False
+# Cache configuration for rate limiting and hot-path lookups
+# Production runs on Redis so every worker shares throttles and cached lookups.
+# Development and tests (DEBUG=True) fall back to a per-process memory cache
+# unless USE_REDIS=True is set explicitly.
+USE_REDIS = config("USE_REDIS", cast=bool, default=not DEBUG)
+
+REDIS_CACHE = {
+    "BACKEND": "django_redis.cache.RedisCache",
+    "LOCATION": config("REDIS_URL", default="redis://127.0.0.1:6379/1"),
+    "OPTIONS": {
+        "CLIENT_CLASS": "django_redis.client.DefaultClient",
+    },
+    "KEY_PREFIX": "nexa",
+}
+
 CACHES = {
-    "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": config("REDIS_URL", default="redis://127.0.0.1:6379/1"),
-        "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
-        },
-        "KEY_PREFIX": "nexa",
-    }
+    "default": REDIS_CACHE if USE_REDIS else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "nexa",
+    },
+    # Rate limits always count in Redis; it is only contacted when RATELIMIT_ENABLE=True
+    "ratelimit": REDIS_CACHE,
 }
 
 # Django Ratelimit
 # Disable in development (set RATELIMIT_ENABLE=True in production with Redis running)
 RATELIMIT_ENABLE = config("RATELIMIT_ENABLE", cast=bool, default=False)
-RATELIMIT_USE_CACHE = "default"
+RATELIMIT_USE_CACHE = "ratelimit"
+
+# Outbox (side effects dispatched by the drain_outbox worker)
+OUTBOX_BATCH_SIZE = config("OUTBOX_BATCH_SIZE", cast=int, default=100)
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", cast=int, default=8)
+# Seconds before the first retry; doubles per attempt, capped at an hour
+OUTBOX_RETRY_BACKOFF = config("OUTBOX_RETRY_BACKOFF", cast=int, default=10)
+# Seconds a claimed event is hidden from other workers while its handlers run
+OUTBOX_CLAIM_TIMEOUT = config("OUTBOX_CLAIM_TIMEOUT", cast=int, default=300)
+# Seconds the worker sleeps when no events are due
+OUTBOX_POLL_INTERVAL = config("OUTBOX_POLL_INTERVAL", cast=float, default=1.0)
+
+# Connections
+# Seconds a user's relationship graph stays cached (invalidated on connection changes)
+CONNECTION_GRAPH_CACHE_TIMEOUT = config("CONNECTION_GRAPH_CACHE_TIMEOUT", cast=int, default=60 * 60)
+# Maximum number of connection ids accepted by one bulk action request
+CONNECTION_BULK_ACTION_MAX_IDS = config("CONNECTION_BULK_ACTION_MAX_IDS", cast=int, default=100)
+# Days a request may stay pending, and days rejected rows are kept, before purge_connections deletes them
+CONNECTION_PENDING_EXPIRY_DAYS = config("CONNECTION_PENDING_EXPIRY_DAYS", cast=int, default=30)
+CONNECTION_REJECTED_RETENTION_DAYS = config("CONNECTION_REJECTED_RETENTION_DAYS", cast=int, default=90)
+# Width of the primary-key range deleted per purge transaction
+CONNECTION_PURGE_BATCH_SIZE = config("CONNECTION_PURGE_BATCH_SIZE", cast=int, default=1000)
+
+# "People you may know" job (matching.recommendations)
+RECOMMENDATIONS_TOP_N = config("RECOMMENDATIONS_TOP_N", cast=int, default=20)
+# Users are split into this many shards; only one shard's counts are held in memory at a time
+RECOMMENDATIONS_SHARDS = config("RECOMMENDATIONS_SHARDS", cast=int, default=16)
+# Hubs with more connections than this are not expanded (wedges grow with degree squared)
+RECOMMENDATIONS_MAX_DEGREE = config("RECOMMENDATIONS_MAX_DEGREE", cast=int, default=1000)
+
+# Profile photos (variants are generated by the profile_photo.uploaded outbox handler)
+PROFILE_PHOTO_MAX_BYTES = config("PROFILE_PHOTO_MAX_BYTES", cast=int, default=10 * 1024 * 1024)
+PROFILE_PHOTO_MAX_PIXELS = config("PROFILE_PHOTO_MAX_PIXELS", cast=int, default=40_000_000)
+PROFILE_PHOTO_WEBP_QUALITY = config("PROFILE_PHOTO_WEBP_QUALITY", cast=int, default=80)
+# Resumable uploads: part files live outside MEDIA_ROOT and expire after this many seconds
+PROFILE_PHOTO_UPLOAD_DIR = config("PROFILE_PHOTO_UPLOAD_DIR", default=str(BASE_DIR / "upload_sessions"))
+PROFILE_PHOTO_UPLOAD_SESSION_TTL = config("PROFILE_PHOTO_UPLOAD_SESSION_TTL", cast=int, default=60 * 60 * 24)
+# Unreferenced photo files are only deleted once untouched for this many seconds
+PROFILE_PHOTO_ORPHAN_GRACE = config("PROFILE_PHOTO_ORPHAN_GRACE", cast=int, default=60 * 60 * 24)
+
+# Chat
+# Maximum number of queued messages accepted by one batch send request
+CHAT_BATCH_SEND_MAX_MESSAGES = config("CHAT_BATCH_SEND_MAX_MESSAGES", cast=int, default=50)
+# Token-bucket send limits ("<count>/<period>", empty to disable); the bucket refills at that rate
+CHAT_SEND_THROTTLE_RATE = config("CHAT_SEND_THROTTLE_RATE", default="60/min") or None
+CHAT_THREAD_SEND_THROTTLE_RATE = config("CHAT_THREAD_SEND_THROTTLE_RATE", default="30/min") or None
+CHAT_BATCH_SEND_THROTTLE_RATE = config("CHAT_BATCH_SEND_THROTTLE_RATE", default="20/min") or None
+
+# Presence (cache-only, seconds)
+# A user counts as online for PRESENCE_ONLINE_WINDOW after their last heartbeat
+PRESENCE_ONLINE_WINDOW = config("PRESENCE_ONLINE_WINDOW", cast=int, default=60)
+# Heartbeats within this interval of the last write are coalesced (must be < online window)
+PRESENCE_HEARTBEAT_COALESCE = config("PRESENCE_HEARTBEAT_COALESCE", cast=int, default=20)
+PRESENCE_LAST_SEEN_TTL = config("PRESENCE_LAST_SEEN_TTL", cast=int, default=60 * 60 * 24 * 7)
+CHAT_TYPING_TTL = config("CHAT_TYPING_TTL", cast=int, default=6)
+
+# Inbox server-sent events (seconds)
+CHAT_EVENTS_POLL_INTERVAL = config("CHAT_EVENTS_POLL_INTERVAL", cast=int, default=2)
+CHAT_EVENTS_HEARTBEAT_INTERVAL = config("CHAT_EVENTS_HEARTBEAT_INTERVAL", cast=int, default=15)
+# Streams close after this long; clients reconnect with Last-Event-ID
+CHAT_EVENTS_MAX_DURATION = config("CHAT_EVENTS_MAX_DURATION", cast=int, default=300)
+
+# Chat cold storage: messages older than this move to compressed archive blocks
+CHAT_ARCHIVE_AFTER_DAYS = config("CHAT_ARCHIVE_AFTER_DAYS", cast=int, default=180)
+CHAT_ARCHIVE_BLOCK_SIZE = config("CHAT_ARCHIVE_BLOCK_SIZE", cast=int, default=200)
+
+# Chat image attachments (uploads are spooled to disk, thumbnails made by the outbox worker)
+CHAT_ATTACHMENT_MAX_BYTES = config("CHAT_ATTACHMENT_MAX_BYTES", cast=int, default=10 * 1024 * 1024)
+CHAT_ATTACHMENT_MAX_PIXELS = config("CHAT_ATTACHMENT_MAX_PIXELS", cast=int, default=40_000_000)
+# Originals larger than this (longest side, px) are downscaled after upload
+CHAT_ATTACHMENT_MAX_DIMENSION = config("CHAT_ATTACHMENT_MAX_DIMENSION", cast=int, default=2048)
+CHAT_ATTACHMENT_THUMBNAIL_SIZE = config("CHAT_ATTACHMENT_THUMBNAIL_SIZE", cast=int, default=320)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
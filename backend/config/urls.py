@@ -15,11 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from .views import health_check
+from .views import health_check, serve_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -27,11 +26,10 @@ urlpatterns = [
     path("api/v1/", include("profiles.urls", namespace="profiles")),
     path("api/v1/connections/", include("connections.urls", namespace="connections")),
     path("api/v1/chat/threads/", include("chat.urls", namespace="chat")),
+    path("api/v1/recommendations/", include("matching.urls", namespace="matching")),
     path("api/v1/reports/", include("moderation.urls", namespace="moderation")),
     path("api/health/", health_check, name="health-check"),
+    # Media with ETag/Cache-Control (content-addressed photos are immutable)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name="media"),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
@@ -1,6 +1,66 @@
-from django.http import JsonResponse
+import os
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from profiles.storage import content_digest
+
+from . import media
 
 
 def health_check(_request):
     """Return a simple health status payload for uptime checks."""
     return JsonResponse({"status": "ok"})
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with cache validators. Protected paths need
+    a valid signature (see config.media). Content-addressed names under
+    MEDIA_CONTENT_ADDRESSED_PREFIXES (see profiles.storage) never change,
+    so they are cached as immutable with the hash as ETag, for no longer
+    than their signature lasts; other files must be revalidated. The bytes
+    are sent by the front web server when MEDIA_SENDFILE_BACKEND is set.
+    """
+    # Resolve the path before any prefix check so "a/../profile_photos/..." can't skip the signature
+    segments = path.replace("\\", "/").split("/")
+    if any(segment in ("", ".", "..") for segment in segments):
+        raise Http404("File not found.")
+    path = "/".join(segments)
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+
+    max_age = settings.MEDIA_IMMUTABLE_MAX_AGE
+    if media.requires_signature(path):
+        ttl = media.signature_ttl(path, request.GET.get("sig", ""))
+        if ttl is None:
+            raise Http404("File not found.")
+        max_age = min(max_age, ttl)
+
+    # Other media (e.g. chat attachments, named after the client's file) can be rewritten in place
+    content_addressed = path.startswith(tuple(settings.MEDIA_CONTENT_ADDRESSED_PREFIXES))
+    digest = content_digest(path) if content_addressed else None
+    if digest:
+        etag = f'"{digest}"'
+        cache_control = f"public, max-age={max_age}, immutable"
+    else:
+        stat = os.stat(full_path)
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        cache_control = "no-cache"
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = media.file_response(full_path, path)
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
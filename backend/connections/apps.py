@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ConnectionsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "connections"
+
+    def ready(self):
+        from . import handlers  # noqa: F401 - registers outbox handlers
@@ -0,0 +1,151 @@
+"""
+Per-user relationship graph cache.
+
+For each user we cache compact sorted arrays of counterpart ids, one per
+relationship (accepted, pending sent, pending received, blocked, rejected),
+loaded from all of the user's connections with one query. Relationship
+checks are then a binary search in memory instead of a Connection query.
+
+Connection.save() and delete() invalidate both users' graphs; code that
+changes connections with queryset.update() or bulk_create() must call
+invalidate() itself.
+"""
+
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+def cache_key(user_id):
+    return f"connections:graph:{user_id}"
+
+
+class RelationshipGraph:
+    """One user's counterparts, grouped by relationship."""
+
+    __slots__ = ("user_id", "accepted", "pending_sent", "pending_received", "blocked", "rejected")
+
+    def __init__(self, user_id, accepted=(), pending_sent=(), pending_received=(), blocked=(), rejected=()):
+        self.user_id = user_id
+        self.accepted = array("q", sorted(accepted))
+        self.pending_sent = array("q", sorted(pending_sent))
+        self.pending_received = array("q", sorted(pending_received))
+        self.blocked = array("q", sorted(blocked))
+        self.rejected = array("q", sorted(rejected))
+
+    @staticmethod
+    def _contains(ids, user_id):
+        index = bisect_left(ids, user_id)
+        return index < len(ids) and ids[index] == user_id
+
+    def is_connected(self, user_id):
+        return self._contains(self.accepted, user_id)
+
+    def is_blocked(self, user_id):
+        return self._contains(self.blocked, user_id)
+
+    def is_pending(self, user_id):
+        return self._contains(self.pending_sent, user_id) or self._contains(self.pending_received, user_id)
+
+    def status_with(self, user_id):
+        """Connection.Status of the relationship with user_id, or None."""
+        from .models import Connection
+
+        if self.is_connected(user_id):
+            return Connection.Status.ACCEPTED
+        if self.is_blocked(user_id):
+            return Connection.Status.BLOCKED
+        if self.is_pending(user_id):
+            return Connection.Status.PENDING
+        if self._contains(self.rejected, user_id):
+            return Connection.Status.REJECTED
+        return None
+
+
+def load_graphs(user_ids):
+    """Build graphs for several users from the database with one query."""
+    from .models import Connection
+
+    user_ids = set(user_ids)
+    groups = {
+        user_id: {
+            "accepted": [],
+            "pending_sent": [],
+            "pending_received": [],
+            "blocked": [],
+            "rejected": [],
+        }
+        for user_id in user_ids
+    }
+    rows = Connection.objects.filter(Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids)).values_list(
+        "from_user_id", "to_user_id", "status"
+    )
+    for from_user_id, to_user_id, status in rows:
+        for user_id, other_id, sent in ((from_user_id, to_user_id, True), (to_user_id, from_user_id, False)):
+            if user_id not in groups:
+                continue
+            if status == Connection.Status.PENDING:
+                groups[user_id]["pending_sent" if sent else "pending_received"].append(other_id)
+            else:
+                groups[user_id][status].append(other_id)
+    return {user_id: RelationshipGraph(user_id, **user_groups) for user_id, user_groups in groups.items()}
+
+
+def load_graph(user_id):
+    """Build a user's graph from the database (one query)."""
+    return load_graphs([user_id])[user_id]
+
+
+def get_graph(user):
+    """Return the cached graph for a user or user id, loading it on a miss."""
+    user_id = getattr(user, "pk", user)
+    graph = cache.get(cache_key(user_id))
+    if graph is None:
+        graph = load_graph(user_id)
+        cache.set(cache_key(user_id), graph, settings.CONNECTION_GRAPH_CACHE_TIMEOUT)
+    return graph
+
+
+def get_graphs(user_ids):
+    """Graphs for many users: one cache round trip, then one query for all misses."""
+    keys = {cache_key(user_id): user_id for user_id in user_ids}
+    graphs = {keys[key]: graph for key, graph in cache.get_many(list(keys)).items()}
+    missing = set(keys.values()) - set(graphs)
+    if missing:
+        loaded = load_graphs(missing)
+        cache.set_many(
+            {cache_key(user_id): graph for user_id, graph in loaded.items()},
+            settings.CONNECTION_GRAPH_CACHE_TIMEOUT,
+        )
+        graphs.update(loaded)
+    return graphs
+
+
+def mutual_connection_counts(user, other_ids):
+    """
+    Number of accepted connections `user` shares with each of `other_ids`.
+    The user's accepted ids become one set; each candidate's sorted array is
+    then intersected against it, so a whole page costs one pass per candidate.
+    """
+    other_ids = [other_id for other_id in other_ids if other_id != getattr(user, "pk", user)]
+    mine = set(get_graph(user).accepted)
+    if not mine or not other_ids:
+        return {other_id: 0 for other_id in other_ids}
+    graphs = get_graphs(other_ids)
+    return {other_id: len(mine.intersection(graphs[other_id].accepted)) for other_id in other_ids}
+
+
+def relationship(user, other):
+    """Connection.Status between two users (or ids), or None."""
+    return get_graph(user).status_with(getattr(other, "pk", other))
+
+
+def invalidate(*user_ids):
+    """Drop cached graphs now and again once the current transaction commits."""
+    keys = [cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
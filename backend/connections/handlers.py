@@ -0,0 +1,11 @@
+"""Outbox handlers for connection side effects (registered in ConnectionsConfig.ready)."""
+
+from outbox.dispatch import register
+
+
+@register("connection.accepted")
+def create_chat_thread(from_user_id, to_user_id):
+    """Open the chat thread for a newly accepted connection (no-op if it exists)."""
+    from chat.models import ChatThread
+
+    ChatThread.bulk_create_threads([(from_user_id, to_user_id)])
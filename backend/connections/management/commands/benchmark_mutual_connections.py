@@ -0,0 +1,86 @@
+import pickle
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from connections.graph import RelationshipGraph
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark mutual-connection counting for a page of discovery candidates "
+        "on synthetic relationship graphs (in memory, no database writes)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200_000, help="Size of the id space")
+        parser.add_argument("--connections", type=int, default=5_000, help="Accepted connections per user")
+        parser.add_argument("--candidates", type=int, default=20, help="Candidates per page")
+        parser.add_argument("--overlap", type=float, default=0.05, help="Share of connections drawn from a common pool")
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        users, size = options["users"], options["connections"]
+        # A shared pool makes overlaps realistic (friends of friends cluster)
+        pool = rng.sample(range(1, users), min(users - 1, size * 4))
+
+        def make_graph(user_id):
+            shared = rng.sample(pool, int(size * options["overlap"]))
+            rest = rng.sample(range(1, users), size - len(shared))
+            return RelationshipGraph(user_id, accepted=set(shared) | set(rest))
+
+        viewer = make_graph(0)
+        candidates = [make_graph(user_id) for user_id in range(1, options["candidates"] + 1)]
+        payload = len(pickle.dumps(viewer))
+
+        def batch_set_intersection():
+            # What graph.mutual_connection_counts does
+            mine = set(viewer.accepted)
+            return [len(mine.intersection(graph.accepted)) for graph in candidates]
+
+        def sorted_merge():
+            counts = []
+            a = viewer.accepted
+            for graph in candidates:
+                b, i, j, count = graph.accepted, 0, 0, 0
+                while i < len(a) and j < len(b):
+                    if a[i] == b[j]:
+                        count += 1
+                        i += 1
+                        j += 1
+                    elif a[i] < b[j]:
+                        i += 1
+                    else:
+                        j += 1
+                counts.append(count)
+            return counts
+
+        def per_pair_sets():
+            return [len(set(viewer.accepted) & set(graph.accepted)) for graph in candidates]
+
+        expected = batch_set_intersection()
+        self.stdout.write(
+            f"{options['candidates']} candidates x {size} connections "
+            f"(graph cache payload ~{payload / 1024:.0f} KiB per user), "
+            f"mean mutual count {statistics.mean(expected):.1f}"
+        )
+        for name, strategy in (
+            ("batch set intersection", batch_set_intersection),
+            ("per-pair set build", per_pair_sets),
+            ("sorted two-pointer merge", sorted_merge),
+        ):
+            assert strategy() == expected
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                strategy()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:<26} median {statistics.median(timings):8.2f} ms/page  "
+                f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS("Done!"))
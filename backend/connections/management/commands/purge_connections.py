@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from connections.purge import purge_stale_connections, stale_connections
+
+
+class Command(BaseCommand):
+    help = "Delete expired pending requests and old rejected connections in primary-key batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.CONNECTION_PURGE_BATCH_SIZE,
+            help="Width of the id range deleted per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            count = stale_connections().count()
+            self.stdout.write(f"{count} stale connections would be deleted.")
+            return
+
+        self.stdout.write("Purging stale connections...")
+        stats = purge_stale_connections(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done! Removed {stats['pending']} expired pending and {stats['rejected']} rejected "
+                f"connections in {stats['batches']} batches."
+            )
+        )
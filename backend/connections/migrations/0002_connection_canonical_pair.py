@@ -0,0 +1,101 @@
+# Generated by Django 5.2.9 on 2026-01-24 15:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# When both A→B and B→A rows exist, keep the one that says the most
+STATUS_PRIORITY = {"blocked": 0, "accepted": 1, "pending": 2, "rejected": 3}
+
+
+def populate_pairs(apps, schema_editor):
+    """Set user_low/user_high and collapse duplicate rows for the same pair."""
+    Connection = apps.get_model("connections", "Connection")
+
+    by_pair = {}
+    for connection in Connection.objects.order_by("id").only("id", "from_user_id", "to_user_id", "status"):
+        pair = tuple(sorted((connection.from_user_id, connection.to_user_id)))
+        by_pair.setdefault(pair, []).append(connection)
+
+    duplicate_ids = []
+    for (low, high), connections in by_pair.items():
+        connections.sort(key=lambda c: (STATUS_PRIORITY.get(c.status, len(STATUS_PRIORITY)), c.id))
+        duplicate_ids.extend(c.id for c in connections[1:])
+        Connection.objects.filter(id=connections[0].id).update(user_low_id=low, user_high_id=high)
+
+    Connection.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("connections", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="connection",
+            name="user_low",
+            field=models.ForeignKey(
+                editable=False,
+                help_text="Lower user ID of the pair",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="connection",
+            name="user_high",
+            field=models.ForeignKey(
+                editable=False,
+                help_text="Higher user ID of the pair",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(populate_pairs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="connection",
+            name="user_low",
+            field=models.ForeignKey(
+                editable=False,
+                help_text="Lower user ID of the pair",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="connection",
+            name="user_high",
+            field=models.ForeignKey(
+                editable=False,
+                help_text="Higher user ID of the pair",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RemoveConstraint(
+            model_name="connection",
+            name="unique_connection_pair",
+        ),
+        migrations.AddConstraint(
+            model_name="connection",
+            constraint=models.UniqueConstraint(
+                fields=("user_low", "user_high"),
+                name="unique_connection_user_pair",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="connection",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("user_low__lt", models.F("user_high"))),
+                name="connection_pair_ordered",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-01-25 09:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("connections", "0002_connection_canonical_pair"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="connection",
+            name="connections_from_us_c3fa2d_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="connection",
+            name="connections_to_user_9f6d89_idx",
+        ),
+        migrations.AddIndex(
+            model_name="connection",
+            index=models.Index(
+                fields=["from_user", "status", "-created_at"],
+                name="connections_from_us_2d8203_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="connection",
+            index=models.Index(
+                fields=["to_user", "status", "-created_at"],
+                name="connections_to_user_94b8f7_idx",
+            ),
+        ),
+    ]
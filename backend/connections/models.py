@@ -1,7 +1,12 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from outbox import dispatch as outbox
+from profiles import counters
+
+from . import graph
+
 
 class Connection(models.Model):
     """
@@ -20,6 +25,11 @@ class Connection(models.Model):
         REJECTED = "rejected", "Rejected"
         BLOCKED = "blocked", "Blocked"
 
+    # Results of get_messaging_status
+    MESSAGING_ALLOWED = "allowed"
+    MESSAGING_NOT_CONNECTED = "not_connected"
+    MESSAGING_BLOCKED = "blocked"
+
     from_user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -37,6 +47,22 @@ class Connection(models.Model):
         choices=Status.choices,
         default=Status.PENDING,
     )
+
+    # Canonical pair (lower id, higher id), set on save: one row per pair of users
+    user_low = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        editable=False,
+        help_text="Lower user ID of the pair",
+    )
+    user_high = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        editable=False,
+        help_text="Higher user ID of the pair",
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -51,23 +77,86 @@ class Connection(models.Model):
         ordering = ["-created_at"]
         constraints = [
             models.UniqueConstraint(
-                fields=["from_user", "to_user"],
-                name="unique_connection_pair",
+                fields=["user_low", "user_high"],
+                name="unique_connection_user_pair",
             ),
             models.CheckConstraint(
                 check=~models.Q(from_user=models.F("to_user")),
                 name="no_self_connection",
             ),
+            models.CheckConstraint(
+                check=models.Q(user_low__lt=models.F("user_high")),
+                name="connection_pair_ordered",
+            ),
         ]
         indexes = [
-            models.Index(fields=["from_user", "status"]),
-            models.Index(fields=["to_user", "status"]),
+            # Newest-first keyset pagination per side and status
+            models.Index(fields=["from_user", "status", "-created_at"]),
+            models.Index(fields=["to_user", "status", "-created_at"]),
             models.Index(fields=["status", "-created_at"]),
         ]
 
     def __str__(self):
         return f"{self.from_user.email} → {self.to_user.email} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored recipient/status so save() can react to transitions
+        instance._loaded_state = (instance.__dict__.get("to_user_id"), instance.__dict__.get("status"))
+        return instance
+
+    def _pending_recipient(self, state):
+        to_user_id, status = state
+        return to_user_id if status == self.Status.PENDING else None
+
+    def _stored_state(self):
+        """(to_user_id, status) of the stored row; reloads when the state was deferred."""
+        if self._state.adding:
+            return (None, None)
+        state = getattr(self, "_loaded_state", (None, None))
+        if None in state:
+            state = Connection.objects.filter(pk=self.pk).values_list("to_user_id", "status").first() or (None, None)
+        return state
+
+    def save(self, *args, **kwargs):
+        """
+        Save, keep the recipient's pending-request badge in step, open the
+        chat thread and queue the side effects of accepting (see
+        connections.handlers) and drop both users' cached relationship
+        graphs (covers accept/reject/block).
+        """
+        self.user_low_id, self.user_high_id = self.pair_key(self.from_user_id, self.to_user_id)
+        stored_state = self._stored_state()
+        was_pending_for = self._pending_recipient(stored_state)
+        is_pending_for = self._pending_recipient((self.to_user_id, self.status))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if was_pending_for != is_pending_for:
+                if was_pending_for is not None:
+                    counters.adjust(was_pending_for, pending_received_count=-1)
+                if is_pending_for is not None:
+                    counters.adjust(is_pending_for, pending_received_count=1)
+            if self.status == self.Status.ACCEPTED and stored_state[1] != self.Status.ACCEPTED:
+                from chat.models import ChatThread
+
+                # The thread is opened right away; the outbox handler is an idempotent backstop
+                ChatThread.bulk_create_threads([(self.from_user_id, self.to_user_id)])
+                outbox.enqueue("connection.accepted", from_user_id=self.from_user_id, to_user_id=self.to_user_id)
+        self._loaded_state = (self.to_user_id, self.status)
+        graph.invalidate(self.from_user_id, self.to_user_id)
+
+    def delete(self, *args, **kwargs):
+        """Delete, release a pending badge and drop both users' cached relationship graphs."""
+        with transaction.atomic():
+            was_pending_for = self._pending_recipient(self._stored_state())
+            result = super().delete(*args, **kwargs)
+            if was_pending_for is not None:
+                counters.adjust(was_pending_for, pending_received_count=-1)
+        self._loaded_state = (None, None)
+        graph.invalidate(self.from_user_id, self.to_user_id)
+        return result
+
     def accept(self):
         """Accept a pending connection request."""
         if self.status == self.Status.PENDING:
@@ -91,34 +180,48 @@ class Connection(models.Model):
         self.save()
         return True
 
+    @staticmethod
+    def pair_key(user1, user2):
+        """Return the canonical (low, high) id pair for two users or user ids."""
+        return tuple(sorted((getattr(user1, "pk", user1), getattr(user2, "pk", user2))))
+
+    @staticmethod
+    def for_pair(user1, user2):
+        """Queryset of the (at most one) connection between two users: a single index probe."""
+        low, high = Connection.pair_key(user1, user2)
+        return Connection.objects.filter(user_low_id=low, user_high_id=high)
+
     @staticmethod
     def get_connection_status(user1, user2):
         """
         Get the connection status between two users.
         Returns: (status, connection_obj) or (None, None) if no connection exists.
         """
-        # Check both directions
-        connection = Connection.objects.filter(
-            models.Q(from_user=user1, to_user=user2) | models.Q(from_user=user2, to_user=user1)
-        ).first()
-        
+        connection = Connection.for_pair(user1, user2).first()
         if connection:
             return connection.status, connection
         return None, None
 
     @staticmethod
     def is_blocked(user1, user2):
-        """Check if either user has blocked the other."""
-        return Connection.objects.filter(
-            models.Q(from_user=user1, to_user=user2, status=Connection.Status.BLOCKED)
-            | models.Q(from_user=user2, to_user=user1, status=Connection.Status.BLOCKED)
-        ).exists()
+        """Check if either user has blocked the other (from the cached graph)."""
+        return graph.get_graph(user1).is_blocked(getattr(user2, "pk", user2))
 
     @staticmethod
     def are_connected(user1, user2):
-        """Check if two users have an accepted connection."""
-        return Connection.objects.filter(
-            models.Q(from_user=user1, to_user=user2, status=Connection.Status.ACCEPTED)
-            | models.Q(from_user=user2, to_user=user1, status=Connection.Status.ACCEPTED)
-        ).exists()
+        """Check if two users have an accepted connection (from the cached graph)."""
+        return graph.get_graph(user1).is_connected(getattr(user2, "pk", user2))
 
+    @staticmethod
+    def get_messaging_status(user1_id, user2_id):
+        """
+        Check whether two users may message each other.
+        Returns MESSAGING_ALLOWED, MESSAGING_NOT_CONNECTED or MESSAGING_BLOCKED.
+        Answered from user1's cached relationship graph.
+        """
+        user_graph = graph.get_graph(user1_id)
+        if user_graph.is_connected(user2_id):
+            return Connection.MESSAGING_ALLOWED
+        if user_graph.is_blocked(user2_id):
+            return Connection.MESSAGING_BLOCKED
+        return Connection.MESSAGING_NOT_CONNECTED
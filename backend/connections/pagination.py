@@ -0,0 +1,38 @@
+"""Keyset pagination for connection lists, ordered newest first."""
+
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(connection):
+    """Encode the last row of a page as an opaque cursor."""
+    payload = [connection.created_at.isoformat(), connection.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor. Raises ValueError if malformed."""
+    try:
+        created_at, connection_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(connection_id)
+    except (TypeError, json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def keyset_page(queryset, cursor, page_size):
+    """
+    Return (rows, next_cursor) for the page after `cursor`, ordered by
+    (-created_at, -id). Seeks past the cursor instead of using OFFSET.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, connection_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=connection_id)
+        )
+    rows = list(queryset[: page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
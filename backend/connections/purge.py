@@ -0,0 +1,76 @@
+"""
+Expiry of stale connection requests.
+
+Pending requests older than CONNECTION_PENDING_EXPIRY_DAYS and rejected rows
+not touched for CONNECTION_REJECTED_RETENTION_DAYS are deleted. The table is
+walked in fixed-width primary-key ranges, one short transaction per range, so
+no run holds locks on more than one range of rows at a time.
+
+Deletes go through querysets, so pending badges and cached graphs are
+adjusted here rather than by Connection.delete().
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from profiles import counters
+
+from . import graph
+from .models import Connection
+
+
+def stale_connections(now=None):
+    """Queryset of connections past their expiry or retention period."""
+    now = now or timezone.now()
+    return Connection.objects.filter(
+        Q(
+            status=Connection.Status.PENDING,
+            created_at__lt=now - timedelta(days=settings.CONNECTION_PENDING_EXPIRY_DAYS),
+        )
+        | Q(
+            status=Connection.Status.REJECTED,
+            updated_at__lt=now - timedelta(days=settings.CONNECTION_REJECTED_RETENTION_DAYS),
+        )
+    )
+
+
+def _purge_range(stale, start, end):
+    """Delete stale rows with start <= id < end. Returns {status: rows removed}."""
+    with transaction.atomic():
+        rows = list(
+            stale.select_for_update()
+            .filter(id__gte=start, id__lt=end)
+            .values_list("id", "from_user_id", "to_user_id", "status")
+        )
+        if not rows:
+            return Counter()
+        Connection.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+        released = Counter(to_user_id for _, _, to_user_id, status in rows if status == Connection.Status.PENDING)
+        for to_user_id, count in released.items():
+            counters.adjust(to_user_id, pending_received_count=-count)
+        graph.invalidate(*{user_id for row in rows for user_id in row[1:3]})
+    return Counter(status for *_, status in rows)
+
+
+def purge_stale_connections(batch_size=None, now=None):
+    """Delete expired pending and old rejected connections. Returns {"pending": n, "rejected": n, "batches": n}."""
+    batch_size = batch_size or settings.CONNECTION_PURGE_BATCH_SIZE
+    stale = stale_connections(now)
+    bounds = stale.aggregate(low=Min("id"), high=Max("id"))
+
+    removed, batches = Counter(), 0
+    if bounds["low"] is not None:
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            removed += _purge_range(stale, start, start + batch_size)
+            batches += 1
+    return {
+        "pending": removed[Connection.Status.PENDING],
+        "rejected": removed[Connection.Status.REJECTED],
+        "batches": batches,
+    }
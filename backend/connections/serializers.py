@@ -1,7 +1,13 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
 
-from profiles.serializers import PublicProfileSerializer
+from profiles.serializers import ProfileCardSerializer, PublicProfileSerializer
 
+from . import graph
 from .models import Connection
 
 
@@ -44,6 +50,29 @@ class ConnectionSerializer(serializers.ModelSerializer):
         return False
 
 
+class ConnectionCardSerializer(serializers.ModelSerializer):
+    """Compact connection row: the counterpart's card instead of both full profiles."""
+
+    user = serializers.SerializerMethodField()
+    is_sender = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Connection
+        fields = ("id", "status", "is_sender", "user", "created_at", "accepted_at")
+
+    def get_user(self, obj):
+        """Card of the other user in the connection."""
+        request = self.context["request"]
+        other = obj.to_user if obj.from_user_id == request.user.id else obj.from_user
+        profile = getattr(other, "profile", None)
+        data = ProfileCardSerializer(profile, context=self.context).data if profile else {}
+        data["user_id"] = other.id
+        return data
+
+    def get_is_sender(self, obj):
+        return obj.from_user_id == self.context["request"].user.id
+
+
 class ConnectionCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating a new connection request."""
 
@@ -70,36 +99,51 @@ class ConnectionCreateSerializer(serializers.ModelSerializer):
         if to_user == request.user:
             raise serializers.ValidationError("You cannot connect with yourself.")
 
-        # Check if users are blocked
-        if Connection.is_blocked(request.user, to_user):
+        # The cached relationship graph covers blocked, pending and accepted
+        existing_status = graph.relationship(request.user, to_user)
+        if existing_status == Connection.Status.BLOCKED:
             raise serializers.ValidationError("This connection is not available.")
-
-        # Check for existing connection
-        existing_status, _ = Connection.get_connection_status(request.user, to_user)
-        if existing_status:
-            if existing_status == Connection.Status.PENDING:
-                raise serializers.ValidationError("Connection request already pending.")
-            elif existing_status == Connection.Status.ACCEPTED:
-                raise serializers.ValidationError("You are already connected.")
-
+        elif existing_status == Connection.Status.PENDING:
+            raise serializers.ValidationError("Connection request already pending.")
+        elif existing_status == Connection.Status.ACCEPTED:
+            raise serializers.ValidationError("You are already connected.")
+
+        # A rejected request is re-sent by reusing its row (one row per pair).
+        # Only the user who rejected may reopen it straight away; the rejected
+        # sender has to wait out the retention window.
+        if existing_status == Connection.Status.REJECTED:
+            connection = Connection.for_pair(request.user, to_user).first()
+            cool_off = timedelta(days=settings.CONNECTION_REJECTED_RETENTION_DAYS)
+            if connection.from_user_id == request.user.id and connection.updated_at > timezone.now() - cool_off:
+                raise serializers.ValidationError("This connection is not available.")
+            self.existing_connection = connection
         return value
 
     def create(self, validated_data):
-        from django.contrib.auth import get_user_model
-
-        User = get_user_model()
         request = self.context.get("request")
-        to_user_id = validated_data["to_user"]
+        connection = getattr(self, "existing_connection", None)
 
-        to_user = User.objects.get(id=to_user_id)
+        if connection is not None:
+            connection.from_user = request.user
+            connection.to_user_id = validated_data["to_user"]
+            connection.status = Connection.Status.PENDING
+            connection.accepted_at = None
+            connection.save()
+            return connection
 
-        connection = Connection.objects.create(
-            from_user=request.user,
-            to_user=to_user,
-            status=Connection.Status.PENDING,
-        )
+        try:
+            with transaction.atomic():
+                return Connection.objects.create(
+                    from_user=request.user,
+                    to_user_id=validated_data["to_user"],
+                    status=Connection.Status.PENDING,
+                )
+        except IntegrityError:
+            # The other user sent a request at the same moment
+            raise serializers.ValidationError({"to_user": ["Connection request already pending."]})
 
-        return connection
+    def to_representation(self, instance):
+        return ConnectionSerializer(instance, context=self.context).data
 
 
 class ConnectionUpdateSerializer(serializers.ModelSerializer):
@@ -127,13 +171,8 @@ class ConnectionUpdateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("This request is no longer pending.")
 
             if action == "accept":
-                success = instance.accept()
-                
-                # Auto-create chat thread when connection is accepted
-                if success:
-                    from chat.models import ChatThread
-                    ChatThread.get_or_create_thread(instance.from_user, instance.to_user)
-                    
+                # Connection.save opens the chat thread
+                instance.accept()
             elif action == "reject":
                 instance.reject()
 
@@ -142,3 +181,21 @@ class ConnectionUpdateSerializer(serializers.ModelSerializer):
             instance.block()
 
         return instance
+
+
+class ConnectionBulkActionSerializer(serializers.Serializer):
+    """Serializer for bulk accept/reject/block: a list of connection ids per action."""
+
+    accept = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    reject = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    block = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        total = sum(len(ids) for ids in attrs.values())
+        if total == 0:
+            raise serializers.ValidationError("Provide at least one connection id.")
+        if total > settings.CONNECTION_BULK_ACTION_MAX_IDS:
+            raise serializers.ValidationError(
+                f"At most {settings.CONNECTION_BULK_ACTION_MAX_IDS} connection ids per request."
+            )
+        return attrs
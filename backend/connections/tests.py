@@ -1,10 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection as db_connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from outbox.dispatch import drain_all
+from profiles import counters
+from profiles.models import Profile
+
+from . import graph
 from .models import Connection
+from .purge import purge_stale_connections
 
 User = get_user_model()
 
@@ -13,6 +26,7 @@ class ConnectionTests(TestCase):
     """Test suite for connection functionality."""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         
         # Create users
@@ -160,7 +174,7 @@ class ConnectionTests(TestCase):
             user2=self.user2,
         ).exists())
         
-        # Accept connection
+        # Accept connection; the thread is opened without waiting for the outbox worker
         url = reverse("connections:connection-detail", args=[connection.id])
         self.client.patch(url, {"action": "accept"})
         
@@ -170,3 +184,306 @@ class ConnectionTests(TestCase):
             user2=self.user2,
         ).first()
         self.assertIsNotNone(thread)
+
+    def test_reverse_request_rejected_by_pair_key(self):
+        """Test a B→A row cannot coexist with an A→B row."""
+        Connection.objects.create(from_user=self.user1, to_user=self.user2)
+        with self.assertRaises(IntegrityError):
+            Connection.objects.create(from_user=self.user2, to_user=self.user1)
+
+    def test_request_to_pending_sender_is_prevented(self):
+        """Test answering a pending request with a new request is refused."""
+        Connection.objects.create(from_user=self.user2, to_user=self.user1)
+        response = self.client.post(self.connection_create_url, {"to_user": self.user2.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejected_request_can_be_resent(self):
+        """Test re-sending after a rejection reuses the pair's row."""
+        rejected = Connection.objects.create(
+            from_user=self.user2,
+            to_user=self.user1,
+            status=Connection.Status.REJECTED,
+        )
+        response = self.client.post(self.connection_create_url, {"to_user": self.user2.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["id"], rejected.id)
+
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.from_user, self.user1)
+        self.assertEqual(rejected.status, Connection.Status.PENDING)
+
+    def test_rejected_sender_cannot_resend_during_cool_off(self):
+        """Test the rejected sender gets 400 until the retention window has passed."""
+        rejected = Connection.objects.create(
+            from_user=self.user1,
+            to_user=self.user2,
+            status=Connection.Status.REJECTED,
+        )
+        response = self.client.post(self.connection_create_url, {"to_user": self.user2.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.status, Connection.Status.REJECTED)
+
+        Connection.objects.filter(pk=rejected.pk).update(
+            updated_at=timezone.now() - timedelta(days=settings.CONNECTION_REJECTED_RETENTION_DAYS + 1)
+        )
+        response = self.client.post(self.connection_create_url, {"to_user": self.user2.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_relationship_lookup_is_single_probe(self):
+        """Test status lookups query the canonical pair, not both directions."""
+        Connection.objects.create(from_user=self.user2, to_user=self.user1)
+        with CaptureQueriesContext(db_connection) as queries:
+            connection_status, _ = Connection.get_connection_status(self.user1, self.user2)
+        self.assertEqual(connection_status, Connection.Status.PENDING)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("user_low_id", queries[0]["sql"])
+        self.assertNotIn(" OR ", queries[0]["sql"])
+
+    def test_relationship_graph_cached(self):
+        """Test a user's graph is loaded in one query and then served from cache."""
+        Connection.objects.create(from_user=self.user1, to_user=self.user2)
+        with CaptureQueriesContext(db_connection) as queries:
+            self.assertTrue(graph.get_graph(self.user1).is_pending(self.user2.id))
+            self.assertEqual(graph.relationship(self.user1, self.user2), Connection.Status.PENDING)
+        self.assertEqual(len(queries), 1)
+
+    def test_relationship_graph_invalidated_on_transition(self):
+        """Test accepting and blocking refresh both users' graphs."""
+        connection = Connection.objects.create(from_user=self.user1, to_user=self.user2)
+        graph.get_graph(self.user1)
+        graph.get_graph(self.user2)
+
+        connection.accept()
+        self.assertTrue(Connection.are_connected(self.user1, self.user2))
+        self.assertEqual(list(graph.get_graph(self.user2).accepted), [self.user1.id])
+
+        connection.block()
+        self.assertTrue(Connection.is_blocked(self.user2, self.user1))
+        self.assertFalse(Connection.are_connected(self.user1, self.user2))
+
+
+class ConnectionListPaginationTests(TestCase):
+    """Test suite for the paginated, compact connections list."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="popular@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        Profile.objects.create(user=self.user, display_name="Popular")
+        self.others = []
+        for i in range(5):
+            other = User.objects.create_user(
+                email=f"friend{i}@example.com",
+                password="TestPass123!",
+                is_active=True,
+            )
+            Profile.objects.create(user=other, display_name=f"Friend {i}")
+            Connection.objects.create(from_user=other, to_user=self.user, status=Connection.Status.ACCEPTED)
+            self.others.append(other)
+
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("connections:connection-list")
+
+    def test_keyset_pages_cover_all_rows_newest_first(self):
+        """Test following next_cursor walks every connection exactly once."""
+        seen = []
+        params = {"status": "accepted", "page_size": 2}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], 5)
+            seen.extend(row["id"] for row in response.data["results"])
+            if not response.data["next_cursor"]:
+                break
+            params["cursor"] = response.data["next_cursor"]
+
+        expected = list(
+            Connection.objects.filter(to_user=self.user).order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_compact_mode_returns_counterpart_card(self):
+        """Test compact rows carry only the other user's card."""
+        response = self.client.get(self.url, {"compact": 1, "page_size": 1})
+        row = response.data["results"][0]
+        self.assertEqual(set(row), {"id", "status", "is_sender", "user", "created_at", "accepted_at"})
+        self.assertEqual(row["user"]["user_id"], self.others[-1].id)
+        self.assertEqual(row["user"]["display_name"], "Friend 4")
+        self.assertFalse(row["is_sender"])
+
+    def test_invalid_cursor_rejected(self):
+        """Test a malformed cursor is a 400."""
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConnectionBulkActionTests(TestCase):
+    """Test suite for bulk accept/reject/block."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="inbox-zero@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.requests = []
+        for i in range(4):
+            sender = User.objects.create_user(
+                email=f"requester{i}@example.com",
+                password="TestPass123!",
+                is_active=True,
+            )
+            self.requests.append(Connection.objects.create(from_user=sender, to_user=self.user))
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("connections:connection-bulk-action")
+
+    def test_bulk_accept_and_reject(self):
+        """Test each action is one UPDATE and accepted pairs get chat threads."""
+        from chat.models import ChatThread
+
+        accept_ids = [self.requests[0].id, self.requests[1].id]
+        reject_ids = [self.requests[2].id]
+        with CaptureQueriesContext(db_connection) as queries:
+            response = self.client.post(self.url, {"accept": accept_ids, "reject": reject_ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["accepted", "accepted", "rejected"])
+
+        updates = [q for q in queries if q["sql"].startswith("UPDATE") and "connections_connection" in q["sql"]]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(ChatThread.objects.count(), 2)
+        self.assertEqual(drain_all()["dispatched"], 2)
+        self.assertEqual(ChatThread.objects.count(), 2)
+        self.assertEqual(
+            set(Connection.objects.filter(status=Connection.Status.ACCEPTED).values_list("id", flat=True)),
+            set(accept_ids),
+        )
+        # Cached graphs see the change
+        self.assertTrue(Connection.are_connected(self.user, self.requests[0].from_user))
+
+    def test_bulk_reports_per_id_errors(self):
+        """Test ids the user cannot act on fail individually."""
+        outsider = Connection.objects.create(
+            from_user=self.requests[0].from_user,
+            to_user=self.requests[1].from_user,
+        )
+        sent = Connection.objects.create(
+            from_user=self.user,
+            to_user=User.objects.create_user(email="target@example.com", password="TestPass123!"),
+        )
+        payload = {
+            "accept": [self.requests[0].id, outsider.id, sent.id],
+            "block": [self.requests[3].id],
+        }
+        response = self.client.post(self.url, payload, format="json")
+        results = {r["id"]: r for r in response.data["results"]}
+
+        self.assertEqual(results[self.requests[0].id]["status"], Connection.Status.ACCEPTED)
+        self.assertEqual(results[outsider.id]["error"], "Connection not found.")
+        self.assertEqual(results[sent.id]["error"], "You can only respond to requests sent to you.")
+        self.assertEqual(results[self.requests[3].id]["status"], Connection.Status.BLOCKED)
+        outsider.refresh_from_db()
+        self.assertEqual(outsider.status, Connection.Status.PENDING)
+
+    def test_conflicting_actions_rejected(self):
+        """Test the same id cannot be accepted and rejected in one request."""
+        connection_id = self.requests[0].id
+        response = self.client.post(self.url, {"accept": [connection_id], "reject": [connection_id]}, format="json")
+        self.assertTrue(all(r["status"] == "error" for r in response.data["results"]))
+        self.requests[0].refresh_from_db()
+        self.assertEqual(self.requests[0].status, Connection.Status.PENDING)
+
+
+class MutualConnectionTests(TestCase):
+    """Test suite for mutual connection counts."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(email=f"mutual{i}@example.com", password="TestPass123!", is_active=True)
+            for i in range(5)
+        ]
+        for user in self.users:
+            Profile.objects.create(user=user, display_name=user.email)
+        viewer, friend, *shared = self.users
+        # viewer and friend share three connections
+        for other in shared:
+            Connection.objects.create(from_user=viewer, to_user=other, status=Connection.Status.ACCEPTED)
+            Connection.objects.create(from_user=other, to_user=friend, status=Connection.Status.ACCEPTED)
+
+    def test_mutual_counts_batch(self):
+        """Test counts come from intersecting the cached accepted-id arrays."""
+        viewer, friend, first_shared = self.users[:3]
+        counts = graph.mutual_connection_counts(viewer, [friend.id, first_shared.id])
+        self.assertEqual(counts, {friend.id: 3, first_shared.id: 0})
+
+        # A whole page is served from cache once warm
+        with CaptureQueriesContext(db_connection) as queries:
+            graph.mutual_connection_counts(viewer, [friend.id, first_shared.id])
+        self.assertEqual(len(queries), 0)
+
+    def test_connection_list_includes_mutual_count(self):
+        """Test profiles in the connections list carry the shared count."""
+        viewer, friend = self.users[:2]
+        Connection.objects.create(from_user=friend, to_user=viewer)
+        client = APIClient()
+        client.force_authenticate(user=viewer)
+
+        response = client.get(reverse("connections:connection-list"), {"status": "pending_received"})
+        self.assertEqual(response.data["results"][0]["from_user_profile"]["mutual_connection_count"], 3)
+
+
+class ConnectionPurgeTests(TestCase):
+    """Test suite for expiring stale connections."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="purge@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.others = [
+            User.objects.create_user(email=f"stale{i}@example.com", password="TestPass123!", is_active=True)
+            for i in range(5)
+        ]
+
+    def age(self, connection, days):
+        then = timezone.now() - timedelta(days=days)
+        Connection.objects.filter(pk=connection.pk).update(created_at=then, updated_at=then)
+
+    def test_purge_removes_only_stale_rows(self):
+        """Test old pending and rejected rows go in batches; fresh and accepted rows stay."""
+        expired = Connection.objects.create(from_user=self.others[0], to_user=self.user)
+        fresh = Connection.objects.create(from_user=self.others[1], to_user=self.user)
+        old_rejected = Connection.objects.create(from_user=self.others[2], to_user=self.user)
+        old_rejected.reject()
+        old_accepted = Connection.objects.create(from_user=self.others[3], to_user=self.user)
+        old_accepted.accept()
+        recent_rejected = Connection.objects.create(from_user=self.others[4], to_user=self.user)
+        recent_rejected.reject()
+        for connection in (expired, old_rejected, old_accepted):
+            self.age(connection, 365)
+        self.assertTrue(graph.get_graph(self.user).is_pending(self.others[0].id))
+
+        stats = purge_stale_connections(batch_size=2)
+        self.assertEqual((stats["pending"], stats["rejected"]), (1, 1))
+        self.assertEqual(stats["batches"], 2)
+        self.assertEqual(
+            set(Connection.objects.values_list("id", flat=True)),
+            {fresh.id, old_accepted.id, recent_rejected.id},
+        )
+        # Badge and cached graph follow the deletes
+        self.assertEqual(counters.get_counters(self.user)["pending_received_count"], 1)
+        self.assertFalse(graph.get_graph(self.user).is_pending(self.others[0].id))
+
+    def test_purge_with_nothing_stale(self):
+        """Test a run with no stale rows does no batches."""
+        Connection.objects.create(from_user=self.others[0], to_user=self.user)
+        self.assertEqual(purge_stale_connections(), {"pending": 0, "rejected": 0, "batches": 0})
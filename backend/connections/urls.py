@@ -1,6 +1,7 @@
 from django.urls import path
 
 from .views import (
+    ConnectionBulkActionView,
     ConnectionCreateView,
     ConnectionDetailView,
     ConnectionListView,
@@ -14,6 +15,7 @@ urlpatterns = [
     path("", ConnectionListView.as_view(), name="connection-list"),
     path("received/", ConnectionReceivedListView.as_view(), name="connection-received"),
     path("sent/", ConnectionSentListView.as_view(), name="connection-sent"),
+    path("bulk/", ConnectionBulkActionView.as_view(), name="connection-bulk-action"),
     path("create/", ConnectionCreateView.as_view(), name="connection-create"),
     path("<int:pk>/", ConnectionDetailView.as_view(), name="connection-detail"),
 ]
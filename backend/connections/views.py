@@ -1,11 +1,23 @@
+from collections import Counter
+
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from chat.models import ChatThread
+from outbox import dispatch as outbox
+from profiles import counters
+
+from . import graph
 from .models import Connection
+from .pagination import keyset_page
 from .serializers import (
+    ConnectionBulkActionSerializer,
+    ConnectionCardSerializer,
     ConnectionCreateSerializer,
     ConnectionSerializer,
     ConnectionUpdateSerializer,
@@ -14,54 +26,96 @@ from .serializers import (
 
 class ConnectionListView(APIView):
     """
-    GET /api/v1/connections/ - List connections by status
+    GET /api/v1/connections/ - List connections by status (newest first, keyset paginated)
     Query params:
       - status: 'pending_sent', 'pending_received', 'accepted', 'all'
+      - compact: 1 to return only the other user's card per row
+      - page_size: Rows per page (max 100)
+      - cursor: next_cursor from the previous page
     """
 
     permission_classes = (IsAuthenticated,)
     default_status_filter = "all"
+    default_page_size = 20
+    max_page_size = 100
 
     def get(self, request):
         status_filter = request.query_params.get("status", self.default_status_filter)
+        compact = request.query_params.get("compact") in ("1", "true")
         user = request.user
 
+        try:
+            page_size = min(int(request.query_params.get("page_size", self.default_page_size)), self.max_page_size)
+        except ValueError:
+            page_size = self.default_page_size
+        page_size = max(page_size, 1)
+
         # Base queryset
         queryset = Connection.objects.select_related(
             "from_user", "to_user", "from_user__profile", "to_user__profile"
-        ).prefetch_related(
-            "from_user__profile__photos",
-            "to_user__profile__photos",
-            "from_user__profile__intents",
-            "to_user__profile__intents",
-            "from_user__profile__interests",
-            "to_user__profile__interests",
         )
+        if compact:
+            queryset = queryset.prefetch_related("from_user__profile__photos", "to_user__profile__photos")
+        else:
+            queryset = queryset.prefetch_related(
+                "from_user__profile__photos",
+                "to_user__profile__photos",
+                "from_user__profile__intents",
+                "to_user__profile__intents",
+                "from_user__profile__interests",
+                "to_user__profile__interests",
+            )
+
+        # Counts come from the cached relationship graph, not a COUNT query
+        relationships = graph.get_graph(user)
 
         if status_filter == "pending_sent":
             # Requests I sent that are pending
             queryset = queryset.filter(from_user=user, status=Connection.Status.PENDING)
+            count = len(relationships.pending_sent)
         elif status_filter == "pending_received":
             # Requests sent to me that are pending
             queryset = queryset.filter(to_user=user, status=Connection.Status.PENDING)
+            count = len(relationships.pending_received)
         elif status_filter == "accepted":
             # All accepted connections
             queryset = queryset.filter(
                 Q(from_user=user, status=Connection.Status.ACCEPTED)
                 | Q(to_user=user, status=Connection.Status.ACCEPTED)
             )
+            count = len(relationships.accepted)
         else:
             # All connections (exclude blocked)
             queryset = queryset.filter(
                 Q(from_user=user) | Q(to_user=user)
             ).exclude(status=Connection.Status.BLOCKED)
+            count = (
+                len(relationships.accepted)
+                + len(relationships.pending_sent)
+                + len(relationships.pending_received)
+                + len(relationships.rejected)
+            )
+
+        try:
+            rows, next_cursor = keyset_page(queryset, request.query_params.get("cursor"), page_size)
+        except ValueError:
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Serialize
-        serializer = ConnectionSerializer(queryset, many=True, context={"request": request})
+        context = {"request": request}
+        if compact:
+            serializer = ConnectionCardSerializer(rows, many=True, context=context)
+        else:
+            # Shared connections for the page's counterparts, intersected in one batch
+            context["mutual_counts"] = graph.mutual_connection_counts(
+                user, [row.to_user_id if row.from_user_id == user.id else row.from_user_id for row in rows]
+            )
+            serializer = ConnectionSerializer(rows, many=True, context=context)
 
         return Response({
-            "count": queryset.count(),
+            "count": count,
             "status_filter": status_filter,
+            "next_cursor": next_cursor,
             "results": serializer.data,
         })
 
@@ -124,3 +178,101 @@ class ConnectionDetailView(generics.RetrieveUpdateDestroyAPIView):
         # Either user can delete accepted connections (disconnect)
         instance.delete()
 
+
+class ConnectionBulkActionView(APIView):
+    """
+    POST /api/v1/connections/bulk/ - Accept, reject or block many connections at once
+    Body: {"accept": [<id>, ...], "reject": [<id>, ...], "block": [<id>, ...]}
+
+    Ownership is checked with one query, each action is applied with a single
+    UPDATE, and the chat threads and connection.accepted outbox events are
+    written with one bulk_create each. Results are reported per id, in request order.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    # action -> resulting status
+    actions = {
+        "accept": Connection.Status.ACCEPTED,
+        "reject": Connection.Status.REJECTED,
+        "block": Connection.Status.BLOCKED,
+    }
+
+    def post(self, request):
+        serializer = ConnectionBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+
+        items = [
+            (connection_id, action)
+            for action in self.actions
+            for connection_id in dict.fromkeys(serializer.validated_data[action])
+        ]
+        errors = {}
+        seen = {}
+        for connection_id, action in items:
+            if seen.setdefault(connection_id, action) != action:
+                errors[connection_id] = "Conflicting actions for this connection."
+
+        to_apply = {action: [] for action in self.actions}
+        with transaction.atomic():
+            rows = {
+                row["id"]: row
+                for row in Connection.objects.select_for_update()
+                .filter(Q(from_user=user) | Q(to_user=user), id__in=list(seen))
+                .exclude(status=Connection.Status.BLOCKED)
+                .values("id", "from_user_id", "to_user_id", "status")
+            }
+
+            for connection_id, action in items:
+                row = rows.get(connection_id)
+                if connection_id in errors:
+                    continue
+                if row is None:
+                    errors[connection_id] = "Connection not found."
+                elif action in ("accept", "reject") and row["to_user_id"] != user.id:
+                    # Only to_user can accept/reject pending requests
+                    errors[connection_id] = "You can only respond to requests sent to you."
+                elif action in ("accept", "reject") and row["status"] != Connection.Status.PENDING:
+                    errors[connection_id] = "This request is no longer pending."
+                else:
+                    to_apply[action].append(row)
+
+            now = timezone.now()
+            for action, action_rows in to_apply.items():
+                if not action_rows:
+                    continue
+                changes = {"status": self.actions[action], "updated_at": now}
+                if action == "accept":
+                    changes["accepted_at"] = now
+                Connection.objects.filter(id__in=[row["id"] for row in action_rows]).update(**changes)
+
+            # Chat threads are opened right away; the outbox handler is an idempotent backstop
+            if to_apply["accept"]:
+                ChatThread.bulk_create_threads([(row["from_user_id"], row["to_user_id"]) for row in to_apply["accept"]])
+                outbox.enqueue_many(
+                    "connection.accepted",
+                    [{"from_user_id": row["from_user_id"], "to_user_id": row["to_user_id"]} for row in to_apply["accept"]],
+                )
+
+            # update() bypasses Connection.save(), so release pending badges and drop the cached graphs here
+            changed = [row for action_rows in to_apply.values() for row in action_rows]
+            released = Counter(
+                row["to_user_id"] for row in changed if row["status"] == Connection.Status.PENDING
+            )
+            for to_user_id, count in released.items():
+                counters.adjust(to_user_id, pending_received_count=-count)
+            if changed:
+                graph.invalidate(
+                    user.id,
+                    *{row["from_user_id"] for row in changed},
+                    *{row["to_user_id"] for row in changed},
+                )
+
+        results = []
+        for connection_id, action in items:
+            if connection_id in errors:
+                results.append({"id": connection_id, "action": action, "status": "error", "error": errors[connection_id]})
+            else:
+                results.append({"id": connection_id, "action": action, "status": self.actions[action]})
+        return Response({"results": results}, status=status.HTTP_200_OK)
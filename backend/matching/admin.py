@@ -1,3 +1,23 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ConnectionRecommendation
+
+
+@admin.register(ConnectionRecommendation)
+class ConnectionRecommendationAdmin(admin.ModelAdmin):
+    list_display = (
+        "user",
+        "rank",
+        "recommended_user",
+        "score",
+        "mutual_count",
+        "shared_intent_count",
+        "generated_at",
+    )
+    list_select_related = ("user", "recommended_user")
+    search_fields = ("user__email", "recommended_user__email")
+    ordering = ["user", "rank"]
+
+    def has_add_permission(self, request):
+        # Rows are written by the build_recommendations job
+        return False
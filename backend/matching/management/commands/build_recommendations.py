@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from matching.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild friends-of-friends recommendations from the accepted-connection graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=settings.RECOMMENDATIONS_SHARDS,
+            help="Number of user shards (more shards = less memory per pass)",
+        )
+        parser.add_argument(
+            "--top-n",
+            type=int,
+            default=settings.RECOMMENDATIONS_TOP_N,
+            help="Recommendations kept per user",
+        )
+        parser.add_argument(
+            "--max-degree",
+            type=int,
+            default=settings.RECOMMENDATIONS_MAX_DEGREE,
+            help="Skip expanding users with more connections than this",
+        )
+        parser.add_argument(
+            "--workdir",
+            help="Directory for the intermediate shard files (default: a temporary directory)",
+        )
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix="recommendations-", dir=options["workdir"])
+        try:
+            self.stdout.write(f"Building recommendations in {options['shards']} shards...")
+            stats = build_recommendations(
+                workdir,
+                shards=options["shards"],
+                top_n=options["top_n"],
+                max_degree=options["max_degree"],
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done! {stats['recommendations']} recommendations for {stats['users']} users "
+                f"({stats['edges']} edges, {stats['wedges']} 2-hop paths)."
+            )
+        )
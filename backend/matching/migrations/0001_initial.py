@@ -0,0 +1,75 @@
+# Generated by Django 5.2.9 on 2026-01-26 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConnectionRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "rank",
+                    models.PositiveSmallIntegerField(
+                        help_text="1 = best recommendation"
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "mutual_count",
+                    models.PositiveIntegerField(
+                        help_text="Accepted connections in common"
+                    ),
+                ),
+                ("shared_intent_count", models.PositiveSmallIntegerField(default=0)),
+                ("generated_at", models.DateTimeField()),
+                (
+                    "recommended_user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="connection_recommendations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["user", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "rank"], name="matching_co_user_id_d3ebb2_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "recommended_user"),
+                        name="unique_recommendation_per_user",
+                    )
+                ],
+            },
+        ),
+    ]
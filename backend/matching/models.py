@@ -1,3 +1,40 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ConnectionRecommendation(models.Model):
+    """
+    A "people you may know" suggestion from the friends-of-friends job.
+    Rows are replaced per user each time the job runs.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="connection_recommendations",
+    )
+    recommended_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    rank = models.PositiveSmallIntegerField(help_text="1 = best recommendation")
+    score = models.FloatField()
+    mutual_count = models.PositiveIntegerField(help_text="Accepted connections in common")
+    shared_intent_count = models.PositiveSmallIntegerField(default=0)
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["user", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recommended_user"],
+                name="unique_recommendation_per_user",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"Recommend {self.recommended_user_id} to {self.user_id} (#{self.rank})"
@@ -0,0 +1,233 @@
+"""
+Friends-of-friends ("people you may know") recommendations.
+
+build_recommendations() works in three streaming passes over binary files in
+a work directory, so memory is bounded by one shard rather than the whole
+connection graph:
+
+1. Export: stream every Connection row once. Accepted edges are written to
+   adjacency shards keyed by the middle user (both orientations); every pair
+   that already has a row (pending, accepted, rejected or blocked) is written
+   to exclusion shards keyed by each side.
+2. Expand: per adjacency shard, group each middle user's neighbours and
+   write a wedge (u, w) for every ordered pair of them into candidate shards
+   keyed by u. Hubs above max_degree are skipped.
+3. Score: per candidate shard, count wedges per (u, w) - the mutual count -
+   drop excluded pairs, inactive users and candidates hidden from discovery
+   (incomplete profile or visible=False), add shared intents, keep the top N
+   per user and replace those users' ConnectionRecommendation rows.
+"""
+
+import heapq
+import os
+from array import array
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from connections.models import Connection
+from profiles.models import Profile
+
+from .models import ConnectionRecommendation
+
+# Same weights as discovery: 3 per mutual connection, 15 per shared intent
+MUTUAL_WEIGHT = 3
+INTENT_WEIGHT = 15
+
+# Candidates kept per user (by mutual count) before intents are looked up
+PREFILTER_FACTOR = 3
+
+LOOKUP_BATCH_SIZE = 1000
+
+# Profiles that discovery would show; only these are recommended
+DISCOVERABLE_PROFILE = {
+    "user__is_active": True,
+    "is_complete": True,
+    "matching_preference__visible": True,
+}
+
+
+class ShardWriter:
+    """Buffered writer of (a, b) int64 pairs into one file per shard."""
+
+    def __init__(self, workdir, prefix, shards, buffer_pairs=65536):
+        self.paths = [os.path.join(workdir, f"{prefix}-{shard}.bin") for shard in range(shards)]
+        self.buffers = [array("q") for _ in range(shards)]
+        self.buffer_items = buffer_pairs * 2
+        self.count = 0
+
+    def write(self, shard, a, b):
+        buffer = self.buffers[shard]
+        buffer.append(a)
+        buffer.append(b)
+        self.count += 1
+        if len(buffer) >= self.buffer_items:
+            self.flush(shard)
+
+    def flush(self, shard):
+        if self.buffers[shard]:
+            with open(self.paths[shard], "ab") as f:
+                self.buffers[shard].tofile(f)
+            self.buffers[shard] = array("q")
+
+    def close(self):
+        for shard in range(len(self.buffers)):
+            self.flush(shard)
+
+
+def read_pairs(path, chunk_pairs=65536):
+    """Stream (a, b) pairs back from a shard file."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        while True:
+            chunk = array("q")
+            try:
+                chunk.fromfile(f, chunk_pairs * 2)
+            except EOFError:
+                pass  # the final, partial chunk is still read
+            if not chunk:
+                return
+            for index in range(0, len(chunk), 2):
+                yield chunk[index], chunk[index + 1]
+
+
+def export_edges(workdir, shards, chunk_size=5000):
+    """Pass 1: write adjacency and exclusion shards. Returns (edges, pairs)."""
+    adjacency = ShardWriter(workdir, "adjacency", shards)
+    exclusions = ShardWriter(workdir, "exclude", shards)
+    rows = Connection.objects.values_list("from_user_id", "to_user_id", "status").iterator(chunk_size=chunk_size)
+    for from_user_id, to_user_id, status in rows:
+        exclusions.write(from_user_id % shards, from_user_id, to_user_id)
+        exclusions.write(to_user_id % shards, to_user_id, from_user_id)
+        if status == Connection.Status.ACCEPTED:
+            adjacency.write(from_user_id % shards, from_user_id, to_user_id)
+            adjacency.write(to_user_id % shards, to_user_id, from_user_id)
+    adjacency.close()
+    exclusions.close()
+    return adjacency.count // 2, exclusions.count // 2
+
+
+def expand_wedges(workdir, shards, max_degree):
+    """Pass 2: write a (u, w) wedge for every 2-hop path u - v - w. Returns the wedge count."""
+    wedges = ShardWriter(workdir, "wedges", shards)
+    for shard in range(shards):
+        neighbours = defaultdict(list)
+        for middle, other in read_pairs(os.path.join(workdir, f"adjacency-{shard}.bin")):
+            neighbours[middle].append(other)
+        for friends in neighbours.values():
+            if len(friends) > max_degree:
+                continue
+            for user_id in friends:
+                for candidate_id in friends:
+                    if candidate_id != user_id:
+                        wedges.write(user_id % shards, user_id, candidate_id)
+    wedges.close()
+    return wedges.count
+
+
+def _batched(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        yield ids[start:start + LOOKUP_BATCH_SIZE]
+
+
+def _load_user_info(user_ids):
+    """Return (active user ids, discoverable user ids, {user_id: set(intent ids)})."""
+    User = get_user_model()
+    active, discoverable, intents = set(), set(), defaultdict(set)
+    for batch in _batched(user_ids):
+        active.update(User.objects.filter(id__in=batch, is_active=True).values_list("id", flat=True))
+        discoverable.update(
+            Profile.objects.filter(user_id__in=batch, **DISCOVERABLE_PROFILE).values_list("user_id", flat=True)
+        )
+        rows = Profile.intents.through.objects.filter(profile__user_id__in=batch).values_list(
+            "profile__user_id", "intenttag_id"
+        )
+        for user_id, intent_id in rows:
+            intents[user_id].add(intent_id)
+    return active, discoverable, intents
+
+
+def score_shard(workdir, shard, top_n):
+    """Pass 3 for one shard: {user_id: [(score, mutual, shared_intents, candidate_id), ...]}, best first."""
+    mutual = defaultdict(Counter)
+    for user_id, candidate_id in read_pairs(os.path.join(workdir, f"wedges-{shard}.bin")):
+        mutual[user_id][candidate_id] += 1
+    if not mutual:
+        return {}
+
+    for user_id, other_id in read_pairs(os.path.join(workdir, f"exclude-{shard}.bin")):
+        if user_id in mutual:
+            mutual[user_id].pop(other_id, None)
+
+    shortlist = {
+        user_id: counts.most_common(top_n * PREFILTER_FACTOR) for user_id, counts in mutual.items() if counts
+    }
+    del mutual
+
+    involved = set(shortlist)
+    for candidates in shortlist.values():
+        involved.update(candidate_id for candidate_id, _ in candidates)
+    active, discoverable, intents = _load_user_info(involved)
+
+    results = {}
+    for user_id, candidates in shortlist.items():
+        if user_id not in active:
+            continue
+        scored = []
+        for candidate_id, mutual_count in candidates:
+            if candidate_id not in discoverable:
+                continue
+            shared = len(intents.get(user_id, set()) & intents.get(candidate_id, set()))
+            scored.append((mutual_count * MUTUAL_WEIGHT + shared * INTENT_WEIGHT, mutual_count, shared, candidate_id))
+        if scored:
+            results[user_id] = heapq.nlargest(top_n, scored)
+    return results
+
+
+def save_shard(results, generated_at):
+    """Replace the recommendations of the users in `results`."""
+    rows = [
+        ConnectionRecommendation(
+            user_id=user_id,
+            recommended_user_id=candidate_id,
+            rank=rank,
+            score=score,
+            mutual_count=mutual_count,
+            shared_intent_count=shared,
+            generated_at=generated_at,
+        )
+        for user_id, scored in results.items()
+        for rank, (score, mutual_count, shared, candidate_id) in enumerate(scored, start=1)
+    ]
+    with transaction.atomic():
+        for batch in _batched(results):
+            ConnectionRecommendation.objects.filter(user_id__in=batch).delete()
+        ConnectionRecommendation.objects.bulk_create(rows, batch_size=LOOKUP_BATCH_SIZE)
+    return len(rows)
+
+
+def build_recommendations(workdir, shards, top_n, max_degree):
+    """Run all passes and return stats. `workdir` must be an empty directory."""
+    generated_at = timezone.now()
+    edges, pairs = export_edges(workdir, shards)
+    wedges = expand_wedges(workdir, shards, max_degree)
+
+    users = recommendations = 0
+    for shard in range(shards):
+        results = score_shard(workdir, shard, top_n)
+        users += len(results)
+        recommendations += save_shard(results, generated_at)
+
+    # Users who no longer have any candidates keep no stale rows
+    ConnectionRecommendation.objects.filter(generated_at__lt=generated_at).delete()
+    return {
+        "edges": edges,
+        "pairs": pairs,
+        "wedges": wedges,
+        "users": users,
+        "recommendations": recommendations,
+    }
@@ -1,3 +1,94 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from connections.models import Connection
+from profiles.models import IntentTag, MatchingPreference, Profile
+
+from .models import ConnectionRecommendation
+from .recommendations import build_recommendations
+
+User = get_user_model()
+
+
+class RecommendationTests(TestCase):
+    """Test suite for friends-of-friends recommendations."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = {}
+        for name in ("ama", "kofi", "esi", "yaw", "abena", "kwame"):
+            user = User.objects.create_user(
+                email=f"{name}@example.com",
+                password="TestPass123!",
+                is_active=True,
+            )
+            profile = Profile.objects.create(user=user, display_name=name.title(), is_complete=True)
+            MatchingPreference.objects.create(profile=profile)
+            self.users[name] = user
+
+        # ama - kofi - esi, ama - yaw - esi, ama - kofi - abena, kofi - kwame
+        for a, b in (("ama", "kofi"), ("ama", "yaw"), ("kofi", "esi"), ("yaw", "esi"), ("kofi", "abena"), ("kofi", "kwame")):
+            Connection.objects.create(
+                from_user=self.users[a],
+                to_user=self.users[b],
+                status=Connection.Status.ACCEPTED,
+            )
+        # ama already has a pending request with kwame
+        Connection.objects.create(from_user=self.users["kwame"], to_user=self.users["ama"])
+
+        friends = IntentTag.objects.create(name="friends")
+        self.users["ama"].profile.intents.add(friends)
+        self.users["abena"].profile.intents.add(friends)
+
+    def build(self, shards=3):
+        with tempfile.TemporaryDirectory() as workdir:
+            return build_recommendations(workdir, shards=shards, top_n=5, max_degree=100)
+
+    def test_two_hop_candidates_ranked_by_mutuals_and_intents(self):
+        """Test candidates are 2-hop, exclude existing pairs, and rank by score."""
+        self.build()
+        recommended = list(
+            ConnectionRecommendation.objects.filter(user=self.users["ama"]).values_list(
+                "recommended_user__email", "mutual_count", "shared_intent_count"
+            )
+        )
+        # abena: 1 mutual + shared intent (18) beats esi: 2 mutuals (6); kwame is pending
+        self.assertEqual(recommended, [("abena@example.com", 1, 1), ("esi@example.com", 2, 0)])
+
+    def test_sharding_does_not_change_results(self):
+        """Test results are the same with one shard or many."""
+        self.build(shards=1)
+        single = set(ConnectionRecommendation.objects.values_list("user_id", "recommended_user_id", "rank"))
+        self.build(shards=7)
+        sharded = set(ConnectionRecommendation.objects.values_list("user_id", "recommended_user_id", "rank"))
+        self.assertEqual(single, sharded)
+
+    def test_endpoint_hides_since_connected_users(self):
+        """Test the endpoint serves stored rows minus users connected since the run."""
+        self.build()
+        Connection.objects.create(from_user=self.users["ama"], to_user=self.users["esi"])
+
+        self.client.force_authenticate(user=self.users["ama"])
+        response = self.client.get(reverse("matching:recommendation-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["user_id"] for r in response.data["results"]], [self.users["abena"].id])
+        self.assertEqual(response.data["results"][0]["mutual_connection_count"], 1)
+
+    def test_hidden_profiles_are_not_recommended(self):
+        """Test candidates hidden from discovery are skipped by the job and at serve time."""
+        MatchingPreference.objects.filter(profile__user=self.users["esi"]).update(visible=False)
+        self.build()
+        recommended = ConnectionRecommendation.objects.filter(user=self.users["ama"])
+        self.assertEqual([r.recommended_user_id for r in recommended], [self.users["abena"].id])
 
-# Create your tests here.
+        Profile.objects.filter(user=self.users["abena"]).update(is_complete=False)
+        self.client.force_authenticate(user=self.users["ama"])
+        response = self.client.get(reverse("matching:recommendation-list"))
+        self.assertEqual(response.data["results"], [])
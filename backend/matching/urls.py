@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import RecommendationListView
+
+app_name = "matching"
+
+urlpatterns = [
+    path("", RecommendationListView.as_view(), name="recommendation-list"),
+]
@@ -1,3 +1,53 @@
-from django.shortcuts import render
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from connections import graph
+from profiles.serializers import PublicProfileSerializer
+
+
+class RecommendationListView(APIView):
+    """
+    GET /api/v1/recommendations/ - "People you may know" (precomputed by build_recommendations)
+
+    Recommendations are refreshed by the batch job; anyone the user has since
+    connected with, requested or blocked, or who has since left discovery
+    (deactivated, incomplete profile or visible=False), is filtered out here.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        relationships = graph.get_graph(request.user)
+        recommendations = [
+            recommendation
+            for recommendation in request.user.connection_recommendations.filter(
+                recommended_user__is_active=True,
+                recommended_user__profile__is_complete=True,
+                recommended_user__profile__matching_preference__visible=True,
+            ).select_related(
+                "recommended_user__profile"
+            ).prefetch_related(
+                "recommended_user__profile__photos",
+                "recommended_user__profile__intents",
+                "recommended_user__profile__interests",
+            )
+            if relationships.status_with(recommendation.recommended_user_id) is None
+        ]
+        mutual_counts = {r.recommended_user_id: r.mutual_count for r in recommendations}
+
+        data = []
+        for recommendation in recommendations:
+            profile_data = PublicProfileSerializer(
+                recommendation.recommended_user.profile,
+                context={"mutual_counts": mutual_counts},
+            ).data
+            profile_data["user_id"] = recommendation.recommended_user_id
+            profile_data["shared_intent_count"] = recommendation.shared_intent_count
+            profile_data["score"] = recommendation.score
+            data.append(profile_data)
+
+        return Response({
+            "count": len(data),
+            "results": data,
+        })
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import OutboxEvent
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "topic", "status", "attempts", "available_at", "created_at")
+    list_filter = ("status", "topic")
+    search_fields = ("topic", "last_error")
+    readonly_fields = ("created_at",)
+    ordering = ["id"]
@@ -0,0 +1,117 @@
+"""
+Transactional outbox.
+
+Code that changes state calls enqueue() inside its transaction, so the event
+row commits or rolls back with the change. The drain_outbox worker then
+claims due events in id order (pushing their available_at out by
+OUTBOX_CLAIM_TIMEOUT in a short transaction) and runs each event's handlers
+in a transaction of its own that also deletes the event. A handler that
+raises is retried with exponential backoff; after OUTBOX_MAX_ATTEMPTS the
+event is kept as failed for inspection.
+
+Handlers must be idempotent: an event whose claim expires (the worker died,
+or its handlers outran OUTBOX_CLAIM_TIMEOUT) is picked up again.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+
+
+def register(topic):
+    """Decorator: run the function with each `topic` event's payload."""
+
+    def decorator(func):
+        _handlers[topic].append(func)
+        return func
+
+    return decorator
+
+
+def enqueue(topic, **payload):
+    """Record an event; call inside the transaction that makes the change."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def enqueue_many(topic, payloads):
+    """Record one event per payload with a single insert."""
+    return OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, payload=payload) for payload in payloads])
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1), 60 * 60))
+
+
+def _claim(batch_size):
+    """Lease up to batch_size due events to this worker; the row locks last only for this transaction."""
+    with transaction.atomic():
+        now = timezone.now()
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.Status.PENDING, available_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT)
+        )
+    return events
+
+
+def _dispatch(event):
+    """Run the event's handlers and delete it in one transaction; return the error message or None."""
+    try:
+        with transaction.atomic():
+            for handler in _handlers.get(event.topic, ()):
+                handler(**event.payload)
+            OutboxEvent.objects.filter(id=event.id).delete()
+    except Exception as exc:
+        logger.exception("Outbox handler failed for %s", event)
+        return f"{type(exc).__name__}: {exc}"
+    return None
+
+
+def drain(batch_size=None, max_attempts=None):
+    """
+    Dispatch one batch of due events. Returns {"dispatched": n, "retried": n, "failed": n}.
+    Events are claimed up front, so no row lock is held while handlers run.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+    stats = {"dispatched": 0, "retried": 0, "failed": 0}
+
+    for event in _claim(batch_size):
+        error = _dispatch(event)
+        if error is None:
+            stats["dispatched"] += 1
+            continue
+        event.attempts += 1
+        event.last_error = error
+        if event.attempts >= max_attempts:
+            event.status = OutboxEvent.Status.FAILED
+            stats["failed"] += 1
+        else:
+            event.available_at = timezone.now() + _retry_delay(event.attempts)
+            stats["retried"] += 1
+        event.save(update_fields=["attempts", "last_error", "status", "available_at"])
+    return stats
+
+
+def drain_all(batch_size=None, max_attempts=None):
+    """Drain until no due events remain (used by tests and one-off runs). Returns summed stats."""
+    totals = {"dispatched": 0, "retried": 0, "failed": 0}
+    while True:
+        stats = drain(batch_size, max_attempts)
+        for key, value in stats.items():
+            totals[key] += value
+        if not any(stats.values()):
+            return totals
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from outbox.dispatch import drain, drain_all
+
+
+class Command(BaseCommand):
+    help = "Dispatch queued outbox events to their handlers, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help="Events claimed per transaction",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain what is due now and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.OUTBOX_POLL_INTERVAL,
+            help="Seconds to wait when the outbox is empty",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            stats = drain_all(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(self._summary(stats)))
+            return
+
+        self.stdout.write(f"Draining outbox every {options['interval']}s (Ctrl+C to stop)...")
+        try:
+            while True:
+                stats = drain(batch_size=options["batch_size"])
+                if any(stats.values()):
+                    self.stdout.write(self._summary(stats))
+                else:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def _summary(self, stats):
+        return f"Dispatched {stats['dispatched']}, retrying {stats['retried']}, failed {stats['failed']}."
@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect recorded in the same transaction as the change that caused
+    it, dispatched later by the drain_outbox worker (see outbox.dispatch).
+    Events are deleted once every handler has succeeded.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        FAILED = "failed", "Failed"
+
+    topic = models.CharField(max_length=100, help_text="Event name, e.g. connection.accepted")
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Not dispatched before this time (retry backoff)",
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "available_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id} ({self.status})"
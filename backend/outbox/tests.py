@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chat.models import ChatThread
+from connections.models import Connection
+
+from . import dispatch
+from .models import OutboxEvent
+
+User = get_user_model()
+
+
+class OutboxTests(TestCase):
+    """Test suite for the transactional outbox."""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(email="outbox1@example.com", password="TestPass123!", is_active=True)
+        self.user2 = User.objects.create_user(email="outbox2@example.com", password="TestPass123!", is_active=True)
+        self.calls = []
+
+    def register(self, topic, handler):
+        dispatch.register(topic)(handler)
+        self.addCleanup(dispatch._handlers[topic].remove, handler)
+
+    def test_accept_creates_thread_and_enqueues_backstop(self):
+        """Test accepting opens the chat thread inline; draining the event is a no-op."""
+        connection = Connection.objects.create(from_user=self.user1, to_user=self.user2)
+        connection.accept()
+        event = OutboxEvent.objects.get(topic="connection.accepted")
+        self.assertEqual(event.payload, {"from_user_id": self.user1.id, "to_user_id": self.user2.id})
+        self.assertEqual(ChatThread.objects.filter(user1=self.user1, user2=self.user2).count(), 1)
+
+        self.assertEqual(dispatch.drain()["dispatched"], 1)
+        self.assertEqual(ChatThread.objects.count(), 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_handler_creates_missing_thread(self):
+        """Test the connection.accepted handler opens a thread that is missing."""
+        Connection.objects.create(from_user=self.user1, to_user=self.user2).accept()
+        ChatThread.objects.all().delete()
+
+        dispatch.drain()
+        self.assertTrue(ChatThread.objects.filter(user1=self.user1, user2=self.user2).exists())
+
+    @override_settings(OUTBOX_RETRY_BACKOFF=10, OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_handler_is_retried_then_marked_failed(self):
+        """Test a raising handler backs off, then gives up after the max attempts."""
+
+        def flaky(**payload):
+            self.calls.append(payload)
+            raise RuntimeError("boom")
+
+        self.register("test.flaky", flaky)
+        event = dispatch.enqueue("test.flaky", n=1)
+
+        with self.assertLogs("outbox.dispatch", "ERROR"):
+            self.assertEqual(dispatch.drain()["retried"], 1)
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("boom", event.last_error)
+        self.assertGreater(event.available_at, timezone.now())
+        # Not due yet
+        self.assertEqual(dispatch.drain(), {"dispatched": 0, "retried": 0, "failed": 0})
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs("outbox.dispatch", "ERROR"):
+            self.assertEqual(dispatch.drain()["failed"], 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.Status.FAILED)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_handler_failure_does_not_block_batch(self):
+        """Test one failing event is rolled back on its own while the rest dispatch."""
+
+        def handler(n):
+            if n == 2:
+                raise ValueError("bad event")
+            self.calls.append(n)
+
+        self.register("test.batch", handler)
+        dispatch.enqueue_many("test.batch", [{"n": 1}, {"n": 2}, {"n": 3}])
+
+        with self.assertLogs("outbox.dispatch", "ERROR"):
+            stats = dispatch.drain()
+        self.assertEqual((stats["dispatched"], stats["retried"]), (2, 1))
+        self.assertEqual(self.calls, [1, 3])
+        self.assertEqual(OutboxEvent.objects.get().payload, {"n": 2})
+
+    def test_claimed_events_are_hidden_while_handlers_run(self):
+        """Test events are claimed before dispatch, so a concurrent drain skips them without a row lock."""
+
+        def handler(n):
+            self.calls.append(dispatch.drain())
+
+        self.register("test.claim", handler)
+        event = dispatch.enqueue("test.claim", n=1)
+
+        self.assertEqual(dispatch.drain()["dispatched"], 1)
+        self.assertEqual(self.calls, [{"dispatched": 0, "retried": 0, "failed": 0}])
+        self.assertFalse(OutboxEvent.objects.filter(pk=event.pk).exists())
+
+    def test_expired_claim_is_dispatched_again(self):
+        """Test an event claimed by a worker that died is picked up once its claim times out."""
+        self.register("test.lease", lambda n: self.calls.append(n))
+        event = dispatch.enqueue("test.lease", n=1)
+        dispatch._claim(10)
+        self.assertEqual(dispatch.drain()["dispatched"], 0)
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(dispatch.drain()["dispatched"], 1)
+        self.assertEqual(self.calls, [1])
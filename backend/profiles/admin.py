@@ -5,8 +5,10 @@ from .models import (
     InterestTag,
     LocationPreference,
     MatchingPreference,
+    PhotoUploadSession,
     Profile,
     ProfilePhoto,
+    UserCounters,
 )
 
 
@@ -66,6 +68,19 @@ class InterestTagAdmin(admin.ModelAdmin):
 
 @admin.register(ProfilePhoto)
 class ProfilePhotoAdmin(admin.ModelAdmin):
-    list_display = ("profile", "ordering_index", "uploaded_at")
-    list_filter = ("uploaded_at",)
+    list_display = ("profile", "ordering_index", "status", "uploaded_at")
+    list_filter = ("status", "uploaded_at")
 
+
+@admin.register(UserCounters)
+class UserCountersAdmin(admin.ModelAdmin):
+    list_display = ("user", "pending_received_count", "unread_message_count", "updated_at")
+    search_fields = ("user__email",)
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(PhotoUploadSession)
+class PhotoUploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "filename", "received", "size", "expires_at")
+    search_fields = ("user__email", "filename")
+    readonly_fields = ("created_at",)
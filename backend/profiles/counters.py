@@ -0,0 +1,82 @@
+"""
+Per-user badge counters.
+
+UserCounters rows are adjusted with relative UPDATEs where the underlying
+state changes (Connection transitions, chat message insert and mark-read),
+so reading badges is a single primary-key lookup. reconcile() recomputes
+them from the source tables to correct any drift (e.g. after cascading
+deletes or raw queryset updates).
+"""
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import UserCounters
+
+FIELDS = ("pending_received_count", "unread_message_count")
+
+
+def adjust(user_id, **deltas):
+    """Add deltas (may be negative) to a user's counters, never going below zero."""
+    updates = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    updates["updated_at"] = timezone.now()
+    if not UserCounters.objects.filter(user_id=user_id).update(**updates):
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**updates)
+
+
+def get_counters(user):
+    """Return the user's counters as a dict (zeros if never set)."""
+    values = UserCounters.objects.filter(user_id=user.pk).values(*FIELDS).first()
+    return values or dict.fromkeys(FIELDS, 0)
+
+
+def compute_counters():
+    """Recompute every non-zero counter from Connection and ChatThread: {user_id: {field: value}}."""
+    from chat.models import ChatThread
+    from connections.models import Connection
+
+    expected = {}
+    pending = (
+        Connection.objects.filter(status=Connection.Status.PENDING)
+        .values("to_user_id")
+        .annotate(total=Count("id"))
+    )
+    for row in pending:
+        expected.setdefault(row["to_user_id"], {})["pending_received_count"] = row["total"]
+
+    for slot in ("user1", "user2"):
+        unread = (
+            ChatThread.objects.filter(**{f"{slot}_unread_count__gt": 0})
+            .values(f"{slot}_id")
+            .annotate(total=Sum(f"{slot}_unread_count"))
+        )
+        for row in unread:
+            counts = expected.setdefault(row[f"{slot}_id"], {})
+            counts["unread_message_count"] = counts.get("unread_message_count", 0) + row["total"]
+    return expected
+
+
+def reconcile():
+    """Rewrite drifted thread and user counters. Returns {"threads": n, "users": n} corrected."""
+    from chat.models import ChatThread
+
+    threads = ChatThread.reconcile_unread_counts()
+    expected = compute_counters()
+
+    corrected = []
+    for counters in UserCounters.objects.iterator():
+        values = expected.pop(counters.user_id, {})
+        if any(getattr(counters, field) != values.get(field, 0) for field in FIELDS):
+            for field in FIELDS:
+                setattr(counters, field, values.get(field, 0))
+            corrected.append(counters)
+    UserCounters.objects.bulk_update(corrected, FIELDS, batch_size=1000)
+
+    # Users with activity but no counters row yet
+    missing = [UserCounters(user_id=user_id, **values) for user_id, values in expected.items()]
+    UserCounters.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+    return {"threads": threads, "users": len(corrected) + len(missing)}
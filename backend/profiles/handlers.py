@@ -0,0 +1,11 @@
+"""Outbox handlers for profile side effects (registered in ProfilesConfig.ready)."""
+
+from outbox.dispatch import register
+
+
+@register("profile_photo.uploaded")
+def generate_photo_variants(photo_id):
+    """Build the WebP variants of a newly uploaded photo."""
+    from .photos import process_photo
+
+    process_photo(photo_id)
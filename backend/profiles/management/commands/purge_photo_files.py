@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from profiles.photos import purge_unreferenced_files
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed photo files that no profile photo references"
+
+    def handle(self, *args, **options):
+        removed = purge_unreferenced_files()
+        self.stdout.write(self.style.SUCCESS(f"Done! Removed {removed} unreferenced photo files."))
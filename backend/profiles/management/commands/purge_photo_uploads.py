@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from profiles.uploads import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired resumable photo upload sessions and their part files"
+
+    def handle(self, *args, **options):
+        removed = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Done! Removed {removed} expired upload sessions."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from profiles import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute badge counters (pending requests, unread messages) and fix any drift"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling counters...")
+        fixed = counters.reconcile()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done! Corrected {fixed['users']} users' counters and {fixed['threads']} threads' unread counts."
+            )
+        )
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.9 on 2026-01-31 10:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    """Create counters for users with pending requests received or unread messages."""
+    UserCounters = apps.get_model("profiles", "UserCounters")
+    Connection = apps.get_model("connections", "Connection")
+    ChatThread = apps.get_model("chat", "ChatThread")
+
+    counters = {}
+    pending = Connection.objects.filter(status="pending").values("to_user_id").annotate(total=Count("id"))
+    for row in pending:
+        counters.setdefault(row["to_user_id"], {})["pending_received_count"] = row["total"]
+    for slot in ("user1", "user2"):
+        unread = (
+            ChatThread.objects.filter(**{f"{slot}_unread_count__gt": 0})
+            .values(f"{slot}_id")
+            .annotate(total=Sum(f"{slot}_unread_count"))
+        )
+        for row in unread:
+            values = counters.setdefault(row[f"{slot}_id"], {})
+            values["unread_message_count"] = values.get("unread_message_count", 0) + row["total"]
+
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id, **values) for user_id, values in counters.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("chat", "0008_chatthread_unread_counts"),
+        ("connections", "0003_connection_list_indexes"),
+        ("profiles", "0002_locationpreference_matchingpreference"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserCounters",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="counters",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "pending_received_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Pending connection requests sent to this user",
+                    ),
+                ),
+                (
+                    "unread_message_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Unread chat messages across all threads"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "User Counters",
+                "verbose_name_plural": "User Counters",
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
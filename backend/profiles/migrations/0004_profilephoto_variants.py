@@ -0,0 +1,81 @@
+# Generated by Django 5.2.9 on 2026-02-05 14:40
+
+from django.db import migrations, models
+
+
+def queue_existing_photos(apps, schema_editor):
+    """Queue variant generation for photos uploaded before processing existed."""
+    ProfilePhoto = apps.get_model("profiles", "ProfilePhoto")
+    OutboxEvent = apps.get_model("outbox", "OutboxEvent")
+
+    OutboxEvent.objects.bulk_create(
+        [
+            OutboxEvent(topic="profile_photo.uploaded", payload={"photo_id": photo_id})
+            for photo_id in ProfilePhoto.objects.values_list("id", flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("outbox", "0001_initial"),
+        ("profiles", "0003_usercounters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilephoto",
+            name="card",
+            field=models.ImageField(
+                blank=True, upload_to="profile_photos/%Y/%m/variants/"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="full",
+            field=models.ImageField(
+                blank=True, upload_to="profile_photos/%Y/%m/variants/"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Height of the full variant", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="processed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="thumbnail",
+            field=models.ImageField(
+                blank=True, upload_to="profile_photos/%Y/%m/variants/"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Width of the full variant", null=True
+            ),
+        ),
+        migrations.RunPython(queue_existing_photos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-02-07 16:05
+
+import profiles.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("profiles", "0004_profilephoto_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profilephoto",
+            name="card",
+            field=models.ImageField(
+                blank=True,
+                storage=profiles.storage.get_photo_storage,
+                upload_to="profile_photos/variants/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profilephoto",
+            name="full",
+            field=models.ImageField(
+                blank=True,
+                storage=profiles.storage.get_photo_storage,
+                upload_to="profile_photos/variants/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profilephoto",
+            name="image",
+            field=models.ImageField(
+                storage=profiles.storage.get_photo_storage, upload_to="profile_photos/"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profilephoto",
+            name="thumbnail",
+            field=models.ImageField(
+                blank=True,
+                storage=profiles.storage.get_photo_storage,
+                upload_to="profile_photos/variants/",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-02-10 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("profiles", "0005_profilephoto_content_addressed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilephoto",
+            name="dominant_color",
+            field=models.CharField(
+                blank=True, help_text="Hex color, e.g. #1e78c8", max_length=7
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilephoto",
+            name="placeholder",
+            field=models.TextField(
+                blank=True,
+                help_text="Tiny blurred preview as a data: URI, shown while the variant loads",
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.9 on 2026-02-12 10:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("profiles", "0006_profilephoto_placeholder"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PhotoUploadSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("filename", models.CharField(max_length=255)),
+                (
+                    "size",
+                    models.PositiveIntegerField(
+                        help_text="Total bytes the client will send"
+                    ),
+                ),
+                (
+                    "received",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Bytes stored so far"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("expires_at", models.DateTimeField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="photo_upload_sessions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="profiles_ph_expires_c0b8fc_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 
+from .storage import get_photo_storage
+
 
 class IntentTag(models.Model):
     """Tags representing user intentions (friendship, networking, etc.)."""
@@ -103,17 +107,44 @@ class Profile(models.Model):
 
 
 class ProfilePhoto(models.Model):
-    """Profile photos (1-3 per user)."""
+    """
+    Profile photos (1-3 per user). The uploaded original is kept as-is;
+    clients are served the WebP variants generated by profiles.photos.
+    All files are content-addressed (see profiles.storage).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        READY = "ready", "Ready"
+        FAILED = "failed", "Failed"
 
     profile = models.ForeignKey(
         Profile,
         on_delete=models.CASCADE,
         related_name="photos",
     )
-    image = models.ImageField(upload_to="profile_photos/%Y/%m/")
+    image = models.ImageField(upload_to="profile_photos/", storage=get_photo_storage)
     ordering_index = models.PositiveSmallIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Variants (see profiles.photos.VARIANTS), set once processing succeeds
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    thumbnail = models.ImageField(upload_to="profile_photos/variants/", storage=get_photo_storage, blank=True)
+    card = models.ImageField(upload_to="profile_photos/variants/", storage=get_photo_storage, blank=True)
+    full = models.ImageField(upload_to="profile_photos/variants/", storage=get_photo_storage, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True, help_text="Width of the full variant")
+    height = models.PositiveIntegerField(null=True, blank=True, help_text="Height of the full variant")
+    placeholder = models.TextField(
+        blank=True,
+        help_text="Tiny blurred preview as a data: URI, shown while the variant loads",
+    )
+    dominant_color = models.CharField(max_length=7, blank=True, help_text="Hex color, e.g. #1e78c8")
+    processed_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         ordering = ["ordering_index"]
         constraints = [
@@ -127,6 +158,34 @@ class ProfilePhoto(models.Model):
         return f"Photo {self.ordering_index} for {self.profile}"
 
 
+class PhotoUploadSession(models.Model):
+    """
+    A resumable profile photo upload (see profiles.uploads). Chunks are
+    appended to a part file outside MEDIA_ROOT; `received` is the offset
+    the next chunk must start at.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="photo_upload_sessions",
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(help_text="Total bytes the client will send")
+    received = models.PositiveIntegerField(default=0, help_text="Bytes stored so far")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.received}/{self.size} bytes)"
+
+
 class LocationPreference(models.Model):
     """User's location and radius preferences for matching."""
 
@@ -214,3 +273,34 @@ class MatchingPreference(models.Model):
         verbose_name_plural = "Matching Preferences"
 
 
+
+
+class UserCounters(models.Model):
+    """
+    Badge counters for a user, maintained on connection transitions and
+    chat message insert/read (see profiles.counters) so badges never query
+    Connection or ChatMessage.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counters",
+    )
+    pending_received_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Pending connection requests sent to this user",
+    )
+    unread_message_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Unread chat messages across all threads",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "User Counters"
+        verbose_name_plural = "User Counters"
+
+    def __str__(self):
+        return f"Counters for user {self.user_id}"
@@ -0,0 +1,172 @@
+"""
+Profile photo processing.
+
+Uploads are only sniffed on the request thread (format, byte size, pixel
+count). The profile_photo.uploaded outbox event then has the drain_outbox
+worker decode the original once, apply its EXIF orientation and write
+fixed-size WebP variants with all metadata (EXIF, GPS, ICC) dropped, plus
+an inline placeholder and dominant color for clients to paint first.
+"""
+
+import base64
+import logging
+import os
+import posixpath
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import ProfilePhoto
+from .storage import content_digest, get_photo_storage
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP"}
+
+# Placeholder preview: same 4:5 shape as the card variant, a couple of hundred bytes
+PLACEHOLDER_SIZE = (12, 15)
+PLACEHOLDER_QUALITY = 40
+
+# name -> (width, height, crop). Cropped variants are exactly that size;
+# the full variant fits inside the box and is never upscaled.
+VARIANTS = {
+    "thumbnail": (160, 160, True),
+    "card": (480, 600, True),
+    "full": (1080, 1350, False),
+}
+
+
+def sniff_photo(upload):
+    """
+    Read just the header of an upload and return (format, width, height).
+    Raises ValueError if it is not an accepted photo.
+    """
+    if upload.size > settings.PROFILE_PHOTO_MAX_BYTES:
+        raise ValueError(f"Photo too large (max {settings.PROFILE_PHOTO_MAX_BYTES // (1024 * 1024)} MB).")
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError("Upload a valid image (JPEG, PNG or WebP).")
+    finally:
+        upload.seek(0)
+
+    if image_format not in ALLOWED_FORMATS:
+        raise ValueError("Upload a valid image (JPEG, PNG or WebP).")
+    if width * height > settings.PROFILE_PHOTO_MAX_PIXELS:
+        raise ValueError("Image dimensions are too large.")
+    return image_format, width, height
+
+
+def _render(image, width, height, crop):
+    """Return a resized copy of `image` for one variant."""
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    variant = image.copy()
+    variant.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return variant
+
+
+def _encode_webp(image):
+    buffer = BytesIO()
+    image.info.clear()  # no EXIF/XMP/ICC carried over
+    image.save(buffer, "WEBP", quality=settings.PROFILE_PHOTO_WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def placeholder_for(card):
+    """Return (data URI of a tiny blurred preview, dominant color as #rrggbb) for a card-sized image."""
+    preview = card.convert("RGB").resize(PLACEHOLDER_SIZE, Image.Resampling.BOX)
+    buffer = BytesIO()
+    preview.save(buffer, "WEBP", quality=PLACEHOLDER_QUALITY)
+    data_uri = f"data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+    # Most common color of a small palette, so a busy background doesn't average to grey
+    palette_image = card.convert("RGB").resize((64, 64), Image.Resampling.BOX).quantize(colors=8)
+    _, index = max(palette_image.getcolors())
+    red, green, blue = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return data_uri, f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def process_photo(photo_id):
+    """Generate the variants for a pending photo; bad images are marked failed."""
+    photo = ProfilePhoto.objects.filter(pk=photo_id).first()
+    if photo is None or photo.status != ProfilePhoto.Status.PENDING:
+        return photo
+
+    try:
+        with photo.image.open("rb"), Image.open(photo.image) as source:
+            # Re-check before decoding: the stored file may not be what was sniffed
+            if source.width * source.height > settings.PROFILE_PHOTO_MAX_PIXELS:
+                raise ValueError("Image dimensions are too large.")
+            image = ImageOps.exif_transpose(source)
+            image.load()
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+        stem = os.path.splitext(os.path.basename(photo.image.name))[0]
+        for name, (width, height, crop) in VARIANTS.items():
+            variant = _render(image, width, height, crop)
+            getattr(photo, name).save(f"{stem}_{name}.webp", ContentFile(_encode_webp(variant)), save=False)
+            if name == "card":
+                photo.placeholder, photo.dominant_color = placeholder_for(variant)
+            if name == "full":
+                photo.width, photo.height = variant.size
+        photo.status = ProfilePhoto.Status.READY
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Could not process profile photo %s", photo_id)
+        photo.status = ProfilePhoto.Status.FAILED
+
+    photo.processed_at = timezone.now()
+    photo.save(update_fields=[
+        "status",
+        "thumbnail",
+        "card",
+        "full",
+        "width",
+        "height",
+        "placeholder",
+        "dominant_color",
+        "processed_at",
+    ])
+    return photo
+
+
+def _stored_names(storage, directory):
+    """Yield every file name below `directory` in `storage`."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from _stored_names(storage, posixpath.join(directory, subdirectory))
+
+
+def purge_unreferenced_files(now=None):
+    """
+    Delete content-addressed photo files that no ProfilePhoto references.
+    Returns the number removed.
+
+    Files touched within PROFILE_PHOTO_ORPHAN_GRACE are kept: an upload that
+    reuses a file refreshes its mtime before its row is committed.
+    """
+    storage = get_photo_storage()
+    fields = ("image", "thumbnail", "card", "full")
+    referenced = set()
+    for names in ProfilePhoto.objects.values_list(*fields).iterator():
+        referenced.update(name for name in names if name)
+
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.PROFILE_PHOTO_ORPHAN_GRACE)
+    removed = 0
+    for name in _stored_names(storage, "profile_photos"):
+        if name in referenced or content_digest(name) is None:
+            continue
+        if storage.get_modified_time(name) > cutoff:
+            continue
+        storage.delete(name)
+        removed += 1
+    return removed
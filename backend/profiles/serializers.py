@@ -1,14 +1,22 @@
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Max
 from rest_framework import serializers
 
+from config import media
+from outbox import dispatch as outbox
+
+from . import uploads
 from .models import (
     IntentTag,
     InterestTag,
     LocationPreference,
     MatchingPreference,
+    PhotoUploadSession,
     Profile,
     ProfilePhoto,
 )
+from .photos import sniff_photo
 
 
 class IntentTagSerializer(serializers.ModelSerializer):
@@ -23,11 +31,49 @@ class InterestTagSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "category")
 
 
+class SignedMediaField(serializers.Field):
+    """Read-only URL of a stored file, signed when its path is protected (see config.media)."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return media.media_url(value, self.context.get("request"))
+
+
 class ProfilePhotoSerializer(serializers.ModelSerializer):
+    """
+    Signed photo variant URLs (null until processing has finished). `image`
+    is kept for existing clients: the full variant, or the upload until
+    that exists, so it is never null.
+    """
+
+    image = serializers.SerializerMethodField()
+    thumbnail = SignedMediaField()
+    card = SignedMediaField()
+    full = SignedMediaField()
+
     class Meta:
         model = ProfilePhoto
-        fields = ("id", "image", "ordering_index", "uploaded_at")
-        read_only_fields = ("id", "uploaded_at")
+        fields = (
+            "id",
+            "image",
+            "status",
+            "thumbnail",
+            "card",
+            "full",
+            "width",
+            "height",
+            "placeholder",
+            "dominant_color",
+            "ordering_index",
+            "uploaded_at",
+        )
+        read_only_fields = fields
+
+    def get_image(self, obj):
+        return media.media_url(obj.full or obj.image, self.context.get("request"))
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -123,6 +169,13 @@ class ProfilePhotoUploadSerializer(serializers.ModelSerializer):
         model = ProfilePhoto
         fields = ("id", "image", "ordering_index")
 
+    def validate_image(self, value):
+        try:
+            sniff_photo(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
     def validate(self, attrs):
         profile = self.context["profile"]
         # Check max photos limit (3)
@@ -136,7 +189,47 @@ class ProfilePhotoUploadSerializer(serializers.ModelSerializer):
         # Always auto-assign the next ordering_index
         max_index = profile.photos.aggregate(max_idx=Max("ordering_index"))["max_idx"]
         validated_data["ordering_index"] = (max_index if max_index is not None else -1) + 1
-        return ProfilePhoto.objects.create(profile=profile, **validated_data)
+        with transaction.atomic():
+            photo = ProfilePhoto.objects.create(profile=profile, **validated_data)
+            # Variants are generated by the outbox worker, off the request
+            outbox.enqueue("profile_photo.uploaded", photo_id=photo.id)
+        return photo
+
+    def to_representation(self, instance):
+        return ProfilePhotoSerializer(instance, context=self.context).data
+
+
+class PhotoUploadSessionSerializer(serializers.ModelSerializer):
+    """A resumable upload: create with filename and size, then PUT chunks from `offset`."""
+
+    offset = serializers.IntegerField(source="received", read_only=True)
+
+    class Meta:
+        model = PhotoUploadSession
+        fields = ("id", "filename", "size", "offset", "expires_at")
+        read_only_fields = ("id", "offset", "expires_at")
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Size must be positive.")
+        if value > settings.PROFILE_PHOTO_MAX_BYTES:
+            raise serializers.ValidationError(
+                f"Photo too large (max {settings.PROFILE_PHOTO_MAX_BYTES // (1024 * 1024)} MB)."
+            )
+        return value
+
+    def validate(self, attrs):
+        user = self.context["request"].user
+        profile = self.context["profile"]
+        # Fail before any bytes are sent if the photo could never be finalized
+        if profile.photos.count() >= 3:
+            raise serializers.ValidationError("Maximum of 3 photos allowed per profile.")
+        if uploads.active_sessions(user).count() >= uploads.MAX_ACTIVE_SESSIONS:
+            raise serializers.ValidationError("Too many unfinished uploads; finish or cancel one first.")
+        return attrs
+
+    def create(self, validated_data):
+        return uploads.create_session(self.context["request"].user, **validated_data)
 
 
 class PublicProfileSerializer(serializers.ModelSerializer):
@@ -146,6 +239,7 @@ class PublicProfileSerializer(serializers.ModelSerializer):
     intents = IntentTagSerializer(many=True, read_only=True)
     photos = ProfilePhotoSerializer(many=True, read_only=True)
     faith = serializers.SerializerMethodField()
+    mutual_connection_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
@@ -160,6 +254,7 @@ class PublicProfileSerializer(serializers.ModelSerializer):
             "interests",
             "intents",
             "photos",
+            "mutual_connection_count",
         )
 
     def get_faith(self, obj):
@@ -168,6 +263,40 @@ class PublicProfileSerializer(serializers.ModelSerializer):
             return obj.faith
         return None
 
+    def get_mutual_connection_count(self, obj):
+        """Shared connections with the viewer, batch-computed by the view into context["mutual_counts"]."""
+        return self.context.get("mutual_counts", {}).get(obj.user_id)
+
+
+class ProfileCardSerializer(serializers.ModelSerializer):
+    """Compact profile for lists: name, age bucket and first photo (with its placeholder) only."""
+
+    photo = serializers.SerializerMethodField()
+    photo_placeholder = serializers.SerializerMethodField()
+    photo_color = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Profile
+        fields = ("id", "display_name", "pronouns", "age_bucket", "photo", "photo_placeholder", "photo_color")
+
+    def _card_photo(self, obj):
+        # Uses prefetched photos when available (ordered by ordering_index)
+        return next((p for p in obj.photos.all() if p.status == ProfilePhoto.Status.READY), None)
+
+    def get_photo(self, obj):
+        photo = self._card_photo(obj)
+        if photo is None:
+            return None
+        return media.media_url(photo.card, self.context.get("request"))
+
+    def get_photo_placeholder(self, obj):
+        photo = self._card_photo(obj)
+        return photo.placeholder if photo else None
+
+    def get_photo_color(self, obj):
+        photo = self._card_photo(obj)
+        return photo.dominant_color if photo else None
+
 
 class LocationPreferenceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,59 @@
+"""
+Content-addressed storage for profile photos.
+
+Files are named after the SHA-256 of their bytes (<dir>/<h[:2]>/<h>.<ext>),
+so a stored name always refers to the same content: it can be cached
+forever, and uploading identical bytes again reuses the existing file.
+Files may therefore be shared between rows and must not be deleted with a
+single photo; purge_photo_files removes the ones no row references.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME_RE = re.compile(r"(?:^|/)(?P<fanout>[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})\.[a-z0-9]+$")
+
+
+def content_digest(name):
+    """Return the content hash embedded in a stored name, or None."""
+    match = HASHED_NAME_RE.search(name)
+    if match is None or not match["digest"].startswith(match["fanout"]):
+        return None
+    return match["digest"]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Identical names mean identical bytes, so overwriting in a race is harmless
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, "seek"):
+            content.seek(0)
+
+        directory, filename = posixpath.split(name.replace("\\", "/"))
+        extension = posixpath.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = posixpath.join(directory, hexdigest[:2], f"{hexdigest}{extension}")
+        if self.exists(name):
+            # Refresh the mtime so the orphan sweep treats a reused file as new
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+photo_storage = ContentAddressedStorage()
+
+
+def get_photo_storage():
+    return photo_storage
@@ -1,10 +1,34 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection as db_connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from .models import IntentTag, InterestTag, Profile
+from config import media
+from outbox.dispatch import drain_all
+from outbox.models import OutboxEvent
+
+from . import counters, uploads
+from .models import IntentTag, InterestTag, PhotoUploadSession, Profile, ProfilePhoto, UserCounters
+from .photos import purge_unreferenced_files
+from .storage import content_digest
+from .uploads import purge_expired_sessions
 
 User = get_user_model()
 
@@ -174,3 +198,413 @@ class DiscoveryTests(TestCase):
         
         for result in response.data["results"]:
             self.assertNotEqual(result["id"], self.user.profile.id)
+
+
+class CountersTests(TestCase):
+    """Test suite for cached badge counters."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="badges@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.other = User.objects.create_user(
+            email="sender@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("profiles:my-counters")
+
+    def test_pending_requests_counted(self):
+        """Test requests received count until accepted, rejected or deleted."""
+        from connections.models import Connection
+
+        connection = Connection.objects.create(from_user=self.other, to_user=self.user)
+        self.assertEqual(counters.get_counters(self.user)["pending_received_count"], 1)
+        self.assertEqual(counters.get_counters(self.other)["pending_received_count"], 0)
+
+        Connection.objects.get(pk=connection.pk).accept()
+        self.assertEqual(counters.get_counters(self.user)["pending_received_count"], 0)
+
+        third = User.objects.create_user(email="third@example.com", password="TestPass123!", is_active=True)
+        request = Connection.objects.create(from_user=third, to_user=self.user)
+        self.assertEqual(counters.get_counters(self.user)["pending_received_count"], 1)
+        request.delete()
+        self.assertEqual(counters.get_counters(self.user)["pending_received_count"], 0)
+
+    def test_unread_messages_counted(self):
+        """Test messages from the other participant count until the thread is read."""
+        from chat.models import ChatMessage, ChatThread
+
+        thread, _ = ChatThread.get_or_create_thread(self.user, self.other)
+        ChatMessage.objects.create(thread=thread, sender=self.other, content="Hi")
+        thread.refresh_from_db()
+        thread.bulk_add_messages([
+            ChatMessage(sender=self.other, content="Are you there?"),
+            ChatMessage(sender=self.other, content="Hello?"),
+        ])
+        ChatMessage.objects.create(thread=thread, sender=self.user, content="Yes")
+
+        thread.refresh_from_db()
+        self.assertEqual(thread.get_unread_count(self.user), 3)
+        self.assertEqual(thread.get_unread_count(self.other), 1)
+        self.assertEqual(counters.get_counters(self.user)["unread_message_count"], 3)
+
+        thread.mark_as_read(self.user)
+        self.assertEqual(thread.get_unread_count(self.user), 0)
+        self.assertEqual(counters.get_counters(self.user)["unread_message_count"], 0)
+        self.assertEqual(counters.get_counters(self.other)["unread_message_count"], 1)
+
+    def test_counters_endpoint_skips_source_tables(self):
+        """Test the endpoint answers from the counters row alone."""
+        from connections.models import Connection
+
+        Connection.objects.create(from_user=self.other, to_user=self.user)
+        with CaptureQueriesContext(db_connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"pending_received_count": 1, "unread_message_count": 0})
+        sql = " ".join(q["sql"] for q in queries)
+        self.assertNotIn("connections_connection", sql)
+        self.assertNotIn("chat_chatmessage", sql)
+
+    def test_reconcile_fixes_drift(self):
+        """Test reconcile rewrites counters changed behind the model's back."""
+        from chat.models import ChatMessage, ChatThread
+        from connections.models import Connection
+
+        Connection.objects.create(from_user=self.other, to_user=self.user)
+        thread, _ = ChatThread.get_or_create_thread(self.user, self.other)
+        ChatMessage.objects.create(thread=thread, sender=self.other, content="Hi")
+        UserCounters.objects.filter(user=self.user).update(pending_received_count=7, unread_message_count=0)
+        ChatThread.objects.filter(pk=thread.pk).update(user1_unread_count=0, user2_unread_count=0)
+
+        fixed = counters.reconcile()
+        self.assertEqual(fixed, {"threads": 1, "users": 1})
+        self.assertEqual(counters.get_counters(self.user), {"pending_received_count": 1, "unread_message_count": 1})
+
+
+class ProfilePhotoTests(TestCase):
+    """Test suite for photo upload and variant processing."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="selfie@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("profiles:my-photos")
+
+    def make_image(self, size=(2000, 1200), image_format="JPEG", name="photo.jpg", exif=None):
+        buffer = BytesIO()
+        image = Image.new("RGB", size, color=(30, 120, 200))
+        image.save(buffer, image_format, **({"exif": exif} if exif else {}))
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=f"image/{image_format.lower()}")
+
+    def test_upload_returns_pending_photo(self):
+        """Test upload only validates; variants come from the outbox worker."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], ProfilePhoto.Status.PENDING)
+        self.assertIsNone(response.data["card"])
+        self.assertIn("?sig=", response.data["image"])
+        self.assertTrue(OutboxEvent.objects.filter(topic="profile_photo.uploaded").exists())
+
+        drain_all()
+        photo = self.client.get(self.url).data[0]
+        self.assertEqual(photo["image"], photo["full"])
+
+    def test_variants_are_oriented_webp_without_metadata(self):
+        """Test processing writes fixed-size WebP variants, rotated and stripped."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x010F] = "PhoneMaker"
+        response = self.client.post(self.url, {"image": self.make_image(exif=exif)}, format="multipart")
+        drain_all()
+
+        photo = ProfilePhoto.objects.get(pk=response.data["id"])
+        self.assertEqual(photo.status, ProfilePhoto.Status.READY)
+        # 2000x1200 landscape becomes 1200x2000 portrait, fitted into 1080x1350
+        self.assertEqual((photo.width, photo.height), (810, 1350))
+        for name, expected in (("thumbnail", (160, 160)), ("card", (480, 600)), ("full", (810, 1350))):
+            with Image.open(getattr(photo, name).path) as variant:
+                self.assertEqual(variant.format, "WEBP")
+                self.assertEqual(variant.size, expected)
+                self.assertFalse(variant.info.get("exif"))
+
+        response = self.client.get(self.url)
+        self.assertTrue(response.data[0]["card"].startswith(f"http://testserver/media/{photo.card.name}?sig="))
+        self.assertEqual(content_digest(photo.card.name), hashlib.sha256(photo.card.read()).hexdigest())
+
+    def test_placeholder_and_dominant_color(self):
+        """Test processing stores a tiny inline preview and the main color."""
+        buffer = BytesIO()
+        image = Image.new("RGB", (800, 1000), color=(30, 120, 200))
+        image.paste((250, 250, 250), (0, 0, 200, 200))
+        image.save(buffer, "PNG")
+        upload = SimpleUploadedFile("photo.png", buffer.getvalue(), content_type="image/png")
+        response = self.client.post(self.url, {"image": upload}, format="multipart")
+        drain_all()
+
+        data = self.client.get(self.url).data[0]
+        self.assertEqual(data["id"], response.data["id"])
+        self.assertEqual(data["dominant_color"], "#1e78c8")
+        self.assertTrue(data["placeholder"].startswith("data:image/webp;base64,"))
+        preview = base64.b64decode(data["placeholder"].split(",", 1)[1])
+        self.assertLess(len(preview), 400)
+        with Image.open(BytesIO(preview)) as decoded:
+            self.assertEqual(decoded.size, (12, 15))
+
+    def test_identical_uploads_share_files(self):
+        """Test uploading the same bytes twice stores one original and one set of variants."""
+        upload = self.make_image()
+        first = self.client.post(self.url, {"image": upload}, format="multipart")
+        upload.seek(0)
+        second = self.client.post(self.url, {"image": upload}, format="multipart")
+        drain_all()
+
+        photos = list(ProfilePhoto.objects.filter(pk__in=[first.data["id"], second.data["id"]]))
+        self.assertEqual(photos[0].image.name, photos[1].image.name)
+        self.assertEqual(photos[0].card.name, photos[1].card.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(photos[0].image.path))), 1)
+
+    def test_purge_removes_only_unreferenced_files(self):
+        """Test deleted photos' files are swept once stale, while shared files stay."""
+        upload = self.make_image()
+        first = self.client.post(self.url, {"image": upload}, format="multipart")
+        upload.seek(0)
+        second = self.client.post(self.url, {"image": upload}, format="multipart")
+        buffer = BytesIO()
+        Image.new("RGB", (900, 900), color=(200, 40, 40)).save(buffer, "PNG")
+        upload = SimpleUploadedFile("other.png", buffer.getvalue(), content_type="image/png")
+        other = self.client.post(self.url, {"image": upload}, format="multipart")
+        drain_all()
+        shared = ProfilePhoto.objects.get(pk=first.data["id"])
+        removed = ProfilePhoto.objects.get(pk=other.data["id"])
+        files = [getattr(removed, name).path for name in ("image", "thumbnail", "card", "full")]
+
+        for response in (first, other):
+            self.client.delete(reverse("profiles:my-photo-detail", args=[response.data["id"]]))
+        self.assertEqual(purge_unreferenced_files(), 0)  # still within the grace period
+
+        later = timezone.now() + timedelta(seconds=settings.PROFILE_PHOTO_ORPHAN_GRACE + 1)
+        self.assertEqual(purge_unreferenced_files(now=later), 4)
+        self.assertFalse(any(os.path.exists(path) for path in files))
+        for name in ("image", "thumbnail", "card", "full"):
+            self.assertTrue(os.path.exists(getattr(shared, name).path))
+        self.assertTrue(ProfilePhoto.objects.filter(pk=second.data["id"]).exists())
+
+    def test_media_served_immutable_with_etag(self):
+        """Test signed media gets immutable caching (within the signature's life) and honours If-None-Match."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        drain_all()
+        card = ProfilePhoto.objects.get(pk=response.data["id"]).card
+        url = media.media_url(card)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], f'"{content_digest(card.name)}"')
+        self.assertIn("immutable", response["Cache-Control"])
+        response.close()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get("/media/../config/settings.py").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_media_requires_valid_signature(self):
+        """Test photos are not served without a current signature for that exact file."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        drain_all()
+        photo = ProfilePhoto.objects.get(pk=response.data["id"])
+
+        self.assertEqual(self.client.get(photo.card.url).status_code, status.HTTP_404_NOT_FOUND)
+        other_signature = media.sign(photo.thumbnail.name)
+        response = self.client.get(photo.card.url, {"sig": other_signature})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        url = media.media_url(photo.card)
+        with mock.patch("time.time", return_value=time.time() + settings.MEDIA_SIGNED_URL_MAX_AGE + 1):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_media_traversal_cannot_skip_signature(self):
+        """Test a path that walks back into profile_photos/ from another directory is refused."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        drain_all()
+        card = ProfilePhoto.objects.get(pk=response.data["id"]).card
+        os.makedirs(os.path.join(self.media_root, "chat_attachments"))
+
+        for path in (f"chat_attachments/../{card.name}", f"./{card.name}", f"profile_photos//{card.name[15:]}"):
+            response = self.client.get(f"/media/{path}")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, path)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="x-accel-redirect", MEDIA_ACCEL_REDIRECT_LOCATION="/protected-media/")
+    def test_media_offloaded_to_web_server(self):
+        """Test the view only sets X-Accel-Redirect when offloading is configured."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        drain_all()
+        card = ProfilePhoto.objects.get(pk=response.data["id"]).card
+
+        response = self.client.get(media.media_url(card))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{card.name}")
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response.content, b"")
+
+    def test_invalid_upload_rejected(self):
+        """Test non-images and oversized images fail validation."""
+        fake = SimpleUploadedFile("photo.jpg", b"not an image", content_type="image/jpeg")
+        response = self.client.post(self.url, {"image": fake}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with override_settings(PROFILE_PHOTO_MAX_PIXELS=1000):
+            response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ProfilePhoto.objects.exists())
+
+    def test_bomb_guard_on_processing(self):
+        """Test a stored file over the pixel limit is marked failed, not decoded."""
+        response = self.client.post(self.url, {"image": self.make_image()}, format="multipart")
+        with override_settings(PROFILE_PHOTO_MAX_PIXELS=1000), self.assertLogs("profiles.photos", "ERROR"):
+            drain_all()
+        self.assertEqual(ProfilePhoto.objects.get(pk=response.data["id"]).status, ProfilePhoto.Status.FAILED)
+
+
+class ResumablePhotoUploadTests(TestCase):
+    """Test suite for chunked, resumable photo uploads."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.upload_dir = tempfile.mkdtemp()
+        dirs_override = override_settings(MEDIA_ROOT=self.media_root, PROFILE_PHOTO_UPLOAD_DIR=self.upload_dir)
+        dirs_override.enable()
+        self.addCleanup(dirs_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.upload_dir, ignore_errors=True)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="flaky-network@example.com",
+            password="TestPass123!",
+            is_active=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("profiles:my-photo-uploads")
+
+        buffer = BytesIO()
+        Image.effect_noise((400, 500), 64).convert("RGB").save(buffer, "JPEG", quality=95)
+        self.payload = buffer.getvalue()
+
+    def start(self, filename="me.jpg"):
+        response = self.client.post(self.url, {"filename": filename, "size": len(self.payload)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def put_chunk(self, session_id, start, data):
+        return self.client.generic(
+            "PUT",
+            reverse("profiles:my-photo-upload-detail", args=[session_id]),
+            data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/{len(self.payload)}",
+        )
+
+    def finalize(self, session_id):
+        return self.client.post(reverse("profiles:my-photo-upload-finalize", args=[session_id]))
+
+    def test_chunked_upload_resumes_and_finalizes(self):
+        """Test chunks land at their offsets, a wrong offset is refused and finalize creates the photo."""
+        session_id = self.start()
+        half = len(self.payload) // 2
+
+        response = self.put_chunk(session_id, 0, self.payload[:half])
+        self.assertEqual(response.data["offset"], half)
+        # A retried first chunk after the connection dropped is refused with the offset to resume from
+        response = self.put_chunk(session_id, 0, self.payload[:half])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], half)
+        self.assertEqual(self.finalize(session_id).status_code, status.HTTP_409_CONFLICT)
+
+        detail = self.client.get(reverse("profiles:my-photo-upload-detail", args=[session_id]))
+        response = self.put_chunk(session_id, detail.data["offset"], self.payload[half:])
+        self.assertEqual(response.data["offset"], len(self.payload))
+
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        photo = ProfilePhoto.objects.get(pk=response.data["id"])
+        self.assertEqual(hashlib.sha256(photo.image.read()).hexdigest(), hashlib.sha256(self.payload).hexdigest())
+        self.assertFalse(PhotoUploadSession.objects.exists())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_losing_chunk_leaves_part_file_untouched(self):
+        """Test a chunk that loses the race for an offset is refused without writing."""
+        session_id = self.start()
+        first = PhotoUploadSession.objects.get(pk=session_id)
+        stale = PhotoUploadSession.objects.get(pk=session_id)
+
+        self.assertEqual(uploads.write_chunk(first, 0, 4, BytesIO(b"AAAA")), 4)
+        with self.assertRaises(uploads.OffsetMismatch):
+            uploads.write_chunk(stale, 0, 4, BytesIO(b"BBBB"))
+        with open(uploads.part_path(first), "rb") as part:
+            self.assertEqual(part.read(), b"AAAA")
+        self.assertEqual(stale.received, 4)
+
+    def test_finalize_applies_photo_limit(self):
+        """Test finalize runs the multipart upload validation, including the 3-photo limit."""
+        session_id = self.start()
+        self.put_chunk(session_id, 0, self.payload)
+        profile, _ = Profile.objects.get_or_create(user=self.user)
+        for index in range(3):
+            ProfilePhoto.objects.create(profile=profile, image=f"profile_photos/{index}.jpg", ordering_index=index)
+
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ProfilePhoto.objects.count(), 3)
+        # No new sessions once the profile is full
+        response = self.client.post(self.url, {"filename": "me.jpg", "size": 10}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_sessions_and_chunks_rejected(self):
+        """Test oversize declarations, overrunning or mis-sized chunks and other users' sessions are refused."""
+        with override_settings(PROFILE_PHOTO_MAX_BYTES=100):
+            response = self.client.post(self.url, {"filename": "me.jpg", "size": 101}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        session_id = self.start()
+        response = self.put_chunk(session_id, 0, self.payload + b"extra")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["offset"], 0)
+        # The Content-Range total must agree with the size the session was created with
+        response = self.client.generic(
+            "PUT",
+            reverse("profiles:my-photo-upload-detail", args=[session_id]),
+            self.payload[:10],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes 0-9/{len(self.payload) + 1}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PhotoUploadSession.objects.get(pk=session_id).received, 0)
+
+        other = User.objects.create_user(email="other-uploader@example.com", password="TestPass123!", is_active=True)
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.put_chunk(session_id, 0, self.payload).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_sessions_purged(self):
+        """Test expired sessions stop accepting chunks and are removed with their part files."""
+        session_id = self.start()
+        PhotoUploadSession.objects.filter(pk=session_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.put_chunk(session_id, 0, self.payload).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(purge_expired_sessions(), 1)
+        self.assertFalse(PhotoUploadSession.objects.exists())
+        self.assertEqual(os.listdir(self.upload_dir), [])
@@ -0,0 +1,143 @@
+"""
+Resumable profile photo uploads.
+
+A client creates a session with the file's name and size, then PUTs the
+bytes in chunks with a Content-Range header. Each chunk is streamed from
+the request into a temporary file next to the session's part file (no
+buffering of the whole body, and no database transaction open while the
+client is sending). Only then is it committed: a conditional UPDATE on the
+expected offset claims the range and, in the same short transaction, the
+bytes are copied into the part file, so a retried or concurrent chunk can
+never be counted or written twice. After an interrupted chunk the client
+asks for the session's offset and continues from there. Finalizing hands
+the part file to ProfilePhotoUploadSerializer exactly like a multipart
+upload.
+"""
+
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PhotoUploadSession
+
+# Unfinished sessions a user may hold at once (the profile limit is 3 photos)
+MAX_ACTIVE_SESSIONS = 3
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+|\*)$")
+
+
+class OffsetMismatch(Exception):
+    """The chunk does not start where the session left off."""
+
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk starting at byte {offset}.")
+        self.offset = offset
+
+
+def part_path(session):
+    return os.path.join(settings.PROFILE_PHOTO_UPLOAD_DIR, f"{session.id}.part")
+
+
+def active_sessions(user):
+    return PhotoUploadSession.objects.filter(user=user, expires_at__gt=timezone.now())
+
+
+def create_session(user, filename, size):
+    session = PhotoUploadSession.objects.create(
+        user=user,
+        filename=filename,
+        size=size,
+        expires_at=timezone.now() + timedelta(seconds=settings.PROFILE_PHOTO_UPLOAD_SESSION_TTL),
+    )
+    os.makedirs(settings.PROFILE_PHOTO_UPLOAD_DIR, exist_ok=True)
+    open(part_path(session), "wb").close()
+    return session
+
+
+def parse_content_range(header):
+    """Parse "bytes <start>-<end>/<total>" into (start, length, total); total is None for "*". Raises ValueError."""
+    match = CONTENT_RANGE_RE.match(header or "")
+    if match is None:
+        raise ValueError("Send a Content-Range header: bytes <start>-<end>/<total>.")
+    start, end = int(match["start"]), int(match["end"])
+    total = None if match["total"] == "*" else int(match["total"])
+    if end < start:
+        raise ValueError("Invalid Content-Range.")
+    return start, end - start + 1, total
+
+
+def write_chunk(session, offset, length, stream):
+    """
+    Copy `length` bytes from `stream` into the part file at `offset` and
+    advance the session. Returns the new offset, which is short of
+    offset + length if the body ended early.
+    """
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise ValueError(f"Chunk runs past the declared size of {session.size} bytes.")
+
+    with tempfile.TemporaryFile(dir=settings.PROFILE_PHOTO_UPLOAD_DIR) as chunk:
+        written = 0
+        while written < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            chunk.write(data)
+            written += len(data)
+        chunk.seek(0)
+
+        with transaction.atomic():
+            # The UPDATE comes first: it locks the row, and only the writer that
+            # still sees the expected offset goes on to touch the part file
+            claimed = PhotoUploadSession.objects.filter(pk=session.pk, received=offset).update(received=offset + written)
+            if not claimed:
+                session.refresh_from_db(fields=["received"])
+                raise OffsetMismatch(session.received)
+            with open(part_path(session), "r+b") as part:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, COPY_BUFFER_SIZE)
+                part.truncate()
+
+    session.received = offset + written
+    return session.received
+
+
+def open_upload(session):
+    """The finished part file as an UploadedFile for the upload serializer (caller closes it)."""
+    content_type = mimetypes.guess_type(session.filename)[0] or "application/octet-stream"
+    return UploadedFile(
+        file=open(part_path(session), "rb"),
+        name=session.filename,
+        content_type=content_type,
+        size=session.received,
+    )
+
+
+def discard(session):
+    """Delete a session and its part file."""
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge_expired_sessions(now=None):
+    """Delete expired sessions and their part files. Returns the number removed."""
+    expired = PhotoUploadSession.objects.filter(expires_at__lte=now or timezone.now())
+    count = 0
+    for session in expired.iterator():
+        discard(session)
+        count += 1
+    return count
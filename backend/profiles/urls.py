@@ -4,8 +4,12 @@ from .views import (
     DiscoveryView,
     IntentTagListView,
     InterestTagListView,
+    MyCountersView,
     MyPhotoDetailView,
     MyPhotosListView,
+    MyPhotoUploadDetailView,
+    MyPhotoUploadFinalizeView,
+    MyPhotoUploadsView,
     MyPreferencesView,
     MyProfileView,
 )
@@ -17,7 +21,15 @@ urlpatterns = [
     path("me/", MyProfileView.as_view(), name="my-profile"),
     path("me/photos/", MyPhotosListView.as_view(), name="my-photos"),
     path("me/photos/<int:pk>/", MyPhotoDetailView.as_view(), name="my-photo-detail"),
+    path("me/photos/uploads/", MyPhotoUploadsView.as_view(), name="my-photo-uploads"),
+    path("me/photos/uploads/<uuid:pk>/", MyPhotoUploadDetailView.as_view(), name="my-photo-upload-detail"),
+    path(
+        "me/photos/uploads/<uuid:pk>/finalize/",
+        MyPhotoUploadFinalizeView.as_view(),
+        name="my-photo-upload-finalize",
+    ),
     path("me/preferences/", MyPreferencesView.as_view(), name="my-preferences"),
+    path("me/counters/", MyCountersView.as_view(), name="my-counters"),
     # Discovery endpoint
     path("discover/", DiscoveryView.as_view(), name="discover"),
     # Tags endpoints
@@ -1,14 +1,16 @@
-from django.db import models
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import counters, uploads
 from .models import IntentTag, InterestTag, LocationPreference, MatchingPreference, Profile, ProfilePhoto
 from .serializers import (
     IntentTagSerializer,
     InterestTagSerializer,
+    PhotoUploadSessionSerializer,
     PreferencesSerializer,
     ProfilePhotoSerializer,
     ProfilePhotoUploadSerializer,
@@ -43,7 +45,7 @@ class MyPhotosListView(APIView):
     def get(self, request):
         profile, _ = Profile.objects.get_or_create(user=request.user)
         photos = profile.photos.all()
-        serializer = ProfilePhotoSerializer(photos, many=True)
+        serializer = ProfilePhotoSerializer(photos, many=True, context={"request": request})
         return Response(serializer.data)
 
     def post(self, request):
@@ -77,6 +79,98 @@ class MyPhotoDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class MyPhotoUploadsView(APIView):
+    """
+    POST /api/v1/me/photos/uploads/ - Start a resumable photo upload
+    Body: {"filename": "me.jpg", "size": <bytes>}
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        profile, _ = Profile.objects.get_or_create(user=request.user)
+        serializer = PhotoUploadSessionSerializer(
+            data=request.data,
+            context={"request": request, "profile": profile},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class MyPhotoUploadDetailView(APIView):
+    """
+    GET /api/v1/me/photos/uploads/{id}/ - Current offset (to resume after a failure)
+    PUT /api/v1/me/photos/uploads/{id}/ - Send a chunk (raw bytes, Content-Range: bytes <start>-<end>/<total>)
+    DELETE /api/v1/me/photos/uploads/{id}/ - Cancel the upload
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get_session(self, request, pk):
+        return get_object_or_404(uploads.active_sessions(request.user), pk=pk)
+
+    def get(self, request, pk):
+        return Response(PhotoUploadSessionSerializer(self.get_session(request, pk)).data)
+
+    def put(self, request, pk):
+        session = self.get_session(request, pk)
+        try:
+            offset, length, total = uploads.parse_content_range(request.headers.get("Content-Range"))
+            if total is not None and total != session.size:
+                raise ValueError(f"Content-Range total does not match the declared size of {session.size} bytes.")
+            if int(request.headers.get("Content-Length") or 0) != length:
+                raise ValueError("Content-Length does not match Content-Range.")
+            # Read the raw body as a stream; request.data would buffer the whole chunk
+            new_offset = uploads.write_chunk(session, offset, length, request.stream)
+        except uploads.OffsetMismatch as exc:
+            return Response({"error": str(exc), "offset": exc.offset}, status=status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            return Response({"error": str(exc), "offset": session.received}, status=status.HTTP_400_BAD_REQUEST)
+
+        if new_offset < offset + length:
+            return Response(
+                {"error": "Chunk ended early; resume from offset.", "offset": new_offset},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(PhotoUploadSessionSerializer(session).data)
+
+    def delete(self, request, pk):
+        uploads.discard(self.get_session(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MyPhotoUploadFinalizeView(APIView):
+    """
+    POST /api/v1/me/photos/uploads/{id}/finalize/ - Turn a complete upload into a photo
+    Validation (format, size, 3-photo limit) is the same as a multipart upload.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, pk):
+        session = get_object_or_404(uploads.active_sessions(request.user), pk=pk)
+        if session.received != session.size:
+            return Response(
+                {"error": "Upload is incomplete.", "offset": session.received},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        profile, _ = Profile.objects.get_or_create(user=request.user)
+        upload = uploads.open_upload(session)
+        try:
+            serializer = ProfilePhotoUploadSerializer(
+                data={"image": upload},
+                context={"request": request, "profile": profile},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        finally:
+            upload.close()
+        uploads.discard(session)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 class IntentTagListView(generics.ListAPIView):
     """
     GET /api/v1/tags/intents/ - List all active intent tags
@@ -113,6 +207,18 @@ class MyPreferencesView(generics.RetrieveUpdateAPIView):
         return profile
 
 
+class MyCountersView(APIView):
+    """
+    GET /api/v1/me/counters/ - Badge counts (pending requests, unread messages)
+    Served from the user's UserCounters row; never counts connections or messages.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        return Response(counters.get_counters(request.user))
+
+
 class DiscoveryView(APIView):
     """
     GET /api/v1/discover/ - Discover nearby compatible users
@@ -195,23 +301,12 @@ class DiscoveryView(APIView):
             if my_matching.faith_exclude:
                 candidates = candidates.exclude(faith__in=my_matching.faith_exclude)
 
-        # Exclude blocked users
+        # Exclude blocked users (from the cached relationship graph)
+        from connections import graph
         from connections.models import Connection
-        blocked_user_ids = Connection.objects.filter(
-            models.Q(from_user=request.user, status=Connection.Status.BLOCKED)
-            | models.Q(to_user=request.user, status=Connection.Status.BLOCKED)
-        ).values_list("from_user_id", "to_user_id")
-        
-        # Flatten the list of tuples and exclude current user
-        blocked_ids = set()
-        for from_id, to_id in blocked_user_ids:
-            if from_id != request.user.id:
-                blocked_ids.add(from_id)
-            if to_id != request.user.id:
-                blocked_ids.add(to_id)
-        
-        if blocked_ids:
-            candidates = candidates.exclude(user__id__in=blocked_ids)
+        relationships = graph.get_graph(request.user)
+        if relationships.blocked:
+            candidates = candidates.exclude(user__id__in=list(relationships.blocked))
 
         # Haversine distance calculation function
         def haversine(lon1, lat1, lon2, lat2):
@@ -274,6 +369,15 @@ class DiscoveryView(APIView):
                 "score": score,
             })
 
+        # Mutual connections for every remaining candidate in one batch
+        mutual_counts = graph.mutual_connection_counts(
+            request.user, [item["profile"].user_id for item in results]
+        )
+        for item in results:
+            mutual = mutual_counts.get(item["profile"].user_id, 0)
+            item["mutual_connection_count"] = mutual
+            item["score"] += min(mutual, 10) * 3  # Mutual connection score (3 per match, max 30)
+
         # Sort by score descending
         results.sort(key=lambda x: x["score"], reverse=True)
 
@@ -287,15 +391,14 @@ class DiscoveryView(APIView):
         # Serialize results
         data = []
         for item in paginated:
-            profile_data = PublicProfileSerializer(item["profile"]).data
+            profile_data = PublicProfileSerializer(
+                item["profile"], context={"mutual_counts": mutual_counts}
+            ).data
             profile_data["distance_km"] = item["distance_km"]
             profile_data["mutual_interest_count"] = item["mutual_interest_count"]
             
             # Add connection status
-            from connections.models import Connection
-            connection_status, connection_obj = Connection.get_connection_status(
-                request.user, item["profile"].user
-            )
+            connection_status = relationships.status_with(item["profile"].user_id)
             profile_data["connection_status"] = connection_status
             profile_data["is_connection_pending"] = (
                 connection_status == Connection.Status.PENDING if connection_status else False
@@ -0,0 +1,3 @@
+@echo off
+echo Running Nexa Outbox Worker...
+venv\Scripts\python.exe manage.py drain_outbox